@@ -1,9 +1,13 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, HTTPException, Query, Response
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Optional, List
+import os
+from comun.metrics import MetricsMiddleware, registro, instrumentar_plantillas
+from app.store import ClienteStore, RegistroCliente, EmailDuplicado
+from app.persistence import PersistenciaStore
 
 # Modelo Pydantic para Cliente
 class Cliente(BaseModel):
@@ -14,9 +18,23 @@ class Cliente(BaseModel):
     telefono: Optional[str] = None
     direccion: Optional[str] = None
 
-# Lista de clientes en memoria
-clientes_db = [
-    Cliente(
+# Datos de entrada para crear o actualizar (el id lo asigna el almacén)
+class ClienteEntrada(BaseModel):
+    nombre: str
+    apellido: str
+    email: EmailStr
+    telefono: Optional[str] = None
+    direccion: Optional[str] = None
+
+# Página del listado: `siguiente` es el valor de `despues` para pedir la página siguiente
+class PaginaClientes(BaseModel):
+    clientes: List[Cliente]
+    total: int
+    siguiente: Optional[int] = None
+
+# Clientes de ejemplo con los que arranca el almacén la primera vez (directorio de datos vacío)
+CLIENTES_INICIALES = [
+    dict(
         id=1,
         nombre="Juan",
         apellido="Pérez",
@@ -24,7 +42,7 @@ clientes_db = [
         telefono="555-0101",
         direccion="Calle 123, Ciudad"
     ),
-    Cliente(
+    dict(
         id=2,
         nombre="María",
         apellido="García",
@@ -32,7 +50,7 @@ clientes_db = [
         telefono="555-0102",
         direccion="Avenida 456, Ciudad"
     ),
-    Cliente(
+    dict(
         id=3,
         nombre="Carlos",
         apellido="Rodríguez",
@@ -40,7 +58,7 @@ clientes_db = [
         telefono="555-0103",
         direccion="Plaza 789, Ciudad"
     ),
-    Cliente(
+    dict(
         id=4,
         nombre="Ana",
         apellido="Martínez",
@@ -48,7 +66,7 @@ clientes_db = [
         telefono="555-0104",
         direccion="Paseo 321, Ciudad"
     ),
-    Cliente(
+    dict(
         id=5,
         nombre="Luis",
         apellido="López",
@@ -58,18 +76,131 @@ clientes_db = [
     )
 ]
 
+# Almacén en memoria indexado (app/store.py): los modelos pydantic solo se usan en la entrada y salida de la API
+store = ClienteStore()
+
+# Durabilidad: log de escrituras + instantáneas en CLIENTES_DATA_DIR (app/persistence.py)
+persistencia = PersistenciaStore(
+    store,
+    os.getenv("CLIENTES_DATA_DIR", "data"),
+    fsync=os.getenv("CLIENTES_FSYNC", "0") == "1",
+    intervalo=float(os.getenv("CLIENTES_SNAPSHOT_INTERVAL", "60")),
+    min_operaciones=int(os.getenv("CLIENTES_SNAPSHOT_MIN_OPS", "10000"))
+)
+
 app = FastAPI(title="SumaAPI")
 
 # Servir archivos estáticos
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Motor de plantillas
+# Motor de plantillas (el renderizado se mide como fase "render")
 templates = Jinja2Templates(directory="app/templates")
+instrumentar_plantillas(templates)
+
+# Latencia por ruta y por fase, expuesta en GET /metrics
+app.add_middleware(MetricsMiddleware)
+registro.registrar_gauges("clientes_store", "Estado del almacén de clientes en memoria", store.estadisticas)
+registro.registrar_gauges("clientes_persistencia", "Log de escrituras e instantáneas del almacén", persistencia.estadisticas)
+
+LIMITE_MAXIMO = 100
+
+
+@app.on_event("startup")
+def abrir_almacen():
+    persistencia.abrir(iniciales=[RegistroCliente(**datos) for datos in CLIENTES_INICIALES])
+
+
+@app.on_event("shutdown")
+def cerrar_almacen():
+    # La instantánea final deja el siguiente arranque sin log que reproducir
+    persistencia.cerrar()
 
-# --- GET: muestra el formulario ---
+
+@app.exception_handler(EmailDuplicado)
+async def email_duplicado_handler(request: Request, exc: EmailDuplicado):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+
+def pagina_clientes(limite: int, despues: Optional[int]) -> PaginaClientes:
+    # Pedimos uno de más para saber si hay página siguiente
+    registros = store.pagina(limite + 1, despues)
+    siguiente = registros[limite - 1].id if len(registros) > limite else None
+    return PaginaClientes(
+        clientes=[r.a_dict() for r in registros[:limite]],
+        total=len(store),
+        siguiente=siguiente
+    )
+
+# --- GET: muestra el listado (por páginas) ---
 @app.get("/", response_class=HTMLResponse)
-def get_index(request: Request):
+def get_index(
+    request: Request,
+    limite: int = Query(50, ge=1, le=LIMITE_MAXIMO),
+    despues: Optional[int] = None
+):
+    pagina = pagina_clientes(limite, despues)
     return templates.TemplateResponse("pages/index.html", {
         "request": request,
-        "clientes": clientes_db
-    })
\ No newline at end of file
+        "clientes": pagina.clientes,
+        "total": pagina.total,
+        "siguiente": pagina.siguiente,
+        "limite": limite
+    })
+
+# --- API JSON: listado por id ---
+@app.get("/api/clientes", response_model=PaginaClientes)
+def listar_clientes(limite: int = Query(50, ge=1, le=LIMITE_MAXIMO), despues: Optional[int] = None):
+    return pagina_clientes(limite, despues)
+
+# --- API JSON: búsqueda por prefijo de nombre o apellido ---
+@app.get("/api/clientes/buscar", response_model=List[Cliente])
+def buscar_clientes(q: str = Query(..., min_length=1), limite: int = Query(20, ge=1, le=LIMITE_MAXIMO)):
+    return [r.a_dict() for r in store.buscar_prefijo(q, limite)]
+
+# --- API JSON: rango alfabético por nombre o apellido ---
+@app.get("/api/clientes/rango", response_model=List[Cliente])
+def rango_clientes(
+    desde: str = "",
+    hasta: Optional[str] = None,
+    campo: str = Query("nombre", pattern="^(nombre|apellido)$"),
+    limite: int = Query(50, ge=1, le=LIMITE_MAXIMO)
+):
+    return [r.a_dict() for r in store.rango_nombre(desde, hasta, limite, campo)]
+
+# --- API JSON: cliente por email ---
+@app.get("/api/clientes/email/{email}", response_model=Cliente)
+def get_cliente_por_email(email: str):
+    registro_cliente = store.por_email(email)
+    if registro_cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return registro_cliente.a_dict()
+
+# --- API JSON: CRUD por id ---
+@app.get("/api/clientes/{cliente_id}", response_model=Cliente)
+def get_cliente(cliente_id: int):
+    registro_cliente = store.obtener(cliente_id)
+    if registro_cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return registro_cliente.a_dict()
+
+@app.post("/api/clientes", response_model=Cliente, status_code=201)
+def crear_cliente(cliente: ClienteEntrada):
+    return store.crear(cliente.model_dump()).a_dict()
+
+@app.put("/api/clientes/{cliente_id}", response_model=Cliente)
+def actualizar_cliente(cliente_id: int, cliente: ClienteEntrada):
+    registro_cliente = store.actualizar(cliente_id, cliente.model_dump())
+    if registro_cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return registro_cliente.a_dict()
+
+@app.delete("/api/clientes/{cliente_id}", status_code=204)
+def eliminar_cliente(cliente_id: int):
+    if not store.eliminar(cliente_id):
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return Response(status_code=204)
+
+# --- GET: métricas en formato Prometheus ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(registro.exportar(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,370 @@
+import gc
+import glob
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from itertools import accumulate
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+from app.store import ClienteStore, RegistroCliente
+
+# Columnas de texto de un registro, en el orden en que se guardan
+CAMPOS_TEXTO = ("nombre", "apellido", "email", "telefono", "direccion")
+
+# --- Instantánea: formato columnar ---
+# cabecera | ids (int64 * n) | una columna por campo de texto | índices de nombre y apellido
+# (columna con las claves normalizadas + ids, ya en orden). Cada columna: separado (1 byte),
+# tamaño del texto (uint64), offsets en caracteres (uint32 * (n + 1), solo si no va separado),
+# nulos (1 byte por fila) y el texto UTF-8 de todas las filas seguido.
+# Leerla es copiar arrays y decodificar un único bloque por columna, sin parsear fila a fila,
+# y los índices se reconstruyen sin volver a normalizar ni ordenar.
+_MAGIA = b"CLSNAP01"
+_CABECERA = struct.Struct("<8sQQ")  # magia, número de registros, siguiente id
+_COLUMNA = struct.Struct("<BQ")
+# Separador de valores dentro de una columna; si algún valor lo contiene se guardan offsets
+_SEPARADOR = "\x00"
+_INDICES = ("nombre", "apellido")
+
+# --- Log de escrituras: una entrada por alta/modificación/baja ---
+# longitud del contenido (uint32) | crc32 de operación + contenido | operación (1 byte) | contenido
+_CABECERA_LOG = struct.Struct("<IIB")
+_OP_UPSERT = 1
+_OP_ELIMINAR = 2
+_ID = struct.Struct("<q")
+_LONGITUD = struct.Struct("<i")
+
+
+def _nativo_a_le(datos: array) -> array:
+    # Los ficheros son little-endian en cualquier plataforma
+    if sys.byteorder == "big":
+        datos.byteswap()
+    return datos
+
+
+def _escribir_enteros(f: BinaryIO, valores: Iterable[int]) -> None:
+    f.write(_nativo_a_le(array("q", valores)).tobytes())
+
+
+def _leer_enteros(vista: memoryview, pos: int, n: int) -> Tuple[array, int]:
+    valores = array("q")
+    valores.frombytes(vista[pos:pos + 8 * n])
+    return _nativo_a_le(valores), pos + 8 * n
+
+
+def _escribir_columna(f: BinaryIO, valores: List[str | None]) -> None:
+    nulos = bytes(v is None for v in valores)
+    textos = ["" if v is None else v for v in valores]
+    texto = _SEPARADOR.join(textos)
+    separado = texto.count(_SEPARADOR) == max(len(textos) - 1, 0)
+    bloque = texto.encode("utf-8") if separado else "".join(textos).encode("utf-8")
+    f.write(_COLUMNA.pack(separado, len(bloque)))
+    if not separado:
+        f.write(_nativo_a_le(array("I", accumulate(map(len, textos), initial=0))).tobytes())
+    f.write(nulos)
+    f.write(bloque)
+
+
+def _leer_columna(vista: memoryview, pos: int, n: int) -> Tuple[List[Any], int]:
+    separado, tamano = _COLUMNA.unpack_from(vista, pos)
+    pos += _COLUMNA.size
+    offsets = array("I")
+    if not separado:
+        offsets.frombytes(vista[pos:pos + 4 * (n + 1)])
+        _nativo_a_le(offsets)
+        pos += 4 * (n + 1)
+    nulos = bytes(vista[pos:pos + n])
+    pos += n
+    texto = str(vista[pos:pos + tamano], "utf-8")
+    pos += tamano
+
+    valores: List[Any]
+    if n == 0:
+        valores = []
+    elif separado:
+        valores = texto.split(_SEPARADOR)
+    else:
+        valores = [texto[a:b] for a, b in zip(offsets, offsets[1:])]
+    if any(nulos):
+        valores = [None if nulo else v for v, nulo in zip(valores, nulos)]
+    return valores, pos
+
+
+def escribir_instantanea(
+    ruta: str,
+    registros: List[RegistroCliente],
+    siguiente_id: int,
+    indices: Dict[str, List[Tuple[str, int]]]
+) -> None:
+    """Escribe la instantánea en `ruta` de forma atómica (fichero temporal + fsync + rename)."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        f.write(_CABECERA.pack(_MAGIA, len(registros), siguiente_id))
+        _escribir_enteros(f, (r.id for r in registros))
+        for campo in CAMPOS_TEXTO:
+            _escribir_columna(f, [getattr(r, campo) for r in registros])
+        for nombre in _INDICES:
+            _escribir_columna(f, [clave for clave, _ in indices[nombre]])
+            _escribir_enteros(f, (cliente_id for _, cliente_id in indices[nombre]))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def leer_instantanea(
+    ruta: str
+) -> Tuple[Dict[int, RegistroCliente], int, Dict[str, List[Tuple[str, int]]]]:
+    """
+    Lee una instantánea mapeándola en memoria; devuelve (registros por id, siguiente id,
+    índices ordenados de nombre y apellido) listos para `ClienteStore.cargar`.
+    """
+    with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as vista:
+            magia, n, siguiente_id = _CABECERA.unpack_from(vista, 0)
+            if magia != _MAGIA:
+                raise ValueError(f"{ruta} no es una instantánea de clientes")
+            ids, pos = _leer_enteros(vista, _CABECERA.size, n)
+            columnas = []
+            for _ in CAMPOS_TEXTO:
+                valores, pos = _leer_columna(vista, pos, n)
+                columnas.append(valores)
+            indices = {}
+            for nombre in _INDICES:
+                claves, pos = _leer_columna(vista, pos, n)
+                ids_indice, pos = _leer_enteros(vista, pos, n)
+                indices[nombre] = list(zip(claves, ids_indice))
+
+    return dict(zip(ids, map(RegistroCliente, ids, *columnas))), siguiente_id, indices
+
+
+def _codificar(op: int, contenido: bytes) -> bytes:
+    crc = zlib.crc32(contenido, zlib.crc32(bytes((op,))))
+    return _CABECERA_LOG.pack(len(contenido), crc, op) + contenido
+
+
+def _codificar_upsert(registro: RegistroCliente) -> bytes:
+    partes = [_ID.pack(registro.id)]
+    for campo in CAMPOS_TEXTO:
+        valor = getattr(registro, campo)
+        if valor is None:
+            partes.append(_LONGITUD.pack(-1))
+        else:
+            datos = valor.encode("utf-8")
+            partes.append(_LONGITUD.pack(len(datos)))
+            partes.append(datos)
+    return _codificar(_OP_UPSERT, b"".join(partes))
+
+
+def _decodificar_upsert(contenido: bytes) -> RegistroCliente:
+    (cliente_id,) = _ID.unpack_from(contenido, 0)
+    pos = _ID.size
+    valores: List[str | None] = []
+    for _ in CAMPOS_TEXTO:
+        (longitud,) = _LONGITUD.unpack_from(contenido, pos)
+        pos += _LONGITUD.size
+        if longitud < 0:
+            valores.append(None)
+        else:
+            valores.append(contenido[pos:pos + longitud].decode("utf-8"))
+            pos += longitud
+    return RegistroCliente(cliente_id, *valores)
+
+
+def leer_log(datos: bytes) -> Iterator[Tuple[int, bytes, int]]:
+    """
+    Recorre las entradas de un log: (operación, contenido, offset del final de la entrada).
+    Se detiene en la primera entrada incompleta o con CRC incorrecto (escritura cortada por una caída).
+    """
+    pos = 0
+    while pos + _CABECERA_LOG.size <= len(datos):
+        longitud, crc, op = _CABECERA_LOG.unpack_from(datos, pos)
+        inicio = pos + _CABECERA_LOG.size
+        contenido = datos[inicio:inicio + longitud]
+        if len(contenido) < longitud or zlib.crc32(contenido, zlib.crc32(bytes((op,)))) != crc:
+            return
+        pos = inicio + longitud
+        yield op, contenido, pos
+
+
+class PersistenciaStore:
+    """
+    Durabilidad del `ClienteStore` con un log de escrituras (append-only) e instantáneas periódicas.
+
+    Los ficheros van por generaciones en `directorio`: `snapshot-N.bin` es el estado al empezar
+    `log-N.bin`. Al tomar una instantánea se pasa a escribir en `log-(N+1)` con el bloqueo del almacén
+    tomado, la instantánea se escribe fuera del bloqueo y, cuando está completa, se borran las
+    generaciones anteriores. Al arrancar se lee la última instantánea y se reproducen solo los logs
+    posteriores; una entrada cortada al final del log (caída a mitad de escritura) se descarta.
+    Un directorio pertenece a un único proceso (un solo worker de uvicorn).
+    """
+
+    def __init__(
+        self,
+        store: ClienteStore,
+        directorio: str,
+        fsync: bool = False,
+        intervalo: float = 60.0,
+        min_operaciones: int = 10000
+    ):
+        self.store = store
+        self.directorio = directorio
+        # Con fsync cada escritura llega al disco antes de responder; sin él sobrevive a la caída
+        # del proceso (ya está en el sistema operativo) pero no a la de la máquina
+        self.fsync = fsync
+        self.intervalo = intervalo
+        self.min_operaciones = min_operaciones
+        self._generacion = 0
+        self._log: Any = None
+        self._operaciones = 0
+        self._lock_instantanea = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo: threading.Thread | None = None
+        self._estadisticas: Dict[str, float] = {}
+
+    def _ruta(self, tipo: str, generacion: int) -> str:
+        return os.path.join(self.directorio, f"{tipo}-{generacion:08d}.bin")
+
+    def _generaciones(self, tipo: str) -> List[int]:
+        rutas = glob.glob(os.path.join(self.directorio, f"{tipo}-*.bin"))
+        return sorted(int(os.path.basename(r)[len(tipo) + 1:-4]) for r in rutas)
+
+    # --- Arranque ---
+
+    def abrir(self, iniciales: List[RegistroCliente] | None = None) -> None:
+        """
+        Recupera el almacén del disco y empieza a registrar sus escrituras. Si el directorio
+        está vacío se parte de `iniciales`.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        inicio = time.perf_counter()
+        # Sin recolector durante la carga: con millones de objetos nuevos sus pasadas dominan el tiempo
+        gc.disable()
+        try:
+            reproducidas = self._recuperar(iniciales or [])
+        finally:
+            gc.enable()
+        # Los registros cargados viven hasta el final: los sacamos de las pasadas del recolector
+        gc.freeze()
+        self._estadisticas["carga_segundos"] = time.perf_counter() - inicio
+        self._estadisticas["entradas_reproducidas"] = reproducidas
+
+        self._log = open(self._ruta("log", self._generacion), "ab", buffering=0)
+        self.store.fijar_diario(self)
+        if self.intervalo > 0:
+            self._hilo = threading.Thread(target=self._instantaneas_periodicas, daemon=True)
+            self._hilo.start()
+
+    def _recuperar(self, iniciales: List[RegistroCliente]) -> int:
+        """Carga la última instantánea y reproduce los logs posteriores; devuelve las entradas reproducidas."""
+        instantaneas = self._generaciones("snapshot")
+        logs = self._generaciones("log")
+        if not instantaneas and not logs:
+            # Primer arranque: la instantánea 0 contiene los datos iniciales
+            self.store.cargar({r.id: r for r in iniciales})
+            escribir_instantanea(self._ruta("snapshot", 0), *self.store.instantanea())
+            self._generacion = 0
+            return 0
+
+        base = instantaneas[-1] if instantaneas else 0
+        if instantaneas:
+            self.store.cargar(*leer_instantanea(self._ruta("snapshot", base)))
+        else:
+            self.store.cargar({})
+
+        reproducidas = 0
+        pendientes = [g for g in logs if g >= base]
+        for generacion in pendientes:
+            ruta = self._ruta("log", generacion)
+            with open(ruta, "rb") as f:
+                datos = f.read()
+            valido = 0
+            for op, contenido, valido in leer_log(datos):
+                if op == _OP_UPSERT:
+                    self.store.restaurar(_decodificar_upsert(contenido))
+                elif op == _OP_ELIMINAR:
+                    self.store.eliminar(_ID.unpack_from(contenido, 0)[0])
+                reproducidas += 1
+            if valido < len(datos):
+                # Cola cortada por una caída: se descarta para poder seguir añadiendo detrás
+                with open(ruta, "r+b") as f:
+                    f.truncate(valido)
+
+        self._generacion = max([base, *pendientes])
+        self._operaciones = reproducidas
+        self._borrar_anteriores(base)
+        return reproducidas
+
+    # --- Diario (lo llama el almacén con su bloqueo tomado) ---
+
+    def _escribir(self, entrada: bytes) -> None:
+        self._log.write(entrada)
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._operaciones += 1
+
+    def upsert(self, registro: RegistroCliente) -> None:
+        self._escribir(_codificar_upsert(registro))
+
+    def eliminar(self, cliente_id: int) -> None:
+        self._escribir(_codificar(_OP_ELIMINAR, _ID.pack(cliente_id)))
+
+    # --- Instantáneas ---
+
+    def instantanea(self) -> str:
+        """Escribe una instantánea del estado actual y borra los ficheros que deja obsoletos."""
+        with self._lock_instantanea:
+            inicio = time.perf_counter()
+
+            def rotar_log() -> None:
+                self._log.close()
+                self._generacion += 1
+                self._log = open(self._ruta("log", self._generacion), "ab", buffering=0)
+                self._operaciones = 0
+
+            registros, siguiente_id, indices = self.store.instantanea(rotar_log)
+            generacion = self._generacion
+            ruta = self._ruta("snapshot", generacion)
+            escribir_instantanea(ruta, registros, siguiente_id, indices)
+            self._borrar_anteriores(generacion)
+            self._estadisticas["instantanea_segundos"] = time.perf_counter() - inicio
+            self._estadisticas["instantanea_registros"] = len(registros)
+            return ruta
+
+    def _borrar_anteriores(self, generacion: int) -> None:
+        for tipo in ("snapshot", "log"):
+            for anterior in self._generaciones(tipo):
+                if anterior < generacion:
+                    os.remove(self._ruta(tipo, anterior))
+
+    def _instantaneas_periodicas(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            if self._operaciones >= self.min_operaciones:
+                try:
+                    self.instantanea()
+                except OSError:
+                    # Disco lleno o similar: el log sigue siendo válido, se reintentará
+                    pass
+
+    def cerrar(self, instantanea: bool = True) -> None:
+        """Detiene las instantáneas periódicas y, si hay escrituras pendientes, deja una instantánea final."""
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        if self._log is None:
+            return
+        if instantanea and self._operaciones:
+            self.instantanea()
+        self.store.fijar_diario(None)
+        self._log.close()
+        self._log = None
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "generacion": self._generacion,
+            "operaciones_log": self._operaciones,
+            **self._estadisticas,
+        }
@@ -0,0 +1,280 @@
+import heapq
+import re
+import threading
+import unicodedata
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterator, List, Protocol, Tuple
+
+from sortedcontainers import SortedList
+
+# Límite superior para los rangos por prefijo: mayor que cualquier carácter real
+_FIN_PREFIJO = "\U0010ffff"
+# Marcas diacríticas combinantes (tildes, diéresis, virgulilla...) que deja la descomposición NFKD
+_DIACRITICOS = re.compile("[\u0300-\u036f]")
+
+
+class EmailDuplicado(Exception):
+    """Se lanza al crear o actualizar un cliente con un email que ya usa otro cliente."""
+
+
+def normalizar(texto: str) -> str:
+    """Clave de ordenación y búsqueda: minúsculas y sin tildes ("Núñez" -> "nunez")."""
+    if texto.isascii():
+        return texto.lower()
+    return _DIACRITICOS.sub("", unicodedata.normalize("NFKD", texto.casefold()))
+
+
+class RegistroCliente:
+    """
+    Fila compacta del almacén: `__slots__` en lugar de un modelo pydantic por cliente
+    (sin __dict__ ni validadores), unas 3 veces menos memoria con millones de filas.
+    """
+
+    __slots__ = ("id", "nombre", "apellido", "email", "telefono", "direccion")
+
+    def __init__(
+        self,
+        id: int,
+        nombre: str,
+        apellido: str,
+        email: str,
+        telefono: str | None = None,
+        direccion: str | None = None
+    ):
+        self.id = id
+        self.nombre = nombre
+        self.apellido = apellido
+        self.email = email
+        self.telefono = telefono
+        self.direccion = direccion
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+
+class Diario(Protocol):
+    """Registro de escrituras (ver app/persistence.py): se llama con el bloqueo del almacén tomado."""
+
+    def upsert(self, registro: RegistroCliente) -> None:
+        ...
+
+    def eliminar(self, cliente_id: int) -> None:
+        ...
+
+
+class ClienteStore:
+    """
+    Almacén de clientes en memoria con índices:
+
+    - `_por_id`: dict id -> registro (índice primario).
+    - `_por_email`: dict email en minúsculas -> id (unicidad del email).
+    - `_ids`: ids ordenados, para recorrer el listado por páginas.
+    - `_por_nombre` / `_por_apellido`: (clave normalizada, id) ordenados, para rangos y prefijos.
+
+    Todas las operaciones son O(log n) (más el tamaño del resultado). Es seguro entre hilos.
+    Si tiene `diario`, cada escritura se registra en él antes de aplicarse.
+    """
+
+    def __init__(self):
+        self.diario: Diario | None = None
+        self._lock = threading.RLock()
+        self._por_id: Dict[int, RegistroCliente] = {}
+        self._por_email: Dict[str, int] = {}
+        self._ids = SortedList()
+        self._por_nombre = SortedList()
+        self._por_apellido = SortedList()
+        self._siguiente_id = 1
+
+    def __len__(self) -> int:
+        return len(self._por_id)
+
+    # --- Índices ---
+
+    def _indexar(self, registro: RegistroCliente) -> None:
+        self._por_email[registro.email.lower()] = registro.id
+        self._por_nombre.add((normalizar(registro.nombre), registro.id))
+        self._por_apellido.add((normalizar(registro.apellido), registro.id))
+
+    def _desindexar(self, registro: RegistroCliente) -> None:
+        del self._por_email[registro.email.lower()]
+        self._por_nombre.remove((normalizar(registro.nombre), registro.id))
+        self._por_apellido.remove((normalizar(registro.apellido), registro.id))
+
+    def _comprobar_email(self, email: str, cliente_id: int | None = None) -> None:
+        duenio = self._por_email.get(email.lower())
+        if duenio is not None and duenio != cliente_id:
+            raise EmailDuplicado(f"Ya existe un cliente con el email {email}")
+
+    def fijar_diario(self, diario: Diario | None) -> None:
+        """Conecta (o desconecta) el diario sin que ninguna escritura quede a medias."""
+        with self._lock:
+            self.diario = diario
+
+    # --- Escrituras ---
+
+    def cargar(
+        self,
+        registros: Dict[int, RegistroCliente],
+        siguiente_id: int | None = None,
+        indices: Dict[str, List[Tuple[str, int]]] | None = None
+    ) -> None:
+        """
+        Sustituye el contenido por `registros` (id -> registro; carga inicial): construye cada
+        índice ordenando una sola vez en lugar de insertar fila a fila. `indices` permite pasar
+        ya calculados y ordenados los de nombre y apellido (ver `instantanea`). No pasa por el diario.
+        """
+        ids = list(registros)
+        valores = list(registros.values())
+        indices = indices or {}
+        with self._lock:
+            self._por_id = registros
+            self._por_email = dict(zip(map(str.lower, map(attrgetter("email"), valores)), ids))
+            if len(self._por_email) != len(self._por_id):
+                raise EmailDuplicado("Hay emails repetidos en los datos cargados")
+            self._ids = SortedList(ids)
+            # Ordenar una entrada ya ordenada es lineal (Timsort)
+            self._por_nombre = SortedList(
+                indices.get("nombre") or zip(map(normalizar, map(attrgetter("nombre"), valores)), ids)
+            )
+            self._por_apellido = SortedList(
+                indices.get("apellido") or zip(map(normalizar, map(attrgetter("apellido"), valores)), ids)
+            )
+            self._siguiente_id = max(siguiente_id or 1, self._ids[-1] + 1 if self._ids else 1)
+
+    def restaurar(self, registro: RegistroCliente) -> None:
+        """Inserta o reemplaza un registro tal cual, sin diario ni comprobaciones (reproducción del log)."""
+        with self._lock:
+            anterior = self._por_id.get(registro.id)
+            if anterior is not None:
+                self._desindexar(anterior)
+            else:
+                self._ids.add(registro.id)
+            self._por_id[registro.id] = registro
+            self._indexar(registro)
+            self._siguiente_id = max(self._siguiente_id, registro.id + 1)
+
+    def crear(self, datos: Dict[str, Any], cliente_id: int | None = None) -> RegistroCliente:
+        """Da de alta un cliente; el id se asigna si no se indica. `EmailDuplicado` si el email existe."""
+        with self._lock:
+            self._comprobar_email(datos["email"])
+            if cliente_id is None:
+                cliente_id = self._siguiente_id
+            elif cliente_id in self._por_id:
+                raise ValueError(f"Ya existe un cliente con el id {cliente_id}")
+            registro = RegistroCliente(
+                cliente_id, datos["nombre"], datos["apellido"], datos["email"],
+                datos.get("telefono"), datos.get("direccion")
+            )
+            if self.diario is not None:
+                self.diario.upsert(registro)
+            self._por_id[cliente_id] = registro
+            self._ids.add(cliente_id)
+            self._indexar(registro)
+            self._siguiente_id = max(self._siguiente_id, cliente_id + 1)
+            return registro
+
+    def actualizar(self, cliente_id: int, datos: Dict[str, Any]) -> RegistroCliente | None:
+        """Reemplaza los datos de un cliente; None si no existe."""
+        with self._lock:
+            registro = self._por_id.get(cliente_id)
+            if registro is None:
+                return None
+            self._comprobar_email(datos["email"], cliente_id)
+            nuevo = RegistroCliente(
+                cliente_id, datos["nombre"], datos["apellido"], datos["email"],
+                datos.get("telefono"), datos.get("direccion")
+            )
+            if self.diario is not None:
+                self.diario.upsert(nuevo)
+            self._desindexar(registro)
+            self._por_id[cliente_id] = nuevo
+            self._indexar(nuevo)
+            return nuevo
+
+    def eliminar(self, cliente_id: int) -> bool:
+        with self._lock:
+            if cliente_id not in self._por_id:
+                return False
+            if self.diario is not None:
+                self.diario.eliminar(cliente_id)
+            registro = self._por_id.pop(cliente_id)
+            self._ids.remove(cliente_id)
+            self._desindexar(registro)
+            return True
+
+    # --- Lecturas ---
+
+    def obtener(self, cliente_id: int) -> RegistroCliente | None:
+        return self._por_id.get(cliente_id)
+
+    def por_email(self, email: str) -> RegistroCliente | None:
+        with self._lock:
+            cliente_id = self._por_email.get(email.lower())
+            return self._por_id.get(cliente_id) if cliente_id is not None else None
+
+    def pagina(self, limite: int, despues: int | None = None) -> List[RegistroCliente]:
+        """Hasta `limite` clientes por id, a partir del primero con id mayor que `despues`."""
+        with self._lock:
+            ids = self._ids.irange(minimum=despues, inclusive=(False, True)) if despues is not None else iter(self._ids)
+            return [self._por_id[i] for _, i in zip(range(limite), ids)]
+
+    def rango_nombre(
+        self,
+        desde: str,
+        hasta: str | None = None,
+        limite: int = 50,
+        campo: str = "nombre"
+    ) -> List[RegistroCliente]:
+        """Clientes con `campo` (nombre o apellido) entre `desde` y `hasta` (incluidos), en orden alfabético."""
+        indice = self._por_nombre if campo == "nombre" else self._por_apellido
+        minimo = (normalizar(desde),)
+        maximo = (normalizar(hasta) + _FIN_PREFIJO,) if hasta is not None else None
+        with self._lock:
+            claves = indice.irange(minimo, maximo)
+            return [self._por_id[i] for _, (_, i) in zip(range(limite), claves)]
+
+    def buscar_prefijo(self, prefijo: str, limite: int = 20) -> List[RegistroCliente]:
+        """
+        Clientes cuyo nombre o apellido empieza por `prefijo` (sin tildes ni mayúsculas), ordenados
+        por el texto que coincide (si coinciden los dos, por el menor) y después por id.
+
+        Mezcla los dos rangos de índices a medida que avanza, así que solo lee los primeros
+        resultados de cada uno (no todos los que empiezan por el prefijo).
+        """
+        clave = normalizar(prefijo.strip())
+        if not clave:
+            return []
+        minimo, maximo = (clave,), (clave + _FIN_PREFIJO,)
+        with self._lock:
+            encontrados: Dict[int, RegistroCliente] = {}
+            rangos = heapq.merge(self._por_apellido.irange(minimo, maximo), self._por_nombre.irange(minimo, maximo))
+            for _, cliente_id in rangos:
+                if len(encontrados) == limite:
+                    break
+                # Quien coincide por nombre y apellido sale en el primero de los dos
+                encontrados.setdefault(cliente_id, self._por_id[cliente_id])
+        return list(encontrados.values())
+
+    def __iter__(self) -> Iterator[RegistroCliente]:
+        with self._lock:
+            registros = [self._por_id[i] for i in self._ids]
+        return iter(registros)
+
+    def instantanea(
+        self,
+        al_copiar: Callable[[], None] | None = None
+    ) -> Tuple[List[RegistroCliente], int, Dict[str, List[Tuple[str, int]]]]:
+        """
+        Copia coherente del contenido: (registros por id, siguiente id, índices de nombre y apellido).
+        `al_copiar` se ejecuta con el bloqueo aún tomado, de modo que ninguna escritura queda entre
+        la copia y lo que haga. Los registros no se modifican in situ, así que basta con copiar listas.
+        """
+        with self._lock:
+            registros = [self._por_id[i] for i in self._ids]
+            indices = {"nombre": list(self._por_nombre), "apellido": list(self._por_apellido)}
+            if al_copiar is not None:
+                al_copiar()
+            return registros, self._siguiente_id, indices
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {"clientes": len(self._por_id), "siguiente_id": self._siguiente_id}
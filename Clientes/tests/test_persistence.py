@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from app.persistence import PersistenciaStore, leer_log
+from app.store import ClienteStore
+
+
+def _datos(n: int) -> dict:
+    return {"nombre": f"Nombre{n}", "apellido": f"Apellido{n}", "email": f"cliente{n}@ejemplo.com"}
+
+
+def _abrir(directorio) -> PersistenciaStore:
+    # Sin hilo de instantáneas periódicas: las pruebas deciden cuándo se toman
+    persistencia = PersistenciaStore(ClienteStore(), str(directorio), intervalo=0)
+    persistencia.abrir()
+    return persistencia
+
+
+def _ruta_log(persistencia: PersistenciaStore) -> str:
+    return persistencia._ruta("log", persistencia._generacion)
+
+
+@pytest.fixture
+def directorio(tmp_path):
+    return tmp_path / "datos"
+
+
+def test_reproduce_el_log_al_reiniciar(directorio):
+    persistencia = _abrir(directorio)
+    store = persistencia.store
+    for n in (1, 2, 3):
+        store.crear(_datos(n))
+    store.actualizar(1, {**_datos(1), "telefono": "600000000"})
+    store.eliminar(3)
+    persistencia.cerrar(instantanea=False)
+
+    persistencia = _abrir(directorio)
+    store = persistencia.store
+    assert persistencia.estadisticas()["entradas_reproducidas"] == 5
+    assert sorted(r.id for r in store) == [1, 2]
+    assert store.obtener(1).telefono == "600000000"
+    assert store.obtener(3) is None
+    persistencia.cerrar(instantanea=False)
+
+
+def test_descarta_la_entrada_cortada_al_final_del_log(directorio):
+    persistencia = _abrir(directorio)
+    persistencia.store.crear(_datos(1))
+    persistencia.store.crear(_datos(2))
+    ruta = _ruta_log(persistencia)
+    persistencia.cerrar(instantanea=False)
+
+    # Simula una caída a mitad de escribir la segunda entrada
+    with open(ruta, "rb") as f:
+        datos = f.read()
+    (_, _, fin_primera), _ = leer_log(datos)
+    with open(ruta, "r+b") as f:
+        f.truncate(len(datos) - 3)
+
+    persistencia = _abrir(directorio)
+    assert [r.id for r in persistencia.store] == [1]
+    # La cola cortada se elimina para que las escrituras nuevas se puedan leer detrás
+    assert os.path.getsize(ruta) == fin_primera
+    persistencia.store.crear(_datos(3))
+    persistencia.cerrar(instantanea=False)
+
+    persistencia = _abrir(directorio)
+    assert sorted(r.email for r in persistencia.store) == ["cliente1@ejemplo.com", "cliente3@ejemplo.com"]
+    persistencia.cerrar(instantanea=False)
+
+
+def test_descarta_la_entrada_con_crc_incorrecto(directorio):
+    persistencia = _abrir(directorio)
+    persistencia.store.crear(_datos(1))
+    persistencia.store.crear(_datos(2))
+    ruta = _ruta_log(persistencia)
+    persistencia.cerrar(instantanea=False)
+
+    with open(ruta, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        ultimo = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes((ultimo[0] ^ 0xFF,)))
+
+    persistencia = _abrir(directorio)
+    assert [r.id for r in persistencia.store] == [1]
+    persistencia.cerrar(instantanea=False)
+
+
+def test_instantanea_rota_el_log_y_borra_las_generaciones_anteriores(directorio):
+    persistencia = _abrir(directorio)
+    for n in (1, 2, 3):
+        persistencia.store.crear(_datos(n))
+    persistencia.instantanea()
+    persistencia.store.eliminar(1)
+    persistencia.cerrar(instantanea=False)
+
+    assert sorted(os.listdir(directorio)) == ["log-00000001.bin", "snapshot-00000001.bin"]
+
+    persistencia = _abrir(directorio)
+    # Solo se reproduce lo escrito después de la instantánea
+    assert persistencia.estadisticas()["entradas_reproducidas"] == 1
+    assert sorted(r.id for r in persistencia.store) == [2, 3]
+    assert [r.id for r in persistencia.store.buscar_prefijo("nombre")] == [2, 3]
+    persistencia.cerrar(instantanea=False)
@@ -0,0 +1,18 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database import POOL_SIZE
+
+# Un hilo por conexión del pool: las consultas bloqueantes de mysql.connector se ejecutan
+# aquí y el event loop queda libre para atender otras peticiones mientras tanto.
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func, *args, **kwargs):
+    """Ejecutar una función bloqueante de database.py sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    # Copiamos el contexto para que los spans de comun.metrics midan dentro del hilo
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, func, *args, **kwargs))
@@ -1,103 +1,525 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import DataError, Error, IntegrityError
+from mysql.connector.constants import ClientFlag
+from mysql.connector.pooling import MySQLConnectionPool
 import os
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta
 from dotenv import load_dotenv
+from comun.metrics import span
 
 load_dotenv()
 
+# Tamaño del pool; app/async_db.py usa el mismo número de hilos para no agotarlo nunca
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Crear (la primera vez) el pool de conexiones compartido"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = MySQLConnectionPool(
+                    pool_name='gestion360',
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=True,
+                    host=os.getenv('DB_HOST'),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASSWORD'),
+                    database=os.getenv('DB_NAME'),
+                    port=int(os.getenv('DB_PORT', 3306)),
+                    # rowcount de UPDATE = filas encontradas: guardar sin cambios no es "no encontrado"
+                    client_flags=[ClientFlag.FOUND_ROWS]
+                )
+    return _pool
+
+
 def get_connection():
-    """Crear conexión con la base de datos MySQL"""
+    """Obtener una conexión del pool (close() la devuelve al pool)"""
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_NAME'),
-            port=int(os.getenv('DB_PORT', 3306))
-        )
+        with span("db_connect"):
+            connection = _get_pool().get_connection()
         if connection.is_connected():
             return connection
+        # Una conexión caída también ocupa un hueco del pool: hay que devolverla (el pool la reconecta
+        # la próxima vez que la entregue)
+        _cerrar(connection)
+        return None
     except Error as e:
         print(f"Error de conexión: {e}")
         return None
 
-def get_empleados():
-    """Obtener todos los empleados"""
+
+def _cerrar(connection, cursor=None):
+    """
+    Cerrar el cursor y devolver la conexión al pool aunque se haya caído: con el pool, close() es lo
+    que libera el hueco, y un hueco sin devolver se pierde hasta reiniciar la app.
+    """
+    try:
+        if cursor is not None:
+            cursor.close()
+    except Error:
+        pass
+    try:
+        connection.close()
+    except Error:
+        # Con pool_reset_session el reset falla si la conexión está caída, pero vuelve al pool igualmente
+        pass
+
+# Columnas en el orden en que las devuelve la API
+COLUMNAS_EMPLEADO = "id, Nombre, PrimerApellido, SegundoApellido, Departamento, Tipo_de_Jornada, Horas, Hora_de_fichar, Sueldo"
+
+INSERT_EMPLEADO = """INSERT INTO empleado (Nombre, PrimerApellido, SegundoApellido, Departamento, Tipo_de_Jornada, Horas, Hora_de_fichar, Sueldo)
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
+
+# Filas por sentencia en las operaciones por lotes (INSERT multi-fila, IN (...), CASE)
+LOTE_FILAS = 1000
+
+# Campos que puede cambiar una revisión de nómina por lotes
+CAMPOS_NOMINA = ("Sueldo", "Horas", "Tipo_de_Jornada")
+
+INSERT_FICHAJE = "INSERT INTO fichaje (empleado_id, momento, tipo) VALUES (%s, %s, %s)"
+
+UPSERT_FICHAJE_DIARIO = """INSERT INTO fichaje_diario (empleado_id, fecha, segundos, fichajes, primera_entrada, ultima_salida)
+                           VALUES (%s, %s, %s, %s, %s, %s)
+                           ON DUPLICATE KEY UPDATE segundos = VALUES(segundos), fichajes = VALUES(fichajes),
+                               primera_entrada = VALUES(primera_entrada), ultima_salida = VALUES(ultima_salida)"""
+
+UPSERT_FICHAJE_SEMANAL = """INSERT INTO fichaje_semanal (empleado_id, semana, segundos, dias)
+                            VALUES (%s, %s, %s, %s)
+                            ON DUPLICATE KEY UPDATE segundos = VALUES(segundos), dias = VALUES(dias)"""
+
+# Tabla, columna de fecha y columna de recuento de cada agregado de fichajes
+AGREGADOS_FICHAJE = {
+    "dia": ("fichaje_diario", "fecha", "fichajes"),
+    "semana": ("fichaje_semanal", "semana", "dias"),
+}
+
+
+def _filtros(departamento=None, tipo_jornada=None, sueldo_min=None, sueldo_max=None):
+    """Cláusula WHERE y parámetros para los filtros recibidos (los None no filtran)"""
+    condiciones, params = [], []
+    if departamento is not None:
+        condiciones.append("Departamento = %s")
+        params.append(departamento)
+    if tipo_jornada is not None:
+        condiciones.append("Tipo_de_Jornada = %s")
+        params.append(tipo_jornada)
+    if sueldo_min is not None:
+        condiciones.append("Sueldo >= %s")
+        params.append(sueldo_min)
+    if sueldo_max is not None:
+        condiciones.append("Sueldo <= %s")
+        params.append(sueldo_max)
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return where, params
+
+def buscar_empleados(departamento=None, tipo_jornada=None, sueldo_min=None, sueldo_max=None, limite=25, despues=None):
+    """
+    Página de empleados que cumplen los filtros, ordenada por id.
+    Paginación por cursor: `despues` es el último id de la página anterior, así que el coste
+    no depende de lo avanzada que esté la página. Devuelve (empleados, total, siguiente).
+    """
     connection = get_connection()
     if not connection:
-        return []
+        return None
     
+    where, params = _filtros(departamento, tipo_jornada, sueldo_min, sueldo_max)
+    condicion_cursor = ""
+    params_pagina = list(params)
+    if despues is not None:
+        condicion_cursor = (" AND " if where else " WHERE ") + "id > %s"
+        params_pagina.append(despues)
+    
+    cursor = None
     try:
         cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM empleado")
-        empleados = cursor.fetchall()
-        return empleados
+        with span("query"):
+            # Se pide una fila de más para saber si hay página siguiente
+            cursor.execute(
+                f"SELECT {COLUMNAS_EMPLEADO} FROM empleado{where}{condicion_cursor} ORDER BY id LIMIT %s",
+                (*params_pagina, limite + 1)
+            )
+            empleados = cursor.fetchall()
+            cursor.execute(f"SELECT COUNT(*) AS total FROM empleado{where}", tuple(params))
+            total = cursor.fetchone()["total"]
+        siguiente = None
+        if len(empleados) > limite:
+            empleados = empleados[:limite]
+            siguiente = empleados[-1]["id"]
+        return empleados, total, siguiente
     except Error as e:
         print(f"Error al obtener empleados: {e}")
-        return []
+        return None
     finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        _cerrar(connection, cursor)
+
+def resumen_departamentos(tipo_jornada=None, sueldo_min=None, sueldo_max=None):
+    """Plantilla, sueldo total y medio y horas totales por departamento, agregados en SQL"""
+    connection = get_connection()
+    if not connection:
+        return None
+    
+    where, params = _filtros(None, tipo_jornada, sueldo_min, sueldo_max)
+    query = f"""SELECT Departamento, COUNT(*) AS empleados, COALESCE(SUM(Sueldo), 0) AS sueldo_total,
+                       AVG(Sueldo) AS sueldo_medio, COALESCE(SUM(Horas), 0) AS horas_total
+                FROM empleado{where}
+                GROUP BY Departamento
+                ORDER BY Departamento"""
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+        with span("query"):
+            cursor.execute(query, tuple(params))
+            departamentos = cursor.fetchall()
+        return departamentos
+    except Error as e:
+        print(f"Error al obtener resumen por departamento: {e}")
+        return None
+    finally:
+        _cerrar(connection, cursor)
+
+def obtener_empleado(empleado_id):
+    """Obtener un empleado por id (búsqueda por clave primaria)"""
+    connection = get_connection()
+    if not connection:
+        return None
+    
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+        with span("query"):
+            cursor.execute(f"SELECT {COLUMNAS_EMPLEADO} FROM empleado WHERE id = %s", (empleado_id,))
+            empleado = cursor.fetchone()
+        return empleado
+    except Error as e:
+        print(f"Error al obtener empleado: {e}")
+        return None
+    finally:
+        _cerrar(connection, cursor)
 
 def agregar_empleado(nombre, primer_apellido, segundo_apellido, departamento, tipo_jornada, horas, hora_fichar, sueldo):
-    """Agregar un nuevo empleado"""
+    """Agregar un nuevo empleado; devuelve su id (None si falla)"""
     connection = get_connection()
     if not connection:
-        return False
+        return None
     
+    cursor = None
     try:
         cursor = connection.cursor()
-        query = """INSERT INTO empleado (Nombre, PrimerApellido, SegundoApellido, Departamento, Tipo_de_Jornada, Horas, Hora_de_fichar, Sueldo)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-        cursor.execute(query, (nombre, primer_apellido, segundo_apellido, departamento, tipo_jornada, horas, hora_fichar, sueldo))
-        connection.commit()
-        return True
+        with span("query"):
+            cursor.execute(INSERT_EMPLEADO, (nombre, primer_apellido, segundo_apellido, departamento, tipo_jornada, horas, hora_fichar, sueldo))
+            connection.commit()
+        return cursor.lastrowid
     except Error as e:
         print(f"Error al agregar empleado: {e}")
-        return False
+        return None
     finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        _cerrar(connection, cursor)
 
-def eliminar_empleado(nombre):
-    """Eliminar un empleado por nombre"""
+def eliminar_empleado(empleado_id):
+    """Eliminar un empleado por id"""
     connection = get_connection()
     if not connection:
         return False
     
+    cursor = None
     try:
         cursor = connection.cursor()
-        query = "DELETE FROM empleado WHERE Nombre = %s"
-        cursor.execute(query, (nombre,))
-        connection.commit()
+        query = "DELETE FROM empleado WHERE id = %s"
+        with span("query"):
+            cursor.execute(query, (empleado_id,))
+            connection.commit()
         return cursor.rowcount > 0
     except Error as e:
         print(f"Error al eliminar empleado: {e}")
         return False
     finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        _cerrar(connection, cursor)
 
-def actualizar_empleado(nombre, primer_apellido, segundo_apellido, departamento, tipo_jornada, horas, hora_fichar, sueldo):
-    """Actualizar datos de un empleado"""
+def actualizar_empleado(empleado_id, nombre, primer_apellido, segundo_apellido, departamento, tipo_jornada, horas, hora_fichar, sueldo):
+    """Actualizar datos de un empleado por id"""
     connection = get_connection()
     if not connection:
         return False
     
+    cursor = None
     try:
         cursor = connection.cursor()
-        query = """UPDATE empleado SET PrimerApellido=%s, SegundoApellido=%s, Departamento=%s, 
-                   Tipo_de_Jornada=%s, Horas=%s, Hora_de_fichar=%s, Sueldo=%s WHERE Nombre=%s"""
-        cursor.execute(query, (primer_apellido, segundo_apellido, departamento, tipo_jornada, horas, hora_fichar, sueldo, nombre))
-        connection.commit()
+        query = """UPDATE empleado SET Nombre=%s, PrimerApellido=%s, SegundoApellido=%s, Departamento=%s,
+                   Tipo_de_Jornada=%s, Horas=%s, Hora_de_fichar=%s, Sueldo=%s WHERE id=%s"""
+        with span("query"):
+            cursor.execute(query, (nombre, primer_apellido, segundo_apellido, departamento, tipo_jornada, horas, hora_fichar, sueldo, empleado_id))
+            connection.commit()
         return cursor.rowcount > 0
     except Error as e:
         print(f"Error al actualizar empleado: {e}")
         return False
     finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        _cerrar(connection, cursor)
+
+def _bloques(filas):
+    for i in range(0, len(filas), LOTE_FILAS):
+        yield filas[i:i + LOTE_FILAS]
+
+def agregar_empleados_lote(empleados):
+    """
+    Insertar muchos empleados en una sola transacción: todos o ninguno.
+    `empleados` son tuplas en el orden de INSERT_EMPLEADO; executemany envía cada bloque
+    de LOTE_FILAS como un único INSERT multi-fila. Devuelve las filas insertadas (None si falla).
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+    
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        with span("query"):
+            for bloque in _bloques(empleados):
+                cursor.executemany(INSERT_EMPLEADO, bloque)
+            connection.commit()
+        return len(empleados)
+    except Error as e:
+        print(f"Error al agregar empleados por lotes: {e}")
+        connection.rollback()
+        return None
+    finally:
+        _cerrar(connection, cursor)
+
+def actualizar_nomina_lote(revisiones, simular=False):
+    """
+    Aplicar revisiones de nómina ({"id": ..., "Sueldo": ..., ...}) en una sola transacción.
+    Primero bloquea las filas afectadas (SELECT ... FOR UPDATE) y comprueba que existen; si falta
+    alguna, o en simulación, deshace sin escribir nada. Después actualiza cada bloque con un único
+    UPDATE ... SET campo = CASE id ... END. Devuelve (aplicadas, ids_no_encontrados) o None si falla.
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+    
+    ids = [r["id"] for r in revisiones]
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        with span("query"):
+            existentes = set()
+            for bloque in _bloques(ids):
+                marcadores = ", ".join(["%s"] * len(bloque))
+                cursor.execute(f"SELECT id FROM empleado WHERE id IN ({marcadores}) FOR UPDATE", tuple(bloque))
+                existentes.update(fila[0] for fila in cursor.fetchall())
+            no_encontrados = [i for i in ids if i not in existentes]
+            if no_encontrados or simular:
+                connection.rollback()
+                return 0, no_encontrados
+            
+            for bloque in _bloques(revisiones):
+                asignaciones, params = [], []
+                for campo in CAMPOS_NOMINA:
+                    casos = [r for r in bloque if r.get(campo) is not None]
+                    if not casos:
+                        continue
+                    asignaciones.append(f"{campo} = CASE id {' '.join(['WHEN %s THEN %s'] * len(casos))} ELSE {campo} END")
+                    for r in casos:
+                        params.extend((r["id"], r[campo]))
+                marcadores = ", ".join(["%s"] * len(bloque))
+                params.extend(r["id"] for r in bloque)
+                cursor.execute(f"UPDATE empleado SET {', '.join(asignaciones)} WHERE id IN ({marcadores})", tuple(params))
+            connection.commit()
+        return len(revisiones), []
+    except Error as e:
+        print(f"Error al actualizar nómina por lotes: {e}")
+        connection.rollback()
+        return None
+    finally:
+        _cerrar(connection, cursor)
+
+def lunes(fecha):
+    """Primer día de la semana (lunes) que contiene `fecha`; identifica la semana en fichaje_semanal"""
+    return fecha - timedelta(days=fecha.weekday())
+
+# Un turno dura menos de esto: una entrada sin salida en ese plazo ya no se empareja
+MAX_TURNO = timedelta(hours=24)
+
+def _turnos(eventos):
+    """
+    Pares (entrada, salida) de unos eventos ordenados por momento. Cada salida cierra la primera
+    entrada desde la salida anterior, si es de menos de MAX_TURNO antes; una entrada repetida o una
+    salida sin entrada no suman. Como un turno dura menos de MAX_TURNO, el par de una salida solo
+    depende de los eventos de las 24 h anteriores.
+    """
+    pares, abiertas = [], []
+    for momento, tipo in eventos:
+        if tipo == "entrada":
+            abiertas.append(momento)
+        else:
+            validas = [entrada for entrada in abiertas if momento - entrada < MAX_TURNO]
+            if validas:
+                pares.append((validas[0], momento))
+            abiertas = []
+    return pares
+
+def _resumir_dia(eventos, fecha):
+    """
+    (segundos trabajados, fichajes, primera entrada, última salida) del día `fecha`. `eventos` son
+    los del día anterior, el propio día y el siguiente, ordenados por momento: un turno que cruza la
+    medianoche (entrada a las 22:00, salida a las 06:00) reparte sus horas entre los dos días.
+    """
+    inicio = datetime.combine(fecha, time.min)
+    fin = inicio + timedelta(days=1)
+    segundos, ultima_salida = 0, None
+    for entrada, salida in _turnos(eventos):
+        solape = min(salida, fin) - max(entrada, inicio)
+        if solape > timedelta(0):
+            segundos += int(solape.total_seconds())
+        if inicio <= salida < fin:
+            ultima_salida = salida
+    del_dia = [(momento, tipo) for momento, tipo in eventos if momento.date() == fecha]
+    primera_entrada = next((momento for momento, tipo in del_dia if tipo == "entrada"), None)
+    return segundos, len(del_dia), primera_entrada, ultima_salida
+
+def _condiciones_rango(columna_id, columna_fecha, claves, dias):
+    """WHERE con un rango [fecha, fecha + dias) por cada (id, fecha); el optimizador lo resuelve como unión de rangos del índice"""
+    condiciones = " OR ".join([f"({columna_id} = %s AND {columna_fecha} >= %s AND {columna_fecha} < %s)"] * len(claves))
+    params = []
+    for id_, fecha in claves:
+        params.extend((id_, fecha, fecha + timedelta(days=dias)))
+    return condiciones, tuple(params)
+
+def guardar_fichajes(fichajes):
+    """
+    Guardar un lote de fichajes (empleado_id, momento, tipo) y, en la misma transacción, recalcular
+    fichaje_diario y fichaje_semanal solo para los días y semanas afectados. Un evento puede cambiar
+    turnos que cruzan la medianoche, así que se recalculan su día, el anterior y el siguiente, cada uno
+    desde los eventos de ese día y sus vecinos: da igual el orden en que lleguen. Devuelve True si se guardó y False si
+    la base de datos no está disponible (merece la pena reintentar); los errores en los datos
+    (IntegrityError, DataError) se relanzan porque reintentar el mismo lote volvería a fallar.
+    """
+    connection = get_connection()
+    if not connection:
+        return False
+    
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        with span("query"):
+            for bloque in _bloques(fichajes):
+                cursor.executemany(INSERT_FICHAJE, bloque)
+            
+            un_dia = timedelta(days=1)
+            dias = sorted({(empleado_id, momento.date() + desfase) for empleado_id, momento, _ in fichajes
+                           for desfase in (-un_dia, timedelta(0), un_dia)})
+            eventos = defaultdict(list)
+            for bloque in _bloques(dias):
+                condiciones, params = _condiciones_rango("empleado_id", "momento", [(empleado_id, fecha - un_dia) for empleado_id, fecha in bloque], 3)
+                cursor.execute(f"SELECT empleado_id, momento, tipo FROM fichaje WHERE {condiciones} ORDER BY empleado_id, momento, id", params)
+                for empleado_id, momento, tipo in cursor.fetchall():
+                    eventos[(empleado_id, momento.date())].append((momento, tipo))
+            diarios = []
+            for empleado_id, fecha in dias:
+                # Los días vecinos sin eventos no tienen fila (ningún turno llega a cubrir un día entero)
+                if not eventos[(empleado_id, fecha)]:
+                    continue
+                ventana = eventos[(empleado_id, fecha - un_dia)] + eventos[(empleado_id, fecha)] + eventos[(empleado_id, fecha + un_dia)]
+                diarios.append((empleado_id, fecha, *_resumir_dia(ventana, fecha)))
+            for bloque in _bloques(diarios):
+                cursor.executemany(UPSERT_FICHAJE_DIARIO, bloque)
+            
+            semanas = sorted({(empleado_id, lunes(fecha)) for empleado_id, fecha, *_ in diarios})
+            for bloque in _bloques(semanas):
+                condiciones, params = _condiciones_rango("empleado_id", "fecha", bloque, 7)
+                cursor.execute(f"SELECT empleado_id, fecha, segundos FROM fichaje_diario WHERE {condiciones}", params)
+                totales = {semana: [0, 0] for semana in bloque}
+                for empleado_id, fecha, segundos in cursor.fetchall():
+                    total = totales[(empleado_id, lunes(fecha))]
+                    total[0] += segundos
+                    total[1] += 1
+                cursor.executemany(UPSERT_FICHAJE_SEMANAL, [
+                    (empleado_id, semana, segundos, n_dias)
+                    for (empleado_id, semana), (segundos, n_dias) in totales.items()
+                ])
+            connection.commit()
+        return True
+    except Error as e:
+        print(f"Error al guardar fichajes: {e}")
+        try:
+            connection.rollback()
+        except Error:
+            pass
+        if isinstance(e, (IntegrityError, DataError)):
+            raise
+        return False
+    finally:
+        _cerrar(connection, cursor)
+
+def horas_trabajadas(periodo, fecha, limite=25, despues=None):
+    """
+    Horas de cada empleado en el día o la semana que contiene `fecha`, leídas de los agregados
+    (nunca de los eventos). Paginación por cursor sobre empleado_id. Devuelve (filas, siguiente).
+    """
+    connection = get_connection()
+    if not connection:
+        return None
+    
+    tabla, columna, recuento = AGREGADOS_FICHAJE[periodo]
+    clave = fecha if periodo == "dia" else lunes(fecha)
+    params = [clave]
+    condicion_cursor = ""
+    if despues is not None:
+        condicion_cursor = " AND r.empleado_id > %s"
+        params.append(despues)
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+        with span("query"):
+            cursor.execute(
+                f"""SELECT r.empleado_id, e.Nombre, e.PrimerApellido, e.SegundoApellido, r.segundos,
+                           ROUND(r.segundos / 3600, 2) AS horas, r.{recuento}
+                    FROM {tabla} r JOIN empleado e ON e.id = r.empleado_id
+                    WHERE r.{columna} = %s{condicion_cursor}
+                    ORDER BY r.empleado_id LIMIT %s""",
+                (*params, limite + 1)
+            )
+            filas = cursor.fetchall()
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = filas[-1]["empleado_id"]
+        return filas, siguiente
+    except Error as e:
+        print(f"Error al obtener horas trabajadas: {e}")
+        return None
+    finally:
+        _cerrar(connection, cursor)
+
+def historial_horas(empleado_id, periodo, desde, hasta):
+    """Horas de un empleado por día o por semana entre dos fechas (incluidas), desde los agregados"""
+    connection = get_connection()
+    if not connection:
+        return None
+    
+    tabla, columna, recuento = AGREGADOS_FICHAJE[periodo]
+    if periodo == "semana":
+        desde = lunes(desde)
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+        with span("query"):
+            cursor.execute(
+                f"""SELECT {columna}, segundos, ROUND(segundos / 3600, 2) AS horas, {recuento}
+                    FROM {tabla} WHERE empleado_id = %s AND {columna} BETWEEN %s AND %s
+                    ORDER BY {columna}""",
+                (empleado_id, desde, hasta)
+            )
+            filas = cursor.fetchall()
+        return filas
+    except Error as e:
+        print(f"Error al obtener el historial de horas: {e}")
+        return None
+    finally:
+        _cerrar(connection, cursor)
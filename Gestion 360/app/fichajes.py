@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from app.async_db import run_db
+from app.database import guardar_fichajes
+
+# Se vacía el buffer al llegar a FICHAJES_LOTE eventos o cada FICHAJES_INTERVALO segundos
+FICHAJES_LOTE = int(os.getenv('FICHAJES_LOTE', 1000))
+FICHAJES_INTERVALO = float(os.getenv('FICHAJES_INTERVALO', 1.0))
+# Con la base de datos caída el buffer crece hasta aquí y después se rechazan eventos (503)
+FICHAJES_MAX_PENDIENTES = int(os.getenv('FICHAJES_MAX_PENDIENTES', 100000))
+# Últimos eventos descartados por error en los datos que se conservan para revisarlos
+FICHAJES_MAX_DESCARTADOS = int(os.getenv('FICHAJES_MAX_DESCARTADOS', 1000))
+
+
+class BufferFichajes:
+    """
+    Buffer de ingesta de fichajes: las peticiones solo añaden eventos a una lista en memoria y una
+    tarea en segundo plano los guarda por lotes (un INSERT multi-fila y el recálculo de los agregados
+    en una transacción). Todo ocurre en el event loop, así que no hace falta ningún lock.
+    Los eventos aceptados y aún no guardados se pierden si el proceso muere sin pasar por `detener`.
+
+    Si la base de datos no está disponible, el lote vuelve al buffer y se reintenta en la siguiente
+    vuelta. Si falla por los datos (excepción al guardar), el lote se parte en mitades hasta aislar los
+    eventos que fallan, que se descartan a `descartados` para no bloquear los siguientes.
+    """
+
+    def __init__(self, guardar=guardar_fichajes, lote=FICHAJES_LOTE, intervalo=FICHAJES_INTERVALO,
+                 max_pendientes=FICHAJES_MAX_PENDIENTES):
+        self._guardar = guardar
+        self._lote = lote
+        self._intervalo = intervalo
+        self._max_pendientes = max_pendientes
+        self._pendientes = []
+        self._lleno = None
+        self._tarea = None
+        self._parar = False
+        self.recibidos = 0
+        self.guardados = 0
+        self.rechazados = 0
+        self.lotes = 0
+        self.errores = 0
+        self.descartados = 0
+        self.ultimos_descartados = deque(maxlen=FICHAJES_MAX_DESCARTADOS)
+        self.ultimo_lote_segundos = 0.0
+
+    def agregar(self, fichajes):
+        """Encolar eventos (empleado_id, momento, tipo); False si el buffer está lleno"""
+        if len(self._pendientes) + len(fichajes) > self._max_pendientes:
+            self.rechazados += len(fichajes)
+            return False
+        self._pendientes.extend(fichajes)
+        self.recibidos += len(fichajes)
+        if len(self._pendientes) >= self._lote and self._lleno is not None:
+            self._lleno.set()
+        return True
+
+    @property
+    def pendientes(self):
+        return len(self._pendientes)
+
+    async def _guardar_lote(self, lote):
+        """Guardar un lote; devuelve los eventos que quedan sin guardar porque la base de datos no está disponible"""
+        try:
+            if not await run_db(self._guardar, lote):
+                return lote
+        except Exception as e:
+            # Error en los datos: partir el lote en dos para aislar los eventos que fallan
+            if len(lote) == 1:
+                print(f"Fichaje descartado {lote[0]}: {e}")
+                self.descartados += 1
+                self.ultimos_descartados.append((lote[0], str(e)))
+                return []
+            mitad = len(lote) // 2
+            resto = await self._guardar_lote(lote[:mitad])
+            if resto:
+                return resto + lote[mitad:]
+            return await self._guardar_lote(lote[mitad:])
+        self.guardados += len(lote)
+        return []
+
+    async def vaciar(self):
+        """Guardar todo lo pendiente en lotes de `lote` eventos; si la base de datos falla se reintenta en la siguiente vuelta"""
+        while self._pendientes:
+            lote = self._pendientes[:self._lote]
+            del self._pendientes[:self._lote]
+            inicio = time.perf_counter()
+            resto = await self._guardar_lote(lote)
+            if resto:
+                # Vuelven al principio para conservar el orden de llegada
+                self._pendientes[:0] = resto
+                self.errores += 1
+                return
+            self.ultimo_lote_segundos = time.perf_counter() - inicio
+            self.lotes += 1
+
+    async def _bucle(self):
+        while not self._parar:
+            try:
+                await asyncio.wait_for(self._lleno.wait(), timeout=self._intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._lleno.clear()
+            # Un error inesperado no puede parar la tarea: los fichajes se seguirían aceptando sin guardarse
+            try:
+                await self.vaciar()
+            except Exception as e:
+                self.errores += 1
+                print(f"Error al vaciar el buffer de fichajes: {e}")
+
+    def iniciar(self):
+        """Arrancar la tarea de vaciado (en el startup de la app, con el event loop ya en marcha)"""
+        self._parar = False
+        self._lleno = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        """Terminar la tarea de vaciado después de guardar lo pendiente"""
+        if self._tarea is None:
+            return
+        self._parar = True
+        self._lleno.set()
+        await self._tarea
+        self._tarea = None
+        await self.vaciar()
+
+    def estadisticas(self):
+        return {
+            "pendientes": len(self._pendientes),
+            "recibidos": self.recibidos,
+            "guardados": self.guardados,
+            "rechazados": self.rechazados,
+            "lotes": self.lotes,
+            "errores": self.errores,
+            "descartados": self.descartados,
+            "ultimo_lote_segundos": self.ultimo_lote_segundos,
+        }
+
+
+buffer_fichajes = BufferFichajes()
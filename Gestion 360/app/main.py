@@ -1,9 +1,19 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import List, Optional
-from app.database import get_empleados, agregar_empleado, eliminar_empleado, actualizar_empleado
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import List, Literal, Optional, Union
+from datetime import date, datetime
+from app.database import (
+    buscar_empleados, resumen_departamentos, obtener_empleado, agregar_empleado, eliminar_empleado,
+    actualizar_empleado, agregar_empleados_lote, actualizar_nomina_lote, horas_trabajadas, historial_horas
+)
+from app.async_db import run_db
+from app.fichajes import buffer_fichajes
+from app.migrador import migrar_al_arrancar
+from comun.metrics import MetricsMiddleware, registro
+import csv
+import io
 import os
 
 app = FastAPI(title="Gestor de Empleados")
@@ -11,6 +21,25 @@ app = FastAPI(title="Gestor de Empleados")
 # Servir archivos estáticos
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+# Latencia por ruta y por fase (db_connect, query), expuesta en GET /metrics
+app.add_middleware(MetricsMiddleware)
+registro.registrar_gauges("gestion_fichajes", "Buffer de ingesta de fichajes", buffer_fichajes.estadisticas)
+
+@app.on_event("startup")
+async def migrar_esquema():
+    # Con el esquema al día son dos consultas; DB_MIGRAR_AL_ARRANCAR=0 lo desactiva
+    if os.getenv('DB_MIGRAR_AL_ARRANCAR', '1') == '1':
+        await run_db(migrar_al_arrancar)
+
+@app.on_event("startup")
+async def iniciar_fichajes():
+    buffer_fichajes.iniciar()
+
+@app.on_event("shutdown")
+async def detener_fichajes():
+    # Guardar los fichajes aceptados que aún estén en el buffer
+    await buffer_fichajes.detener()
+
 # Modelos
 class EmpleadoData(BaseModel):
     Nombre: str
@@ -23,6 +52,7 @@ class EmpleadoData(BaseModel):
     Sueldo: int
 
 class EmpleadoActualizar(BaseModel):
+    Nombre: str
     primer_apellido: str
     segundo_apellido: str
     Departamento: str
@@ -31,25 +61,95 @@ class EmpleadoActualizar(BaseModel):
     Hora_de_fichar: int
     Sueldo: int
 
+class RevisionNomina(BaseModel):
+    id: int
+    Sueldo: Optional[int] = None
+    Horas: Optional[int] = None
+    Tipo_de_Jornada: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _algun_cambio(self):
+        if self.Sueldo is None and self.Horas is None and self.Tipo_de_Jornada is None:
+            raise ValueError("indica al menos Sueldo, Horas o Tipo_de_Jornada")
+        return self
+
+class Fichaje(BaseModel):
+    empleado_id: int = Field(ge=1)
+    tipo: Literal["entrada", "salida"]
+    # Sin momento se usa la hora de recepción
+    momento: Optional[datetime] = None
+
+# Máximo de filas por petición en las operaciones por lotes
+LOTE_MAX_FILAS = int(os.getenv('LOTE_MAX_FILAS', 10000))
+
 # Rutas
 @app.get("/")
 async def root():
     """Servir la página principal"""
     return FileResponse("app/template/pages/index.html")
 
-@app.get("/api/empleados", response_model=List[dict])
-async def listar_empleados():
-    """Obtener lista de todos los empleados"""
-    empleados = get_empleados()
-    if empleados is None:
-        raise HTTPException(status_code=500, detail="Error al conectar con la base de datos")
-    return empleados
+def _validar_rango_sueldo(sueldo_min, sueldo_max):
+    if sueldo_min is not None and sueldo_max is not None and sueldo_min > sueldo_max:
+        raise HTTPException(status_code=400, detail="sueldo_min no puede ser mayor que sueldo_max")
+
+@app.get("/api/empleados")
+async def listar_empleados(
+    departamento: Optional[str] = None,
+    tipo_jornada: Optional[str] = None,
+    sueldo_min: Optional[int] = Query(None, ge=0),
+    sueldo_max: Optional[int] = Query(None, ge=0),
+    limite: int = Query(25, ge=1, le=100),
+    despues: Optional[int] = Query(None, ge=0)
+):
+    """Página de empleados filtrada por departamento, jornada y rango de sueldo"""
+    _validar_rango_sueldo(sueldo_min, sueldo_max)
+    resultado = await run_db(
+        buscar_empleados,
+        departamento=departamento,
+        tipo_jornada=tipo_jornada,
+        sueldo_min=sueldo_min,
+        sueldo_max=sueldo_max,
+        limite=limite,
+        despues=despues
+    )
+    if resultado is None:
+        raise HTTPException(status_code=500, detail="Error al obtener empleados")
+    empleados, total, siguiente = resultado
+    return {"empleados": empleados, "total": total, "siguiente": siguiente}
+
+@app.get("/api/empleados/resumen")
+async def resumen_empleados(
+    tipo_jornada: Optional[str] = None,
+    sueldo_min: Optional[int] = Query(None, ge=0),
+    sueldo_max: Optional[int] = Query(None, ge=0)
+):
+    """Plantilla, sueldo total y medio y horas totales por departamento"""
+    _validar_rango_sueldo(sueldo_min, sueldo_max)
+    departamentos = await run_db(
+        resumen_departamentos,
+        tipo_jornada=tipo_jornada,
+        sueldo_min=sueldo_min,
+        sueldo_max=sueldo_max
+    )
+    if departamentos is None:
+        raise HTTPException(status_code=500, detail="Error al obtener el resumen")
+    # Los totales globales salen de los grupos, sin otra consulta
+    empleados = sum(d["empleados"] for d in departamentos)
+    sueldo_total = sum(d["sueldo_total"] for d in departamentos)
+    total = {
+        "empleados": empleados,
+        "sueldo_total": sueldo_total,
+        "sueldo_medio": sueldo_total / empleados if empleados else None,
+        "horas_total": sum(d["horas_total"] for d in departamentos)
+    }
+    return {"departamentos": departamentos, "total": total}
 
 @app.post("/api/empleados")
 async def crear_empleado(empleado: EmpleadoData):
     """Crear un nuevo empleado"""
     try:
-        success = agregar_empleado(
+        empleado_id = await run_db(
+            agregar_empleado,
             nombre=empleado.Nombre,
             primer_apellido=empleado.primer_apellido,
             segundo_apellido=empleado.segundo_apellido,
@@ -59,26 +159,144 @@ async def crear_empleado(empleado: EmpleadoData):
             hora_fichar=empleado.Hora_de_fichar,
             sueldo=empleado.Sueldo
         )
-        if not success:
-            raise HTTPException(status_code=400, detail="Error al agregar empleado - verifica que el nombre sea único")
-        return {"mensaje": "Empleado agregado exitosamente"}
+        if empleado_id is None:
+            raise HTTPException(status_code=400, detail="Error al agregar empleado")
+        return {"mensaje": "Empleado agregado exitosamente", "id": empleado_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error en crear_empleado: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
 
-@app.delete("/api/empleados/{nombre}")
-async def borrar_empleado(nombre: str):
-    """Eliminar un empleado por nombre"""
-    success = eliminar_empleado(nombre)
+async def _leer_filas(request: Request):
+    """
+    Filas de una operación por lotes: un array JSON en el cuerpo o un CSV con cabecera subido
+    como `fichero` (multipart). Devuelve [(número de fila, dict)]: la posición en el array
+    empezando en 1 o la línea del CSV (la cabecera es la 1).
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        formulario = await request.form()
+        fichero = formulario.get("fichero")
+        if fichero is None or isinstance(fichero, str):
+            raise HTTPException(status_code=400, detail="Falta el fichero CSV (campo 'fichero')")
+        try:
+            texto = (await fichero.read()).decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="El CSV debe estar en UTF-8")
+        lector = csv.DictReader(io.StringIO(texto))
+        # Las celdas vacías cuentan como campo ausente
+        filas = [
+            (lector.line_num, {k: v for k, v in fila.items() if k is not None and v != ""})
+            for fila in lector
+        ]
+    else:
+        try:
+            datos = await request.json()
+        except ValueError:
+            datos = None
+        if not isinstance(datos, list):
+            raise HTTPException(status_code=400, detail="Se espera un array JSON o un CSV (multipart, campo 'fichero')")
+        filas = list(enumerate(datos, start=1))
+    if len(filas) > LOTE_MAX_FILAS:
+        raise HTTPException(status_code=413, detail=f"Máximo {LOTE_MAX_FILAS} filas por petición")
+    return filas
+
+def _validar_filas(filas, modelo):
+    """Validar todas las filas en una pasada; devuelve (válidas, errores por fila)"""
+    validas, errores = [], []
+    for numero, fila in filas:
+        try:
+            validas.append((numero, modelo.model_validate(fila)))
+        except ValidationError as e:
+            mensajes = []
+            for error in e.errors():
+                campo = ".".join(str(parte) for parte in error["loc"])
+                mensajes.append(f"{campo}: {error['msg']}" if campo else error["msg"])
+            errores.append({"fila": numero, "error": "; ".join(mensajes)})
+    return validas, errores
+
+def _resultado_lote(filas, errores, aplicadas, simular):
+    """Resumen de una operación por lotes; con errores (y sin simulación) no se aplica nada y responde 422"""
+    errores.sort(key=lambda error: error["fila"])
+    contenido = {
+        "simulacion": simular,
+        "filas": len(filas),
+        "validas": len(filas) - len({error["fila"] for error in errores}),
+        "aplicadas": aplicadas,
+        "errores": errores
+    }
+    return JSONResponse(status_code=422 if errores and not simular else 200, content=contenido)
+
+@app.post("/api/empleados/lote")
+async def crear_empleados_lote(request: Request, simular: bool = False):
+    """Alta masiva (array JSON de EmpleadoData o CSV) en una única transacción; todo o nada"""
+    filas = await _leer_filas(request)
+    validas, errores = _validar_filas(filas, EmpleadoData)
+    if errores or simular or not validas:
+        return _resultado_lote(filas, errores, 0, simular)
+    
+    insertadas = await run_db(agregar_empleados_lote, [
+        (e.Nombre, e.primer_apellido, e.segundo_apellido, e.Departamento,
+         e.Tipo_de_Jornada, e.Horas, e.Hora_de_fichar, e.Sueldo)
+        for _, e in validas
+    ])
+    if insertadas is None:
+        raise HTTPException(status_code=500, detail="Error al agregar empleados")
+    return _resultado_lote(filas, errores, insertadas, simular)
+
+@app.put("/api/empleados/nomina")
+async def revisar_nomina(request: Request, simular: bool = False):
+    """
+    Revisión de nómina por lotes (array JSON o CSV con id y Sueldo/Horas/Tipo_de_Jornada) en una
+    única transacción; todo o nada. En simulación comprueba también que los ids existen.
+    """
+    filas = await _leer_filas(request)
+    validas, errores = _validar_filas(filas, RevisionNomina)
+    
+    fila_de_id = {}
+    for numero, revision in validas:
+        if revision.id in fila_de_id:
+            errores.append({"fila": numero, "error": f"id {revision.id} repetido (fila {fila_de_id[revision.id]})"})
+        else:
+            fila_de_id[revision.id] = numero
+    if not fila_de_id:
+        return _resultado_lote(filas, errores, 0, simular)
+    
+    revisiones = [
+        revision.model_dump(exclude_none=True)
+        for numero, revision in validas if fila_de_id[revision.id] == numero
+    ]
+    # Con errores de validación solo se comprueba qué ids existen, sin escribir
+    resultado = await run_db(actualizar_nomina_lote, revisiones, simular=simular or bool(errores))
+    if resultado is None:
+        raise HTTPException(status_code=500, detail="Error al actualizar la nómina")
+    aplicadas, no_encontrados = resultado
+    errores.extend({"fila": fila_de_id[i], "error": f"No existe el empleado con id {i}"} for i in no_encontrados)
+    return _resultado_lote(filas, errores, aplicadas, simular)
+
+@app.get("/api/empleados/{empleado_id}")
+async def ver_empleado(empleado_id: int):
+    """Obtener un empleado por id"""
+    empleado = await run_db(obtener_empleado, empleado_id)
+    if empleado is None:
+        raise HTTPException(status_code=404, detail="Empleado no encontrado")
+    return empleado
+
+@app.delete("/api/empleados/{empleado_id}")
+async def borrar_empleado(empleado_id: int):
+    """Eliminar un empleado por id"""
+    success = await run_db(eliminar_empleado, empleado_id)
     if not success:
         raise HTTPException(status_code=404, detail="Empleado no encontrado")
     return {"mensaje": "Empleado eliminado exitosamente"}
 
-@app.put("/api/empleados/{nombre}")
-async def editar_empleado(nombre: str, empleado: EmpleadoActualizar):
-    """Actualizar datos de un empleado"""
-    success = actualizar_empleado(
-        nombre=nombre,
+@app.put("/api/empleados/{empleado_id}")
+async def editar_empleado(empleado_id: int, empleado: EmpleadoActualizar):
+    """Actualizar datos de un empleado por id"""
+    success = await run_db(
+        actualizar_empleado,
+        empleado_id=empleado_id,
+        nombre=empleado.Nombre,
         primer_apellido=empleado.primer_apellido,
         segundo_apellido=empleado.segundo_apellido,
         departamento=empleado.Departamento,
@@ -91,6 +309,61 @@ async def editar_empleado(nombre: str, empleado: EmpleadoActualizar):
         raise HTTPException(status_code=404, detail="Empleado no encontrado")
     return {"mensaje": "Empleado actualizado exitosamente"}
 
+@app.post("/api/fichajes", status_code=202)
+async def registrar_fichajes(fichajes: Union[Fichaje, List[Fichaje]]):
+    """
+    Ingesta de fichajes (uno o un array): se encolan en memoria y se guardan por lotes en segundo
+    plano, así que la respuesta no espera a la base de datos. 503 si el buffer está lleno.
+    """
+    if isinstance(fichajes, Fichaje):
+        fichajes = [fichajes]
+    ahora = datetime.now()
+    eventos = []
+    for fichaje in fichajes:
+        momento = fichaje.momento or ahora
+        if momento.tzinfo is not None:
+            # La tabla guarda hora local sin zona
+            momento = momento.astimezone().replace(tzinfo=None)
+        eventos.append((fichaje.empleado_id, momento, fichaje.tipo))
+    if not buffer_fichajes.agregar(eventos):
+        raise HTTPException(status_code=503, detail="Demasiados fichajes pendientes, reintenta más tarde")
+    return {"aceptados": len(eventos), "pendientes": buffer_fichajes.pendientes}
+
+@app.get("/api/fichajes/horas")
+async def ver_horas_trabajadas(
+    periodo: Literal["dia", "semana"] = "semana",
+    fecha: Optional[date] = None,
+    limite: int = Query(25, ge=1, le=100),
+    despues: Optional[int] = Query(None, ge=0)
+):
+    """Horas trabajadas por empleado en un día o una semana (la que contiene `fecha`, por defecto hoy)"""
+    fecha = fecha or date.today()
+    resultado = await run_db(horas_trabajadas, periodo, fecha, limite=limite, despues=despues)
+    if resultado is None:
+        raise HTTPException(status_code=500, detail="Error al obtener las horas trabajadas")
+    filas, siguiente = resultado
+    return {"periodo": periodo, "fecha": fecha, "empleados": filas, "siguiente": siguiente}
+
+@app.get("/api/fichajes/horas/{empleado_id}")
+async def ver_historial_horas(
+    empleado_id: int,
+    desde: date,
+    hasta: date,
+    periodo: Literal["dia", "semana"] = "dia"
+):
+    """Horas trabajadas por un empleado día a día o semana a semana entre dos fechas"""
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="desde no puede ser posterior a hasta")
+    filas = await run_db(historial_horas, empleado_id, periodo, desde, hasta)
+    if filas is None:
+        raise HTTPException(status_code=500, detail="Error al obtener el historial de horas")
+    return filas
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metricas():
+    """Métricas de latencia en formato Prometheus"""
+    return PlainTextResponse(registro.exportar(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
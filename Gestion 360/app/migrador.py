@@ -0,0 +1,135 @@
+import importlib.util
+import os
+import re
+import time
+
+from mysql.connector import Error
+
+# Ficheros NNN_nombre.sql o NNN_nombre.py; se aplican por orden de versión (NNN)
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migraciones")
+PATRON_MIGRACION = re.compile(r"^(\d+)_(\w+)\.(sql|py)$")
+
+# Bloqueo con nombre de MySQL: con varios workers arrancando a la vez solo uno aplica migraciones
+BLOQUEO = "gestion360_migraciones"
+ESPERA_BLOQUEO = 60
+
+CREAR_TABLA_VERSIONES = """CREATE TABLE IF NOT EXISTS schema_version (
+    version INT UNSIGNED NOT NULL,
+    nombre VARCHAR(200) NOT NULL,
+    aplicada_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    duracion_ms INT UNSIGNED NOT NULL,
+    PRIMARY KEY (version)
+)"""
+
+
+class ErrorMigracion(Exception):
+    pass
+
+
+def listar_migraciones(directorio=DIRECTORIO_MIGRACIONES):
+    """[(versión, nombre, ruta)] ordenadas por versión"""
+    migraciones = {}
+    for fichero in os.listdir(directorio):
+        coincidencia = PATRON_MIGRACION.match(fichero)
+        if not coincidencia:
+            continue
+        version = int(coincidencia.group(1))
+        if version in migraciones:
+            raise ErrorMigracion(f"Versión {version} repetida: {migraciones[version][1]} y {fichero}")
+        migraciones[version] = (version, fichero, os.path.join(directorio, fichero))
+    return [migraciones[version] for version in sorted(migraciones)]
+
+
+def sentencias_sql(texto):
+    """Sentencias de un fichero .sql: sin las líneas de comentario (--) y separadas por ';' a final de línea"""
+    lineas = [linea for linea in texto.splitlines() if not linea.lstrip().startswith("--")]
+    return [sentencia.strip() for sentencia in re.split(r";\s*$", "\n".join(lineas), flags=re.MULTILINE) if sentencia.strip()]
+
+
+def _ejecutar(cursor, ruta):
+    if ruta.endswith(".sql"):
+        with open(ruta, encoding="utf-8") as fichero:
+            for sentencia in sentencias_sql(fichero.read()):
+                cursor.execute(sentencia)
+    else:
+        # Migraciones en Python para los cambios que dependen del estado de la tabla: def aplicar(cursor).
+        # Cualquier excepción al cargarla o aplicarla (no solo de MySQL) se convierte en ErrorMigracion
+        spec = importlib.util.spec_from_file_location(f"migracion_{os.path.basename(ruta)[:-3]}", ruta)
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        modulo.aplicar(cursor)
+
+
+def _versiones_aplicadas(cursor):
+    cursor.execute("SELECT version FROM schema_version")
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+def aplicar_migraciones(connection, directorio=DIRECTORIO_MIGRACIONES):
+    """
+    Aplicar en orden las migraciones pendientes y registrarlas en schema_version.
+    Si ya está todo aplicado solo cuesta dos consultas. Cada migración y su fila en schema_version van en
+    la misma transacción, pero MySQL confirma implícitamente el DDL, así que las migraciones deben poder
+    repetirse sin efecto (CREATE ... IF NOT EXISTS, comprobar antes de ALTER) por si una falla a medias.
+    Devuelve los nombres de las migraciones aplicadas.
+    """
+    migraciones = listar_migraciones(directorio)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREAR_TABLA_VERSIONES)
+        aplicadas = _versiones_aplicadas(cursor)
+        if all(version in aplicadas for version, _, _ in migraciones):
+            return []
+
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (BLOQUEO, ESPERA_BLOQUEO))
+        if cursor.fetchall()[0][0] != 1:
+            raise ErrorMigracion(f"No se obtuvo el bloqueo '{BLOQUEO}' en {ESPERA_BLOQUEO} s")
+        try:
+            # Otro proceso puede haberlas aplicado mientras esperábamos el bloqueo
+            aplicadas = _versiones_aplicadas(cursor)
+            hechas = []
+            for version, nombre, ruta in migraciones:
+                if version in aplicadas:
+                    continue
+                inicio = time.perf_counter()
+                try:
+                    _ejecutar(cursor, ruta)
+                    cursor.execute(
+                        "INSERT INTO schema_version (version, nombre, duracion_ms) VALUES (%s, %s, %s)",
+                        (version, nombre, int((time.perf_counter() - inicio) * 1000))
+                    )
+                    connection.commit()
+                except Exception as e:
+                    try:
+                        connection.rollback()
+                    except Error:
+                        pass
+                    raise ErrorMigracion(f"Error en la migración {nombre}: {e}") from e
+                hechas.append(nombre)
+            return hechas
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (BLOQUEO,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def migrar_al_arrancar():
+    """Aplicar las migraciones con una conexión del pool al arrancar la app; no impide arrancar si falla"""
+    from app.database import get_connection
+
+    connection = get_connection()
+    if not connection:
+        print("Migraciones no aplicadas: sin conexión a la base de datos")
+        return None
+    try:
+        inicio = time.perf_counter()
+        hechas = aplicar_migraciones(connection)
+        if hechas:
+            print(f"Migraciones aplicadas: {', '.join(hechas)} ({time.perf_counter() - inicio:.2f} s)")
+        return hechas
+    except (Error, ErrorMigracion) as e:
+        print(f"Error al aplicar migraciones: {e}")
+        return None
+    finally:
+        connection.close()
@@ -5,10 +5,32 @@ const tablaEmpleados = document.getElementById('cuerpoTabla');
 const modal = document.getElementById('modalEditar');
 const closeBtn = document.querySelector('.close');
 const mensajeEstado = document.getElementById('mensajeEstado');
+const formFiltros = document.getElementById('formFiltros');
+const tablaResumen = document.getElementById('cuerpoResumen');
+const selectDepartamento = document.getElementById('filtroDepartamento');
+const btnAnterior = document.getElementById('btnAnterior');
+const btnSiguiente = document.getElementById('btnSiguiente');
+const infoPagina = document.getElementById('infoPagina');
+
+const EMPLEADOS_POR_PAGINA = 25;
+
+const formHoras = document.getElementById('formHoras');
+const tablaHoras = document.getElementById('cuerpoHoras');
+const btnMasHoras = document.getElementById('btnMasHoras');
+
+// Filtros aplicados y cursores de paginación: cursores[i] es el `despues` de la página i
+let filtrosActivos = {};
+let cursores = [null];
+let paginaActual = 0;
+
+// Cursor de la siguiente página de horas trabajadas (null si no hay más)
+let siguienteHoras = null;
 
 // Cargar empleados al iniciar
 document.addEventListener('DOMContentLoaded', () => {
     cargarEmpleados();
+    cargarResumen();
+    cargarHoras();
     configurarEventos();
 });
 
@@ -17,6 +39,15 @@ function configurarEventos() {
     formAgregar.addEventListener('submit', agregarEmpleado);
     formEditar.addEventListener('submit', guardarCambios);
     closeBtn.addEventListener('click', cerrarModal);
+    formFiltros.addEventListener('submit', aplicarFiltros);
+    document.getElementById('btnLimpiarFiltros').addEventListener('click', limpiarFiltros);
+    btnAnterior.addEventListener('click', () => irAPagina(paginaActual - 1));
+    btnSiguiente.addEventListener('click', () => irAPagina(paginaActual + 1));
+    formHoras.addEventListener('submit', (e) => {
+        e.preventDefault();
+        cargarHoras();
+    });
+    btnMasHoras.addEventListener('click', () => cargarHoras(siguienteHoras));
     window.addEventListener('click', (e) => {
         if (e.target === modal) {
             cerrarModal();
@@ -24,20 +55,159 @@ function configurarEventos() {
     });
 }
 
-// Cargar lista de empleados
+// Cargar la página actual de empleados con los filtros aplicados (filtra y pagina el servidor)
 async function cargarEmpleados() {
+    const params = new URLSearchParams(filtrosActivos);
+    params.set('limite', EMPLEADOS_POR_PAGINA);
+    if (cursores[paginaActual] !== null) {
+        params.set('despues', cursores[paginaActual]);
+    }
+    
     try {
-        const response = await fetch('/api/empleados');
+        const response = await fetch(`/api/empleados?${params}`);
         if (!response.ok) throw new Error('Error al cargar empleados');
         
-        const empleados = await response.json();
-        mostrarEmpleados(empleados);
+        const pagina = await response.json();
+        // Si una baja deja vacía la última página, volver a la anterior
+        if (pagina.empleados.length === 0 && paginaActual > 0) {
+            irAPagina(paginaActual - 1);
+            return;
+        }
+        cursores[paginaActual + 1] = pagina.siguiente;
+        mostrarEmpleados(pagina.empleados);
+        actualizarPaginacion(pagina);
     } catch (error) {
         console.error('Error:', error);
         mostrarMensaje('Error al cargar empleados', 'error');
     }
 }
 
+// Botones e información de paginación
+function actualizarPaginacion(pagina) {
+    const desde = paginaActual * EMPLEADOS_POR_PAGINA;
+    infoPagina.textContent = pagina.total === 0
+        ? ''
+        : `${desde + 1}-${desde + pagina.empleados.length} de ${pagina.total}`;
+    btnAnterior.disabled = paginaActual === 0;
+    btnSiguiente.disabled = pagina.siguiente === null;
+}
+
+function irAPagina(pagina) {
+    if (pagina < 0 || pagina >= cursores.length) return;
+    paginaActual = pagina;
+    cargarEmpleados();
+}
+
+// Leer el formulario de filtros y volver a la primera página
+function aplicarFiltros(e) {
+    e.preventDefault();
+    const filtros = {
+        departamento: selectDepartamento.value,
+        tipo_jornada: document.getElementById('filtroJornada').value,
+        sueldo_min: document.getElementById('filtroSueldoMin').value,
+        sueldo_max: document.getElementById('filtroSueldoMax').value
+    };
+    filtrosActivos = {};
+    Object.entries(filtros).forEach(([clave, valor]) => {
+        if (valor !== '') filtrosActivos[clave] = valor;
+    });
+    cursores = [null];
+    paginaActual = 0;
+    cargarEmpleados();
+}
+
+function limpiarFiltros() {
+    formFiltros.reset();
+    filtrosActivos = {};
+    cursores = [null];
+    paginaActual = 0;
+    cargarEmpleados();
+}
+
+// Resumen por departamento (agregado en SQL) y opciones del filtro de departamento
+async function cargarResumen() {
+    try {
+        const response = await fetch('/api/empleados/resumen');
+        if (!response.ok) throw new Error('Error al cargar el resumen');
+        
+        const resumen = await response.json();
+        mostrarResumen(resumen);
+        actualizarDepartamentos(resumen.departamentos);
+    } catch (error) {
+        console.error('Error:', error);
+        mostrarMensaje('Error al cargar el resumen', 'error');
+    }
+}
+
+function mostrarResumen(resumen) {
+    tablaResumen.innerHTML = '';
+    const formatear = (valor) => valor === null ? '-' : Number(valor).toLocaleString('es-ES', { maximumFractionDigits: 2 });
+    const filas = [...resumen.departamentos, { ...resumen.total, Departamento: 'Total' }];
+    filas.forEach(d => {
+        const fila = document.createElement('tr');
+        [d.Departamento ?? '', d.empleados, formatear(d.sueldo_total), formatear(d.sueldo_medio), formatear(d.horas_total)]
+            .forEach(valor => {
+                const celda = document.createElement('td');
+                celda.textContent = valor;
+                fila.appendChild(celda);
+            });
+        tablaResumen.appendChild(fila);
+    });
+}
+
+function actualizarDepartamentos(departamentos) {
+    const seleccionado = selectDepartamento.value;
+    selectDepartamento.length = 1;
+    departamentos.forEach(d => {
+        if (d.Departamento === null) return;
+        selectDepartamento.add(new Option(d.Departamento, d.Departamento));
+    });
+    selectDepartamento.value = seleccionado;
+}
+
+// Horas trabajadas por empleado en un día o una semana, leídas de los agregados de fichajes
+async function cargarHoras(despues = null) {
+    const periodo = document.getElementById('horasPeriodo').value;
+    const params = new URLSearchParams({ periodo, limite: EMPLEADOS_POR_PAGINA });
+    const fecha = document.getElementById('horasFecha').value;
+    if (fecha) params.set('fecha', fecha);
+    if (despues !== null) params.set('despues', despues);
+    
+    try {
+        const response = await fetch(`/api/fichajes/horas?${params}`);
+        if (!response.ok) throw new Error('Error al cargar las horas trabajadas');
+        
+        const pagina = await response.json();
+        // "Cargar más" añade filas; una consulta nueva empieza de cero
+        if (despues === null) tablaHoras.innerHTML = '';
+        document.getElementById('horasRecuento').textContent = periodo === 'dia' ? 'Fichajes' : 'Días';
+        pagina.empleados.forEach(empleado => {
+            const fila = document.createElement('tr');
+            [empleado.Nombre, empleado.PrimerApellido, empleado.horas, empleado.fichajes ?? empleado.dias]
+                .forEach(valor => {
+                    const celda = document.createElement('td');
+                    celda.textContent = valor ?? '';
+                    fila.appendChild(celda);
+                });
+            tablaHoras.appendChild(fila);
+        });
+        if (tablaHoras.children.length === 0) {
+            tablaHoras.innerHTML = '<tr><td colspan="4" style="text-align: center;">Sin fichajes en este periodo</td></tr>';
+        }
+        siguienteHoras = pagina.siguiente;
+        btnMasHoras.disabled = siguienteHoras === null;
+    } catch (error) {
+        console.error('Error:', error);
+        mostrarMensaje('Error al cargar las horas trabajadas', 'error');
+    }
+}
+
+// Tras un alta, baja o edición cambian la página y los agregados
+function recargar() {
+    cargarEmpleados();
+    cargarResumen();
+}
+
 // Mostrar empleados en la tabla
 function mostrarEmpleados(empleados) {
     tablaEmpleados.innerHTML = '';
@@ -49,20 +219,27 @@ function mostrarEmpleados(empleados) {
     
     empleados.forEach(empleado => {
         const fila = document.createElement('tr');
-        fila.innerHTML = `
-            <td>${empleado.Nombre}</td>
-            <td>${empleado.PrimerApellido}</td>
-            <td>${empleado.SegundoApellido}</td>
-            <td>${empleado.Departamento}</td>
-            <td>${empleado.Tipo_de_Jornada}</td>
-            <td>${empleado.Horas}</td>
-            <td>${empleado.Hora_de_fichar}</td>
-            <td>${empleado.Sueldo}</td>
-            <td>
-                <button class="btn btn-edit" onclick="abrirModalEditar('${empleado.Nombre}', '${empleado.PrimerApellido}', '${empleado.SegundoApellido}', '${empleado.Departamento}', '${empleado.Tipo_de_Jornada}', ${empleado.Horas}, ${empleado.Hora_de_fichar}, ${empleado.Sueldo})">Editar</button>
-                <button class="btn btn-danger" onclick="eliminarEmpleado('${empleado.Nombre}')">Eliminar</button>
-            </td>
-        `;
+        const campos = ['Nombre', 'PrimerApellido', 'SegundoApellido', 'Departamento',
+                        'Tipo_de_Jornada', 'Horas', 'Hora_de_fichar', 'Sueldo'];
+        campos.forEach(campo => {
+            const celda = document.createElement('td');
+            celda.textContent = empleado[campo] ?? '';
+            fila.appendChild(celda);
+        });
+        
+        // Las acciones usan el id: el nombre puede repetirse o contener comillas
+        const acciones = document.createElement('td');
+        const btnEditar = document.createElement('button');
+        btnEditar.className = 'btn btn-edit';
+        btnEditar.textContent = 'Editar';
+        btnEditar.addEventListener('click', () => abrirModalEditar(empleado));
+        const btnEliminar = document.createElement('button');
+        btnEliminar.className = 'btn btn-danger';
+        btnEliminar.textContent = 'Eliminar';
+        btnEliminar.addEventListener('click', () => eliminarEmpleado(empleado.id, empleado.Nombre));
+        acciones.append(btnEditar, ' ', btnEliminar);
+        fila.appendChild(acciones);
+        
         tablaEmpleados.appendChild(fila);
     });
 }
@@ -103,7 +280,7 @@ async function agregarEmpleado(e) {
         
         mostrarMensaje('Empleado agregado exitosamente', 'exito');
         formAgregar.reset();
-        cargarEmpleados();
+        recargar();
     } catch (error) {
         console.error('Error completo:', error);
         mostrarMensaje(error.message, 'error');
@@ -111,13 +288,13 @@ async function agregarEmpleado(e) {
 }
 
 // Eliminar empleado
-async function eliminarEmpleado(nombre) {
+async function eliminarEmpleado(id, nombre) {
     if (!confirm(`¿Está seguro de que desea eliminar a ${nombre}?`)) {
         return;
     }
     
     try {
-        const response = await fetch(`/api/empleados/${nombre}`, {
+        const response = await fetch(`/api/empleados/${id}`, {
             method: 'DELETE'
         });
         
@@ -127,7 +304,7 @@ async function eliminarEmpleado(nombre) {
         }
         
         mostrarMensaje('Empleado eliminado exitosamente', 'exito');
-        cargarEmpleados();
+        recargar();
     } catch (error) {
         console.error('Error:', error);
         mostrarMensaje(error.message, 'error');
@@ -135,15 +312,16 @@ async function eliminarEmpleado(nombre) {
 }
 
 // Abrir modal para editar
-function abrirModalEditar(nombre, apellido1, apellido2, departamento, tipoJornada, horas, horaFichar, sueldo) {
-    document.getElementById('editarNombre').value = nombre;
-    document.getElementById('editarApellido1').value = apellido1;
-    document.getElementById('editarApellido2').value = apellido2;
-    document.getElementById('editarDepartamento').value = departamento;
-    document.getElementById('editarTipoJornada').value = tipoJornada;
-    document.getElementById('editarHoras').value = horas;
-    document.getElementById('editarHoraFichar').value = horaFichar;
-    document.getElementById('editarSueldo').value = sueldo;
+function abrirModalEditar(empleado) {
+    document.getElementById('editarId').value = empleado.id;
+    document.getElementById('editarNombre').value = empleado.Nombre;
+    document.getElementById('editarApellido1').value = empleado.PrimerApellido;
+    document.getElementById('editarApellido2').value = empleado.SegundoApellido;
+    document.getElementById('editarDepartamento').value = empleado.Departamento;
+    document.getElementById('editarTipoJornada').value = empleado.Tipo_de_Jornada;
+    document.getElementById('editarHoras').value = empleado.Horas;
+    document.getElementById('editarHoraFichar').value = empleado.Hora_de_fichar;
+    document.getElementById('editarSueldo').value = empleado.Sueldo;
     modal.style.display = 'block';
 }
 
@@ -156,8 +334,9 @@ function cerrarModal() {
 async function guardarCambios(e) {
     e.preventDefault();
     
-    const nombre = document.getElementById('editarNombre').value;
+    const id = document.getElementById('editarId').value;
     const datosActualizados = {
+        Nombre: document.getElementById('editarNombre').value,
         primer_apellido: document.getElementById('editarApellido1').value,
         segundo_apellido: document.getElementById('editarApellido2').value,
         Departamento: document.getElementById('editarDepartamento').value,
@@ -168,7 +347,7 @@ async function guardarCambios(e) {
     };
     
     try {
-        const response = await fetch(`/api/empleados/${nombre}`, {
+        const response = await fetch(`/api/empleados/${id}`, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json'
@@ -183,7 +362,7 @@ async function guardarCambios(e) {
         
         mostrarMensaje('Empleado actualizado exitosamente', 'exito');
         cerrarModal();
-        cargarEmpleados();
+        recargar();
     } catch (error) {
         console.error('Error:', error);
         mostrarMensaje(error.message, 'error');
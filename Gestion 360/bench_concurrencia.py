@@ -0,0 +1,75 @@
+"""
+Prueba de carga sencilla: lanza peticiones GET concurrentes contra la API y muestra
+el throughput y la latencia. Sirve para comparar el antes/después de mover las
+consultas bloqueantes fuera del event loop (app/async_db.py).
+
+Uso:
+    uvicorn app.main:app --port 8000          (en otra terminal)
+    python bench_concurrencia.py --url http://localhost:8000/api/empleados --peticiones 2000 --concurrencia 50
+
+Para comparar, ejecutar el mismo comando con la versión anterior del servidor
+(git stash / git checkout del commit previo) y con la actual.
+"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga concurrente de la API")
+    parser.add_argument("--url", default="http://localhost:8000/api/empleados")
+    parser.add_argument("--peticiones", type=int, default=1000)
+    parser.add_argument("--concurrencia", type=int, default=20)
+    args = parser.parse_args()
+
+    destino = urlsplit(args.url)
+    ruta = destino.path or "/"
+    if destino.query:
+        ruta += "?" + destino.query
+
+    # Una conexión keep-alive por hilo cliente
+    local = threading.local()
+
+    def peticion(_):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=30)
+        inicio = time.perf_counter()
+        try:
+            conn.request("GET", ruta)
+            respuesta = conn.getresponse()
+            respuesta.read()
+            ok = 200 <= respuesta.status < 300
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            ok = False
+        return time.perf_counter() - inicio, ok
+
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        resultados = list(pool.map(peticion, range(args.peticiones)))
+    duracion = time.perf_counter() - inicio_total
+
+    latencias = sorted(t * 1000 for t, ok in resultados if ok)
+    errores = sum(1 for _, ok in resultados if not ok)
+    if not latencias:
+        print(f"Todas las peticiones fallaron ({errores})")
+        return
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(p * len(latencias)))]
+
+    print(f"URL: {args.url}  concurrencia={args.concurrencia}")
+    print(f"Peticiones: {len(resultados)}  errores: {errores}  duración: {duracion:.2f}s")
+    print(f"Throughput: {len(latencias) / duracion:.1f} req/s")
+    print(f"Latencia: media={statistics.mean(latencias):.1f}ms  p50={percentil(0.50):.1f}ms  "
+          f"p95={percentil(0.95):.1f}ms  p99={percentil(0.99):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
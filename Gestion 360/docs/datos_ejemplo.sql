@@ -0,0 +1,8 @@
+-- Datos de ejemplo. Ejecutar después de db.sql y de aplicar las migraciones (python setup_db.py),
+-- que son las que crean la tabla empleado.
+USE gestor_empleado;
+
+INSERT INTO empleado (Nombre, PrimerApellido, SegundoApellido, Departamento, Tipo_de_Jornada, Horas, Hora_de_fichar, Sueldo) VALUES
+('Juan', 'Pérez', 'García', 'Ventas', 'Completa', 40, 9, 2000),
+('María', 'López', 'Martínez', 'Marketing', 'Completa', 40, 8, 2500),
+('Carlos', 'Ruiz', 'Sánchez', 'IT', 'Media', 20, 10, 1500);
\ No newline at end of file
@@ -7,21 +7,5 @@ FLUSH PRIVILEGES;
 -- Usar BD
 USE gestor_empleado;
 
--- Crear tabla empleado (estructura de tu captura)
-CREATE TABLE IF NOT EXISTS empleado (
-    Nombre VARCHAR(100) NOT NULL,
-    PrimerApellido VARCHAR(100),
-    SegundoApellido VARCHAR(100),
-    Departamento VARCHAR(100),
-    Tipo_de_Jornada VARCHAR(50),
-    Horas INT,
-    Hora_de_fichar INT,
-    Sueldo INT,
-    PRIMARY KEY (Nombre)
-);
-
--- Datos de ejemplo
-INSERT INTO empleado (Nombre, PrimerApellido, SegundoApellido, Departamento, Tipo_de_Jornada, Horas, Hora_de_fichar, Sueldo) VALUES
-('Juan', 'Pérez', 'García', 'Ventas', 'Completa', 40, 9, 2000),
-('María', 'López', 'Martínez', 'Marketing', 'Completa', 40, 8, 2500),
-('Carlos', 'Ruiz', 'Sánchez', 'IT', 'Media', 20, 10, 1500);
\ No newline at end of file
+-- Las tablas las crean las migraciones de migraciones/ (python setup_db.py, o la app al arrancar).
+-- Los datos de ejemplo están en datos_ejemplo.sql, que se ejecuta después de aplicarlas.
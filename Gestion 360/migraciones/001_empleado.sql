@@ -0,0 +1,19 @@
+-- Tabla de empleados con clave sustituta e índices para los filtros y el resumen por departamento.
+-- idx_empleado_resumen (Departamento, Sueldo, Horas) cubre el filtro por departamento y las agregaciones
+-- por departamento sin leer las filas.
+CREATE TABLE IF NOT EXISTS empleado (
+    id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    Nombre VARCHAR(100) NOT NULL,
+    PrimerApellido VARCHAR(100),
+    SegundoApellido VARCHAR(100),
+    Departamento VARCHAR(100),
+    Tipo_de_Jornada VARCHAR(50),
+    Horas INT,
+    Hora_de_fichar INT,
+    Sueldo INT,
+    PRIMARY KEY (id),
+    INDEX idx_empleado_resumen (Departamento, Sueldo, Horas),
+    INDEX idx_empleado_jornada (Tipo_de_Jornada),
+    INDEX idx_empleado_sueldo (Sueldo),
+    INDEX idx_empleado_nombre (Nombre, PrimerApellido, SegundoApellido)
+);
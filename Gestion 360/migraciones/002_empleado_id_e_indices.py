@@ -0,0 +1,63 @@
+"""
+Pone al día una tabla `empleado` creada antes de 001 (por versiones antiguas de setup_db.py o docs/db.sql):
+
+- Renombra `1Apellido` / `2Apellido` a `PrimerApellido` / `SegundoApellido`, que son las que usa la app.
+- Sustituye la clave primaria `Nombre` por `id INT AUTO_INCREMENT`.
+- Crea los índices de 001 que falten y elimina `idx_empleado_departamento`, que ya cubre `idx_empleado_resumen`.
+
+En una tabla creada por 001 no hace nada: cada paso comprueba antes el estado de la tabla.
+"""
+
+INDICES = {
+    "idx_empleado_resumen": "(Departamento, Sueldo, Horas)",
+    "idx_empleado_jornada": "(Tipo_de_Jornada)",
+    "idx_empleado_sueldo": "(Sueldo)",
+    "idx_empleado_nombre": "(Nombre, PrimerApellido, SegundoApellido)",
+}
+
+OBSOLETOS = ["idx_empleado_departamento"]
+
+RENOMBRAR = {
+    "1Apellido": "PrimerApellido",
+    "2Apellido": "SegundoApellido",
+}
+
+
+def columnas(cursor):
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'empleado'"
+    )
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+def indices(cursor):
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'empleado'"
+    )
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+def aplicar(cursor):
+    existentes = columnas(cursor)
+
+    for antigua, nueva in RENOMBRAR.items():
+        if antigua in existentes and nueva not in existentes:
+            cursor.execute(f"ALTER TABLE empleado RENAME COLUMN `{antigua}` TO {nueva}")
+
+    if "id" not in existentes:
+        # En una sola sentencia: la tabla nunca se queda sin clave primaria
+        cursor.execute(
+            "ALTER TABLE empleado DROP PRIMARY KEY, "
+            "ADD COLUMN id INT UNSIGNED NOT NULL AUTO_INCREMENT FIRST, "
+            "ADD PRIMARY KEY (id)"
+        )
+
+    actuales = indices(cursor)
+    for nombre, definicion in INDICES.items():
+        if nombre not in actuales:
+            cursor.execute(f"CREATE INDEX {nombre} ON empleado {definicion}")
+    for nombre in OBSOLETOS:
+        if nombre in actuales:
+            cursor.execute(f"DROP INDEX {nombre} ON empleado")
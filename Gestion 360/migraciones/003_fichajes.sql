@@ -0,0 +1,30 @@
+-- Fichajes: eventos en bruto (solo se añaden; sin claves foráneas para no pagar la comprobación en cada INSERT)
+-- y horas trabajadas agregadas por día y por semana (semana = lunes), que mantiene app/database.py.
+CREATE TABLE IF NOT EXISTS fichaje (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    empleado_id INT UNSIGNED NOT NULL,
+    momento DATETIME NOT NULL,
+    tipo ENUM('entrada', 'salida') NOT NULL,
+    PRIMARY KEY (id),
+    INDEX idx_fichaje_empleado_momento (empleado_id, momento)
+);
+
+CREATE TABLE IF NOT EXISTS fichaje_diario (
+    empleado_id INT UNSIGNED NOT NULL,
+    fecha DATE NOT NULL,
+    segundos INT UNSIGNED NOT NULL,
+    fichajes INT UNSIGNED NOT NULL,
+    primera_entrada DATETIME NULL,
+    ultima_salida DATETIME NULL,
+    PRIMARY KEY (empleado_id, fecha),
+    INDEX idx_fichaje_diario_fecha (fecha)
+);
+
+CREATE TABLE IF NOT EXISTS fichaje_semanal (
+    empleado_id INT UNSIGNED NOT NULL,
+    semana DATE NOT NULL,
+    segundos INT UNSIGNED NOT NULL,
+    dias INT UNSIGNED NOT NULL,
+    PRIMARY KEY (empleado_id, semana),
+    INDEX idx_fichaje_semanal_semana (semana)
+);
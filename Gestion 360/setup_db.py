@@ -1,87 +1,53 @@
+"""
+Crea la base de datos DB_NAME si no existe y le aplica las migraciones pendientes de migraciones/
+(app/migrador.py). La app aplica las mismas migraciones al arrancar, así que solo hace falta para
+preparar la base de datos de antemano o desde un usuario con permisos para crearla.
+Uso: python setup_db.py
+"""
+import os
+import re
+import sys
+
 import mysql.connector
-from mysql.connector import Error
 from dotenv import load_dotenv
-import os
+from mysql.connector import Error
+
+from app.migrador import ErrorMigracion, aplicar_migraciones
 
 load_dotenv()
 
-print("=" * 60)
-print("PASO 1: Intentando conectar sin especificar BD")
-print("=" * 60)
 
-try:
-    connection = mysql.connector.connect(
-        host=os.getenv('DB_HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        port=int(os.getenv('DB_PORT', 3306))
-    )
-    
-    if connection.is_connected():
-        print("✅ Conexión exitosa!")
-        
+def main():
+    nombre = os.getenv('DB_NAME', '')
+    # El nombre va dentro de la sentencia (no admite parámetros): solo letras, dígitos y _
+    if not re.fullmatch(r"\w+", nombre):
+        print(f"❌ DB_NAME no válido: '{nombre}'")
+        return 1
+
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            port=int(os.getenv('DB_PORT', 3306))
+        )
         cursor = connection.cursor()
-        
-        # Crear base de datos si no existe
-        print("\n" + "=" * 60)
-        print("PASO 2: Creando base de datos...")
-        print("=" * 60)
-        
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {os.getenv('DB_NAME')}")
-        print(f"✅ Base de datos '{os.getenv('DB_NAME')}' lista")
-        
-        # Usar la base de datos
-        cursor.execute(f"USE {os.getenv('DB_NAME')}")
-        
-        # Crear tabla si no existe
-        print("\n" + "=" * 60)
-        print("PASO 3: Creando tabla empleado...")
-        print("=" * 60)
-        
-        create_table = """
-        CREATE TABLE IF NOT EXISTS empleado (
-            Nombre VARCHAR(100) NOT NULL,
-            `1Apellido` VARCHAR(100),
-            `2Apellido` VARCHAR(100),
-            Departamento VARCHAR(100),
-            Tipo_de_Jornada VARCHAR(50),
-            Horas INT,
-            Hora_de_fichar INT,
-            Sueldo INT,
-            PRIMARY KEY (Nombre)
-        );
-        """
-        
-        cursor.execute(create_table)
-        print("✅ Tabla 'empleado' lista")
-        
-        # Ver empleados existentes
-        print("\n" + "=" * 60)
-        print("PASO 4: Verificando empleados existentes...")
-        print("=" * 60)
-        
-        cursor.execute("SELECT * FROM empleado")
-        empleados = cursor.fetchall()
-        
-        print(f"Total de empleados: {len(empleados)}")
-        
-        if len(empleados) > 0:
-            print("\nEmpleados registrados:")
-            # Obtener nombres de columnas
-            columns = [desc[0] for desc in cursor.description]
-            for emp in empleados:
-                print(f"  - {dict(zip(columns, emp))}")
-        else:
-            print("No hay empleados registrados")
-        
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{nombre}`")
         cursor.close()
+        connection.database = nombre
+
+        aplicadas = aplicar_migraciones(connection)
         connection.close()
-        
-        print("\n✅ TODO ESTÁ LISTO PARA USAR")
-        
-except Error as e:
-    print(f"❌ Error: {e}")
-    print(f"Tipo: {type(e).__name__}")
-except Exception as e:
-    print(f"❌ Error inesperado: {e}")
-    print(f"Tipo: {type(e).__name__}")
+    except (Error, ErrorMigracion) as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    if aplicadas:
+        print(f"✅ Migraciones aplicadas: {', '.join(aplicadas)}")
+    else:
+        print("✅ El esquema ya estaba al día")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import date, datetime
+
+from mysql.connector import IntegrityError
+
+from app.database import _resumir_dia, _turnos
+from app.fichajes import BufferFichajes
+
+LUNES = date(2026, 10, 12)
+MARTES = date(2026, 10, 13)
+
+
+def _momento(fecha, hora, minuto=0):
+    return datetime(fecha.year, fecha.month, fecha.day, hora, minuto)
+
+
+# --- Resumen diario ---
+
+def test_turno_nocturno_reparte_las_horas_entre_los_dos_dias():
+    entrada = _momento(LUNES, 22)
+    salida = _momento(MARTES, 6)
+    eventos = [(entrada, "entrada"), (salida, "salida")]
+
+    assert _resumir_dia(eventos, LUNES) == (2 * 3600, 1, entrada, None)
+    assert _resumir_dia(eventos, MARTES) == (6 * 3600, 1, None, salida)
+
+
+def test_turnos_ignora_salidas_sin_entrada_y_entradas_repetidas():
+    eventos = [
+        (_momento(LUNES, 7), "salida"),
+        (_momento(LUNES, 8), "entrada"),
+        (_momento(LUNES, 9), "entrada"),
+        (_momento(LUNES, 14), "salida"),
+        (_momento(LUNES, 15), "salida"),
+    ]
+
+    assert _turnos(eventos) == [(_momento(LUNES, 8), _momento(LUNES, 14))]
+    assert _resumir_dia(eventos, LUNES)[0] == 6 * 3600
+
+
+def test_entrada_de_mas_de_24_horas_no_se_empareja():
+    eventos = [(_momento(LUNES, 8), "entrada"), (_momento(MARTES, 9), "salida")]
+
+    assert _turnos(eventos) == []
+
+
+# --- Buffer de ingesta ---
+
+def _evento(empleado_id):
+    return (empleado_id, _momento(LUNES, 9), "entrada")
+
+
+def test_evento_erroneo_se_descarta_y_el_resto_del_lote_se_guarda():
+    guardados = []
+    venenoso = _evento(999)
+
+    def guardar(lote):
+        if venenoso in lote:
+            raise IntegrityError("empleado inexistente")
+        guardados.extend(lote)
+        return True
+
+    buffer = BufferFichajes(guardar=guardar, lote=100)
+    lote = [_evento(i) for i in range(10)]
+    lote.insert(4, venenoso)
+
+    assert asyncio.run(buffer._guardar_lote(lote)) == []
+    assert guardados == [e for e in lote if e != venenoso]
+    assert buffer.guardados == 10
+    assert buffer.descartados == 1
+    assert buffer.ultimos_descartados[0][0] == venenoso
+
+
+def test_base_de_datos_caida_devuelve_el_lote_al_buffer():
+    buffer = BufferFichajes(guardar=lambda lote: False, lote=100)
+    buffer.agregar([_evento(i) for i in range(3)])
+
+    asyncio.run(buffer.vaciar())
+
+    assert buffer.pendientes == 3
+    assert buffer.errores == 1
+    assert buffer.guardados == 0
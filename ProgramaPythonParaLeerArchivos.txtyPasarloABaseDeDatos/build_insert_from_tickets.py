@@ -7,16 +7,42 @@ ver el parseo sin insertar en la base de datos.
 
 Uso básico:
     python .\build_insert_from_tickets.py --db-file facturas.db --facturas-dir facturas --verbose
+
+Con muchos tickets, parsear en paralelo con un proceso por núcleo:
+    python .\build_insert_from_tickets.py --db-file facturas.db --workers 0
+
+Los archivos pasan por un pipeline en streaming (descubrir -> leer -> parsear -> normalizar -> escribir)
+con colas acotadas entre etapas, así que la memoria no crece con el número de tickets.
+
+En ejecuciones periódicas sobre un archivo que crece, procesar solo los tickets nuevos o modificados:
+    python .\build_insert_from_tickets.py --db-file facturas.db --incremental
+
+Para ingerir los tickets según van llegando, dejarlo vigilando el directorio:
+    python .\build_insert_from_tickets.py --db-file facturas.db --watch --stats-file ingesta.json
 """
 
 from __future__ import annotations
 
 import argparse
-import glob
+import ctypes
+import ctypes.util
+import fnmatch
+import hashlib
+import itertools
+import json
 import os
+import queue
 import re
+import select
+import signal
 import sqlite3
-from typing import Dict, List, Any
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Any, Optional, TextIO
 from datetime import datetime
 
 
@@ -115,6 +141,127 @@ def parse_invoice(text: str) -> Dict[str, Any]:
     return data
 
 
+# Etapa 1 (descubrir): genera las rutas de los factura_*.txt en orden de nombre. Solo se
+# guardan los nombres para ordenarlos (unos 100 bytes por archivo); el contenido y las facturas
+# parseadas nunca se acumulan.
+def discover_files(facturas_dir: str, pattern: str = 'factura_*.txt') -> Iterator[str]:
+    with os.scandir(facturas_dir) as it:
+        names = sorted(entry.name for entry in it if fnmatch.fnmatch(entry.name, pattern) and entry.is_file())
+    for name in names:
+        yield os.path.join(facturas_dir, name)
+
+
+# Etapas 2 y 3 (leer y parsear) de un archivo. Se ejecuta también en los procesos del pool, así
+# que es una función de módulo (se puede enviar por pickle) y devuelve solo datos serializables.
+# Sin keep_raw_text se descarta el texto original, que solo guarda la base de datos SQLite,
+# para no copiarlo entre procesos ni retenerlo en las colas. Con fingerprint se añaden el tamaño,
+# el mtime y el sha256 del contenido leído (para el manifiesto de --incremental), calculados en el
+# mismo proceso que parsea para no leer el archivo dos veces.
+def parse_file(path: str, keep_raw_text: bool = True, fingerprint: bool = False) -> Dict[str, Any]:
+    if fingerprint:
+        with open(path, 'rb') as fh:
+            data = fh.read()
+            st = os.fstat(fh.fileno())
+        # Mismos saltos de línea que la lectura en modo texto
+        inv = parse_invoice(data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n'))
+        inv['file_size'] = st.st_size
+        inv['file_mtime_ns'] = st.st_mtime_ns
+        inv['sha256'] = hashlib.sha256(data).hexdigest()
+    else:
+        with open(path, 'r', encoding='utf-8') as fh:
+            inv = parse_invoice(fh.read())
+    inv['source_file'] = os.path.basename(path)
+    if not keep_raw_text:
+        inv.pop('raw_text', None)
+    return inv
+
+
+# Como parse_file, pero un archivo borrado o renombrado después de descubrirlo se devuelve como
+# {'source_file': ..., 'missing': True}, y con skip_errors uno que no se puede leer o parsear como
+# {'source_file': ..., 'error': ...}, en vez de lanzar la excepción (el resto del trozo sigue, y el
+# mensaje se puede enviar por pickle aunque la excepción no).
+def parse_file_or_error(path: str, keep_raw_text: bool = True, fingerprint: bool = False,
+                        skip_errors: bool = False) -> Dict[str, Any]:
+    try:
+        return parse_file(path, keep_raw_text, fingerprint)
+    except FileNotFoundError:
+        return {'source_file': os.path.basename(path), 'missing': True}
+    except Exception as e:
+        if not skip_errors:
+            raise
+        return {'source_file': os.path.basename(path), 'error': f'{type(e).__name__}: {e}'}
+
+
+# Parsea un trozo de archivos en un proceso del pool (un solo viaje por pickle por trozo).
+def parse_chunk(paths: List[str], keep_raw_text: bool = True, fingerprint: bool = False,
+                skip_errors: bool = False) -> List[Dict[str, Any]]:
+    return [parse_file_or_error(path, keep_raw_text, fingerprint, skip_errors) for path in paths]
+
+
+# Agrupa un iterable en listas de `size` elementos sin consumirlo entero.
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Genera las facturas parseadas de `paths`. Con workers > 1 reparte los archivos en un pool de
+# procesos por trozos de `chunksize`, con como mucho `max_pending` trozos en vuelo: si el escritor
+# va más lento, se dejan de enviar trozos y de descubrir archivos (back-pressure), en lugar de
+# encolar todo el directorio como haría Pool.imap. Los resultados salen en el orden de `paths`
+# (ordered) o según terminan (sin esperar a un trozo lento). Los archivos que ya no existen salen con
+# la clave 'missing' y, con skip_errors, los que fallan con la clave 'error' (ver parse_file_or_error).
+def iter_parsed(paths: Iterable[str], workers: int = 1, chunksize: int = 64, ordered: bool = True,
+                keep_raw_text: bool = True, max_pending: Optional[int] = None,
+                fingerprint: bool = False, skip_errors: bool = False) -> Iterator[Dict[str, Any]]:
+    if workers <= 1:
+        for path in paths:
+            yield parse_file_or_error(path, keep_raw_text, fingerprint, skip_errors)
+        return
+    max_pending = max_pending or workers * 2
+    chunks = chunked(paths, chunksize)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.append(pool.submit(parse_chunk, chunk, keep_raw_text, fingerprint, skip_errors))
+            if not pending:
+                return
+            if ordered:
+                done = pending.popleft()
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = finished.pop()
+                pending.remove(done)
+            yield from done.result()
+
+
+# Etapa 4 (normalizar): deriva los campos que necesitan los escritores a partir de lo parseado
+# (código y nombre del cajero, precio unitario de cada línea).
+def normalize_invoice(inv: Dict[str, Any]) -> Dict[str, Any]:
+    cajero = inv.get('cajero') or ''
+    emp_code, emp_name = '', cajero
+    if '-' in cajero:
+        parts = [part.strip() for part in cajero.split('-', 1)]
+        if len(parts) == 2:
+            emp_code, emp_name = parts[0], parts[1]
+    inv['cajero_codigo'] = emp_code
+    inv['cajero_nombre'] = emp_name
+    for it in inv.get('items', []):
+        cantidad = float(it.get('cantidad') or 0)
+        importe = float(it.get('importe') or 0)
+        it['precio_unitario'] = importe / cantidad if cantidad else importe
+    return inv
+
+
 # Asegura que las tablas SQLite básicas existen (invoices, items). Crea las tablas si faltan.
 def ensure_schema(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
@@ -153,7 +300,120 @@ def ensure_schema(conn: sqlite3.Connection) -> None:
     conn.commit()
 
 
-# Inserta un invoice (y sus items) en la BD SQLite. Devuelve el id insertado.
+# Índices de consulta. Se crean al final de la carga (ensure_indexes) para no mantenerlos fila a fila.
+SQLITE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_items_invoice_id ON items(invoice_id)',
+    'CREATE INDEX IF NOT EXISTS idx_invoices_ticket ON invoices(ticket)',
+)
+
+# Pragmas para cargas masivas: páginas de 16 KB (solo al crear la base; raw_text ocupa unos 4 KB por
+# factura), WAL (persistente en el archivo) y, durante la carga, sin fsync por transacción, caché de
+# 64 MB y temporales en memoria. Si el proceso muere a mitad, se pierde como mucho la transacción en
+# curso; con synchronous=OFF un corte de luz puede dejar la base a medias.
+SQLITE_LOAD_PRAGMAS = (
+    'PRAGMA page_size=16384',
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=OFF',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+# Crea los índices de consulta (si ya existen no hace nada). Con unique_ticket el índice sobre
+# ticket es el único de ensure_ticket_unique y no se crea el normal.
+def ensure_indexes(conn: sqlite3.Connection, unique_ticket: bool = False) -> None:
+    for sql in SQLITE_INDEXES:
+        if unique_ticket and 'idx_invoices_ticket' in sql:
+            continue
+        conn.execute(sql)
+    conn.commit()
+
+
+# Manifiesto de --incremental: un registro por archivo procesado, con el tamaño, el mtime y el
+# sha256 que tenía al leerlo.
+MANIFEST_TABLE = '''
+    CREATE TABLE IF NOT EXISTS processed_files (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        processed_at TEXT NOT NULL
+    )
+'''
+
+
+# Indica si `db_file` ya tiene el índice único por ticket de --incremental (sin crear la base).
+def has_unique_tickets(db_file: str) -> bool:
+    if not os.path.exists(db_file):
+        return False
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_invoices_ticket'").fetchone() is not None
+    finally:
+        conn.close()
+
+
+# Lee el manifiesto de `db_file` como {archivo: (size, mtime_ns, sha256)}. Sin base de datos o sin
+# tabla devuelve un diccionario vacío (y no crea nada, para que --dry-run no escriba).
+def load_manifest(db_file: str) -> Dict[str, tuple]:
+    if not os.path.exists(db_file):
+        return {}
+    conn = sqlite3.connect(db_file)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'processed_files'").fetchone():
+            return {}
+        return {path: (size, mtime_ns, sha256) for path, size, mtime_ns, sha256 in
+                conn.execute('SELECT path, size, mtime_ns, sha256 FROM processed_files')}
+    finally:
+        conn.close()
+
+
+# Deja pasar solo los archivos nuevos o cuyo tamaño o mtime no coinciden con el manifiesto; el
+# resto no se lee. `skipped` cuenta los omitidos.
+def filter_changed(paths: Iterable[str], manifest: Dict[str, tuple], skipped: Dict[str, int]) -> Iterator[str]:
+    for path in paths:
+        known = manifest.get(os.path.basename(path))
+        if known is not None:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                # Borrado o renombrado después de descubrirlo
+                continue
+            if (st.st_size, st.st_mtime_ns) == known[:2]:
+                skipped['files'] += 1
+                continue
+        yield path
+
+
+# Prepara una base de datos para upserts por número de ticket: borra los duplicados que hayan
+# dejado cargas no incrementales (se queda la última fila de cada ticket, con sus líneas) y crea
+# el índice único. Los tickets vacíos (archivo sin línea `Ticket:`) no son una clave: el índice es
+# parcial y nunca se consideran duplicados. Solo hace trabajo la primera vez (o si la base tiene el
+# índice antiguo, no parcial). La conexión debe estar en modo autocommit (isolation_level=None),
+# como la de SQLiteWriter.
+def ensure_ticket_unique(conn: sqlite3.Connection) -> int:
+    index = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'ux_invoices_ticket'").fetchone()
+    if index is not None and 'WHERE' in index[0]:
+        return 0
+    duplicates = '''SELECT id FROM invoices WHERE ticket <> ''
+                     AND id NOT IN (SELECT MAX(id) FROM invoices WHERE ticket <> '' GROUP BY ticket)'''
+    conn.execute('BEGIN')
+    try:
+        conn.execute(f'DELETE FROM items WHERE invoice_id IN ({duplicates})')
+        removed = conn.execute(f'DELETE FROM invoices WHERE id IN ({duplicates})').rowcount
+        conn.execute('DROP INDEX IF EXISTS ux_invoices_ticket')
+        conn.execute("CREATE UNIQUE INDEX ux_invoices_ticket ON invoices(ticket) WHERE ticket <> ''")
+        # El índice no único sobre ticket sobra con el único
+        conn.execute('DROP INDEX IF EXISTS idx_invoices_ticket')
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+    return removed
+
+
+# Inserta un invoice (y sus items) en la BD SQLite y confirma. Devuelve el id insertado.
+# Para cargar muchas facturas usar SQLiteWriter, que agrupa las inserciones por transacción.
 def insert_invoice(conn: sqlite3.Connection, invoice: Dict[str, Any]) -> int:
     cur = conn.cursor()
     cur.execute(
@@ -185,8 +445,689 @@ def insert_invoice(conn: sqlite3.Connection, invoice: Dict[str, Any]) -> int:
     return invoice_id
 
 
-# Punto de entrada: parsea argumentos, recorre archivos, parsea facturas y opcionalmente
-# escribe un script SQL normalizado o inserta en SQLite dependiendo de flags.
+# Escapa un valor para un literal SQL.
+def sql_escape(val: Any) -> str:
+    if val is None:
+        return 'NULL'
+    if isinstance(val, (int, float)):
+        return str(val)
+    s = str(val)
+    s = s.replace("'", "''")
+    return f"'{s}'"
+
+
+# Formatea un importe con dos decimales.
+def fmt_num(n: Any) -> str:
+    try:
+        return f"{float(n):.2f}"
+    except Exception:
+        return '0.00'
+
+
+# Etapa 5 (escribir). Cada escritor recibe las facturas de una en una (open, write..., close) y
+# solo guarda el estado imprescindible, nunca la lista de facturas.
+
+# Muestra un resumen por factura sin insertar nada (--dry-run).
+class DryRunWriter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def open(self) -> None:
+        print('\nResumen (dry-run):')
+
+    def write(self, inv: Dict[str, Any]) -> None:
+        print(f"{inv.get('source_file')}: ticket={inv.get('ticket')} fecha={inv.get('fecha')} total={inv.get('total')} items={len(inv.get('items'))}")
+        self.count += 1
+
+    def close(self) -> None:
+        pass
+
+
+# Escribe (en modo append) un script SQL normalizado para MySQL. Las tablas de búsqueda
+# (sucursal, empleado, producto) se deduplican con diccionarios que crecen con el número de
+# entidades distintas, no con el de tickets.
+class SqlScriptWriter:
+    def __init__(self, sql_path: str) -> None:
+        self.sql_path = sql_path
+        self.count = 0
+        self.out: Optional[TextIO] = None
+        self.sucursal_map: Dict[Any, int] = {}
+        self.empleado_map: Dict[Any, int] = {}
+        self.producto_map: Dict[str, int] = {}
+
+    def open(self) -> None:
+        # Abrir en modo append para insertar el script dentro del archivo destino
+        # Si el archivo no existe, se creará. Añadimos un encabezado con timestamp
+        out = self.out = open(self.sql_path, 'a', encoding='utf-8')
+        out.write('-- ------------------------------------------------------------\n')
+        out.write('-- SQL generado por build_insert_from_tickets.py (append)\n')
+        out.write('-- Generado: ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '\n')
+        out.write('-- ------------------------------------------------------------\n')
+        out.write('\n')
+        out.write('SET NAMES utf8mb4;\n')
+        out.write('SET FOREIGN_KEY_CHECKS = 0;\n')
+        out.write('\n-- Drop & recreate database `tienda` as requested\n')
+        out.write('DROP DATABASE IF EXISTS `tienda`;\n')
+        out.write('CREATE DATABASE `tienda` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;\n')
+        out.write('USE `tienda`;\n\n')
+        out.write('DROP TABLE IF EXISTS `items`;\n')
+        out.write('DROP TABLE IF EXISTS `invoices`;\n\n')
+        # Create normalized tables requested by the user
+        out.write('CREATE TABLE `sucursal` (\n')
+        out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
+        out.write('  `nombre` VARCHAR(255),\n')
+        out.write('  `direccion` TEXT,\n')
+        out.write('  `cif` VARCHAR(64)\n')
+        out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
+
+        out.write('CREATE TABLE `empleado` (\n')
+        out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
+        out.write('  `codigo` VARCHAR(64),\n')
+        out.write('  `nombre` VARCHAR(255)\n')
+        out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
+
+        out.write('CREATE TABLE `producto` (\n')
+        out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
+        out.write('  `descripcion` TEXT\n')
+        out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
+
+        out.write('CREATE TABLE `ticket` (\n')
+        out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
+        out.write('  `sucursal_id` INT,\n')
+        out.write('  `empleado_id` INT,\n')
+        out.write('  `fecha` VARCHAR(32),\n')
+        out.write('  `hora` VARCHAR(16),\n')
+        out.write('  `numero` VARCHAR(128),\n')
+        out.write('  `subtotal` DECIMAL(12,2),\n')
+        out.write('  `iva` DECIMAL(12,2),\n')
+        out.write('  `total` DECIMAL(12,2),\n')
+        out.write('  `forma_pago` VARCHAR(64),\n')
+        out.write('  `autorizacion` VARCHAR(64),\n')
+        out.write('  FOREIGN KEY (`sucursal_id`) REFERENCES `sucursal`(`id`),\n')
+        out.write('  FOREIGN KEY (`empleado_id`) REFERENCES `empleado`(`id`)\n')
+        out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
+
+        out.write('CREATE TABLE `ticket_linea` (\n')
+        out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
+        out.write('  `ticket_id` INT,\n')
+        out.write('  `producto_id` INT,\n')
+        out.write('  `cantidad` DECIMAL(12,3),\n')
+        out.write('  `precio_unitario` DECIMAL(12,4),\n')
+        out.write('  `importe` DECIMAL(12,2),\n')
+        out.write('  FOREIGN KEY (`ticket_id`) REFERENCES `ticket`(`id`),\n')
+        out.write('  FOREIGN KEY (`producto_id`) REFERENCES `producto`(`id`)\n')
+        out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
+
+        out.write('CREATE TABLE `pago` (\n')
+        out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
+        out.write('  `ticket_id` INT,\n')
+        out.write('  `metodo` VARCHAR(64),\n')
+        out.write('  `autorizacion` VARCHAR(64),\n')
+        out.write('  `importe` DECIMAL(12,2),\n')
+        out.write('  FOREIGN KEY (`ticket_id`) REFERENCES `ticket`(`id`)\n')
+        out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
+
+    def write(self, inv: Dict[str, Any]) -> None:
+        out = self.out
+        # Sucursal: key by (nombre,direccion,cif)
+        s_key = (inv.get('tienda') or '', inv.get('direccion') or '', inv.get('cif') or '')
+        if s_key not in self.sucursal_map:
+            sid = self.sucursal_map[s_key] = len(self.sucursal_map) + 1
+            out.write('INSERT INTO `sucursal` (`id`,`nombre`,`direccion`,`cif`) VALUES (' + ','.join([str(sid), sql_escape(s_key[0]), sql_escape(s_key[1]), sql_escape(s_key[2])]) + ');\n')
+
+        # Empleado: código y nombre separados en normalize_invoice
+        e_key = (inv['cajero_codigo'], inv['cajero_nombre'])
+        if e_key not in self.empleado_map:
+            eid = self.empleado_map[e_key] = len(self.empleado_map) + 1
+            out.write('INSERT INTO `empleado` (`id`,`codigo`,`nombre`) VALUES (' + ','.join([str(eid), sql_escape(e_key[0]), sql_escape(e_key[1])]) + ');\n')
+
+        # Ticket
+        self.count += 1
+        tid = self.count
+        ticket_vals = [
+            str(tid),
+            str(self.sucursal_map[s_key]),
+            str(self.empleado_map[e_key]),
+            sql_escape(inv.get('fecha')),
+            sql_escape(inv.get('hora')),
+            sql_escape(inv.get('ticket')),
+            fmt_num(inv.get('subtotal')),
+            fmt_num(inv.get('iva')),
+            fmt_num(inv.get('total')),
+            sql_escape(inv.get('forma_pago')),
+            sql_escape(inv.get('autorizacion')),
+        ]
+        out.write('-- ' + inv.get('source_file', '') + '\n')
+        out.write('INSERT INTO `ticket` (`id`,`sucursal_id`,`empleado_id`,`fecha`,`hora`,`numero`,`subtotal`,`iva`,`total`,`forma_pago`,`autorizacion`) VALUES (' + ','.join(ticket_vals) + ');\n')
+
+        # Lineas e insertar productos si no existen
+        for it in inv.get('items', []):
+            desc = (it.get('descripcion') or '').strip()
+            pid = self.producto_map.get(desc)
+            if pid is None:
+                pid = self.producto_map[desc] = len(self.producto_map) + 1
+                out.write('INSERT INTO `producto` (`id`,`descripcion`) VALUES (' + str(pid) + ',' + sql_escape(desc) + ');\n')
+            linea_vals = [
+                str(tid),
+                str(pid),
+                fmt_num(it.get('cantidad')),
+                f"{it['precio_unitario']:.4f}",
+                fmt_num(it.get('importe')),
+            ]
+            out.write('INSERT INTO `ticket_linea` (`ticket_id`,`producto_id`,`cantidad`,`precio_unitario`,`importe`) VALUES (' + ','.join(linea_vals) + ');\n')
+
+        # Pago
+        out.write('INSERT INTO `pago` (`ticket_id`,`metodo`,`autorizacion`,`importe`) VALUES (' + ','.join([str(tid), sql_escape(inv.get('forma_pago')), sql_escape(inv.get('autorizacion')), fmt_num(inv.get('total'))]) + ');\n')
+        out.write('\n')
+
+    def close(self) -> None:
+        self.out.write('SET FOREIGN_KEY_CHECKS = 1;\n')
+        self.out.write(f'-- Facturas incluidas: {self.count}\n')
+        self.out.close()
+        print('Script SQL escrito en', self.sql_path)
+
+
+# Carga las facturas en SQLite por lotes: una transacción cada `batch_size` facturas, con las
+# facturas y las líneas del lote en un executemany cada una y los pragmas de carga activos. Los ids
+# de factura se asignan aquí (siguiendo a sqlite_sequence) para poder enlazar las líneas sin esperar
+# a lastrowid. Los índices se crean al cerrar, con todas las filas ya dentro. La conexión se abre en
+# open(), es decir, en el hilo escritor, que es el único que escribe en la base.
+#
+# Con upsert (--incremental) cada ticket ocupa una sola fila: si el número de ticket ya existe se
+# reutiliza su id, se reemplaza la factura y se vuelven a insertar sus líneas. Además se registra
+# cada archivo en el manifiesto, en la misma transacción que sus datos. Las facturas marcadas como
+# `unchanged` (mismo sha256 que en el manifiesto) solo actualizan el manifiesto.
+class SQLiteWriter:
+    def __init__(self, db_file: str, verbose: bool = False, batch_size: int = 5000, upsert: bool = False) -> None:
+        self.db_file = db_file
+        self.verbose = verbose
+        self.batch_size = max(1, batch_size)
+        self.upsert = upsert
+        self.count = 0
+        self.item_count = 0
+        self.replaced = 0
+        self.unchanged = 0
+        self.conn: Optional[sqlite3.Connection] = None
+        self.next_id = 1
+        self.pending: List[Dict[str, Any]] = []
+        self.files: List[tuple] = []
+        self.started = 0.0
+
+    def open(self) -> None:
+        self.started = time.perf_counter()
+        # isolation_level=None: las transacciones se abren y cierran a mano en flush
+        self.conn = sqlite3.connect(self.db_file, isolation_level=None)
+        for pragma in SQLITE_LOAD_PRAGMAS:
+            self.conn.execute(pragma)
+        ensure_schema(self.conn)
+        if self.upsert:
+            self.conn.execute(MANIFEST_TABLE)
+            removed = ensure_ticket_unique(self.conn)
+            if removed:
+                print('Eliminadas', removed, 'facturas con el ticket repetido')
+            # Las búsquedas por ticket y los borrados de líneas de cada lote necesitan los índices ya
+            ensure_indexes(self.conn, unique_ticket=True)
+        # AUTOINCREMENT no reutiliza ids de facturas borradas: se sigue por el mayor de los dos
+        last_id, = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM invoices').fetchone()
+        seq = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'invoices'").fetchone()
+        self.next_id = max(last_id, seq[0] if seq else 0) + 1
+
+    def write(self, inv: Dict[str, Any]) -> None:
+        if self.upsert:
+            self.files.append((inv['source_file'], inv['file_size'], inv['file_mtime_ns'], inv['sha256'],
+                               datetime.now().isoformat(timespec='seconds')))
+        if inv.get('unchanged'):
+            self.unchanged += 1
+        else:
+            self.pending.append(inv)
+        if len(self.pending) >= self.batch_size or len(self.files) >= self.batch_size:
+            self.flush()
+
+    # Ids del lote: los tickets que ya están en la base conservan su id (se devuelven también en
+    # `existing`) y el resto recibe uno nuevo. Si un ticket se repite dentro del lote, gana la última
+    # factura. Las facturas sin número de ticket (None o '') siempre son nuevas.
+    def _assign_ids(self, invoices: List[Dict[str, Any]]) -> tuple:
+        existing: Dict[str, int] = {}
+        if self.upsert:
+            tickets = list({inv['ticket'] for inv in invoices if inv.get('ticket')})
+            for chunk in chunked(tickets, 500):
+                # `ticket <> ''` deja usar el índice parcial ux_invoices_ticket
+                existing.update(self.conn.execute(
+                    f"SELECT ticket, id FROM invoices WHERE ticket IN ({','.join('?' * len(chunk))}) AND ticket <> ''", chunk))
+            latest = {inv['ticket']: inv for inv in invoices if inv.get('ticket')}
+            invoices = [inv for inv in invoices if not inv.get('ticket') or latest[inv['ticket']] is inv]
+        ids = []
+        for inv in invoices:
+            iid = existing.get(inv['ticket']) if inv.get('ticket') else None
+            if iid is None:
+                iid = self.next_id
+                self.next_id += 1
+            ids.append(iid)
+        return invoices, ids, list(existing.values())
+
+    # Inserta el lote pendiente (facturas, líneas y manifiesto) en una transacción. Si falla, se
+    # deshace y el lote se descarta antes de relanzar el error: quien llama decide si reintentarlo.
+    def flush(self) -> None:
+        if not self.pending and not self.files:
+            return
+        try:
+            self.conn.execute('BEGIN')
+            invoices, ids, replaced = self._assign_ids(self.pending)
+            rows = [
+                (
+                    iid,
+                    inv.get('tienda'),
+                    inv.get('direccion'),
+                    inv.get('cif'),
+                    inv.get('fecha'),
+                    inv.get('hora'),
+                    inv.get('cajero'),
+                    inv.get('ticket'),
+                    inv.get('subtotal'),
+                    inv.get('iva'),
+                    inv.get('total'),
+                    inv.get('forma_pago'),
+                    inv.get('autorizacion'),
+                    inv.get('raw_text'),
+                )
+                for iid, inv in zip(ids, invoices)
+            ]
+            items = [(iid, it['cantidad'], it['descripcion'], it['importe']) for iid, inv in zip(ids, invoices) for it in inv.get('items', [])]
+            for chunk in chunked(replaced, 500):
+                self.conn.execute(f"DELETE FROM items WHERE invoice_id IN ({','.join('?' * len(chunk))})", chunk)
+            verb = 'INSERT OR REPLACE' if self.upsert else 'INSERT'
+            self.conn.executemany(
+                f'''{verb} INTO invoices (id,tienda,direccion,cif,fecha,hora,cajero,ticket,subtotal,iva,total,forma_pago,autorizacion,raw_text)
+                   VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',
+                rows,
+            )
+            self.conn.executemany('INSERT INTO items (invoice_id,cantidad,descripcion,importe) VALUES (?,?,?,?)', items)
+            if self.files:
+                self.conn.executemany('INSERT OR REPLACE INTO processed_files (path,size,mtime_ns,sha256,processed_at) VALUES (?,?,?,?,?)', self.files)
+            self.conn.execute('COMMIT')
+        except sqlite3.Error:
+            self.pending = []
+            self.files = []
+            # Tras algunos errores (disco lleno, E/S) SQLite ya ha deshecho la transacción
+            if self.conn.in_transaction:
+                self.conn.execute('ROLLBACK')
+            raise
+        if self.verbose:
+            for iid, inv in zip(ids, invoices):
+                print('Insertado invoice id=', iid, 'from', inv.get('source_file'))
+        self.count += len(rows)
+        self.item_count += len(items)
+        self.replaced += len(replaced)
+        self.pending = []
+        self.files = []
+
+    def close(self) -> None:
+        try:
+            self.flush()
+            if not self.upsert:
+                ensure_indexes(self.conn)
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+        finally:
+            self.conn.close()
+        elapsed = time.perf_counter() - self.started
+        rows = self.count + self.item_count
+        print('Insertadas', self.count, 'facturas en', self.db_file)
+        if self.upsert:
+            print(f'De ellas, {self.replaced} reemplazan a una factura con el mismo ticket; {self.unchanged} archivos con el mismo contenido')
+        print(f'{self.count} facturas y {self.item_count} líneas en {elapsed:.2f} s ({rows / elapsed if elapsed else 0:.0f} filas/s)')
+
+
+_END = object()
+
+
+# Conecta las facturas con el escritor a través de una cola acotada: el escritor corre en su
+# propio hilo y, si se queda atrás, `put` bloquea al productor (back-pressure) en lugar de
+# acumular facturas en memoria. Un error en el escritor se relanza aquí.
+def run_pipeline(invoices: Iterable[Dict[str, Any]], writer: Any, queue_size: int = 1000) -> None:
+    q: queue.Queue = queue.Queue(maxsize=queue_size)
+    errors: List[BaseException] = []
+
+    def consume() -> None:
+        inv = None
+        try:
+            writer.open()
+            while True:
+                inv = q.get()
+                if inv is _END:
+                    break
+                writer.write(inv)
+            writer.close()
+        except BaseException as exc:
+            errors.append(exc)
+            # Seguir vaciando la cola para que el productor no se quede bloqueado en put
+            # (si el error fue en close, el final ya se había leído)
+            while inv is not _END:
+                inv = q.get()
+
+    thread = threading.Thread(target=consume, name='writer')
+    thread.start()
+    try:
+        for inv in invoices:
+            if errors:
+                break
+            q.put(inv)
+    finally:
+        q.put(_END)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+# --- Modo vigilancia (--watch) ---
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+# Avisa de los archivos terminados de escribir en el directorio con inotify (Linux, vía ctypes):
+# IN_CLOSE_WRITE cuando quien escribe cierra el archivo e IN_MOVED_TO cuando se mueve ya completo
+# al directorio, así que no se ven archivos a medio escribir y no hace falta recorrer la carpeta.
+# Si el kernel pierde eventos (IN_Q_OVERFLOW) devuelve todos los archivos, y el manifiesto
+# descarta los ya procesados.
+class InotifyWatcher:
+    name = 'inotify'
+
+    def __init__(self, directory: str, pattern: str = 'factura_*.txt') -> None:
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify solo existe en Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.directory = directory
+        self.pattern = pattern
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err), directory)
+
+    # Devuelve las rutas listas, esperando como mucho `timeout` segundos a que llegue alguna.
+    def poll(self, timeout: float) -> List[str]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        ready = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return list(discover_files(self.directory, self.pattern))
+            if name and fnmatch.fnmatch(name, self.pattern):
+                ready.append(os.path.join(self.directory, name))
+        return ready
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+# Alternativa sin inotify (otros sistemas, carpetas de red): recorre el directorio cada `interval`
+# segundos y da un archivo por terminado cuando su tamaño y mtime no cambian durante `settle`
+# segundos. Lo que ya estaba al crearlo lo cubre la pasada inicial de --watch. Cada recorrido hace
+# un stat por archivo de la carpeta; solo se recuerdan los archivos que siguen en ella.
+class PollingWatcher:
+    name = 'polling'
+
+    def __init__(self, directory: str, pattern: str = 'factura_*.txt', interval: float = 1.0, settle: float = 1.0) -> None:
+        self.directory = directory
+        self.pattern = pattern
+        self.interval = interval
+        self.settle = settle
+        self.seen: Dict[str, tuple] = dict(self._scan())
+        self.changing: Dict[str, tuple] = {}
+        self.next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Iterator[tuple]:
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if fnmatch.fnmatch(entry.name, self.pattern) and entry.is_file():
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.name, (st.st_size, st.st_mtime_ns)
+
+    def poll(self, timeout: float) -> List[str]:
+        now = time.monotonic()
+        if now < self.next_scan:
+            time.sleep(min(timeout, self.next_scan - now))
+            return []
+        self.next_scan = now + self.interval
+        ready = []
+        present = set()
+        for name, sig in self._scan():
+            present.add(name)
+            if self.seen.get(name) == sig:
+                continue
+            previous = self.changing.get(name)
+            if previous is None or previous[0] != sig:
+                self.changing[name] = (sig, now)
+            elif now - previous[1] >= self.settle:
+                ready.append(os.path.join(self.directory, name))
+                self.seen[name] = sig
+                del self.changing[name]
+        # Olvida los archivos borrados o movidos (si vuelven, el manifiesto descarta los que no cambian)
+        for name in self.seen.keys() - present:
+            del self.seen[name]
+        for name in self.changing.keys() - present:
+            del self.changing[name]
+        return ready
+
+    def close(self) -> None:
+        pass
+
+
+# Usa inotify si se puede y, si no, el sondeo periódico.
+def open_watcher(directory: str, poll_interval: float, settle: float, polling: bool = False) -> Any:
+    if not polling:
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print('inotify no disponible, se vigila por sondeo:', e)
+    return PollingWatcher(directory, interval=poll_interval, settle=settle)
+
+
+# Contadores de la ingesta continua. El lag de un ticket es el tiempo desde la última modificación
+# de su archivo hasta que queda confirmado en la base de datos.
+class IngestStats:
+    def __init__(self, stats_file: Optional[str] = None) -> None:
+        self.stats_file = stats_file
+        self.started = time.monotonic()
+        self.files = 0
+        self.invoices = 0
+        self.skipped = 0
+        self.errors = 0
+        self.batches = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self.last_report = self.started
+        self.files_at_last_report = 0
+
+    def record(self, files: int, invoices: int, lags: List[float]) -> None:
+        self.batches += 1
+        self.files += files
+        self.invoices += invoices
+        if lags:
+            self.lag_last = max(lags)
+            self.lag_max = max(self.lag_max, self.lag_last)
+            self.lag_total += sum(lags)
+
+    def snapshot(self, pending: int) -> Dict[str, Any]:
+        now = time.monotonic()
+        interval = now - self.last_report
+        return {
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'uptime_s': round(now - self.started, 1),
+            'files': self.files,
+            'invoices': self.invoices,
+            'skipped_unchanged': self.skipped,
+            'errors': self.errors,
+            'batches': self.batches,
+            'pending': pending,
+            'lag_last_s': round(self.lag_last, 3),
+            'lag_avg_s': round(self.lag_total / self.files, 3) if self.files else 0.0,
+            'lag_max_s': round(self.lag_max, 3),
+            'files_per_s': round((self.files - self.files_at_last_report) / interval, 2) if interval > 0 else 0.0,
+            'files_per_s_total': round(self.files / (now - self.started), 2) if now > self.started else 0.0,
+        }
+
+    # Muestra los contadores (el ritmo es el del intervalo desde el informe anterior) y, con
+    # stats_file, los deja en JSON para monitorización (se reemplaza el archivo de una vez).
+    def report(self, pending: int) -> None:
+        snap = self.snapshot(pending)
+        self.last_report = time.monotonic()
+        self.files_at_last_report = self.files
+        print(f"[{snap['updated_at']}] archivos={snap['files']} facturas={snap['invoices']} pendientes={pending} "
+              f"errores={snap['errors']} lag último/medio/máx={snap['lag_last_s']}/{snap['lag_avg_s']}/{snap['lag_max_s']} s "
+              f"ritmo={snap['files_per_s']} archivos/s")
+        if self.stats_file:
+            tmp = self.stats_file + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump(snap, fh, indent=2)
+            os.replace(tmp, self.stats_file)
+
+
+# Consulta el manifiesto solo para los archivos indicados: {archivo: (size, mtime_ns, sha256)}.
+def lookup_manifest(conn: sqlite3.Connection, names: List[str]) -> Dict[str, tuple]:
+    known = {}
+    for chunk in chunked(names, 500):
+        rows = conn.execute(
+            f"SELECT path, size, mtime_ns, sha256 FROM processed_files WHERE path IN ({','.join('?' * len(chunk))})", chunk)
+        known.update((path, (size, mtime_ns, sha256)) for path, size, mtime_ns, sha256 in rows)
+    return known
+
+
+# Procesa un micro-lote de archivos: descarta los que coinciden con el manifiesto, parsea el resto
+# (un archivo que falla se cuenta y se salta, sin parar la vigilancia) y lo confirma en una
+# transacción. Si la base de datos falla (bloqueada, disco lleno...), cuenta el error y devuelve
+# False sin escribir nada del lote, para que se reintente entero; lo que ya se hubiera confirmado
+# está en el manifiesto y el reintento lo salta.
+def ingest_batch(paths: List[str], writer: SQLiteWriter, stats: IngestStats, verbose: bool = False) -> bool:
+    try:
+        _ingest_batch(paths, writer, stats, verbose)
+    except sqlite3.Error as e:
+        stats.errors += 1
+        print('Error de base de datos en un lote de', len(paths), 'archivos -', e)
+        return False
+    return True
+
+
+def _ingest_batch(paths: List[str], writer: SQLiteWriter, stats: IngestStats, verbose: bool) -> None:
+    known = lookup_manifest(writer.conn, [os.path.basename(path) for path in paths])
+    before = writer.count
+    files = 0
+    mtimes = []
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            # Borrado o renombrado antes de llegar a procesarlo
+            continue
+        previous = known.get(name)
+        if previous is not None and (st.st_size, st.st_mtime_ns) == previous[:2]:
+            stats.skipped += 1
+            continue
+        try:
+            inv = parse_file(path, keep_raw_text=True, fingerprint=True)
+        except Exception as e:
+            stats.errors += 1
+            print('Error al procesar', name, '-', e)
+            continue
+        if verbose:
+            print('Parseado:', name, '->', len(inv.get('items', [])), 'items')
+        if previous is not None and previous[2] == inv['sha256']:
+            inv['unchanged'] = True
+        writer.write(normalize_invoice(inv))
+        files += 1
+        mtimes.append(inv['file_mtime_ns'] / 1e9)
+    writer.flush()
+    committed = time.time()
+    stats.record(files, writer.count - before, [max(0.0, committed - mtime) for mtime in mtimes])
+
+
+# Espera máxima entre reintentos de un micro-lote que no se pudo escribir
+MAX_RETRY_DELAY = 60.0
+
+
+# Bucle de --watch: junta los archivos que avisa el vigilante y los escribe en micro-lotes, en
+# cuanto hay `batch_size` o el más antiguo lleva `batch_delay` segundos esperando. Si la base de
+# datos falla, los archivos siguen pendientes y el lote se reintenta con una espera que se dobla
+# (hasta MAX_RETRY_DELAY). Termina con Ctrl+C o SIGTERM después de escribir lo pendiente.
+# `errors` son los archivos que ya fallaron en la carga inicial.
+def watch(watcher: Any, args: argparse.Namespace, errors: int = 0) -> None:
+    writer = SQLiteWriter(args.db_file, args.verbose, args.batch_size, upsert=True)
+    writer.open()
+    # La carga es continua y en lotes pequeños: mejor confirmar cada micro-lote de forma segura
+    writer.conn.execute('PRAGMA synchronous=NORMAL')
+    stats = IngestStats(args.stats_file)
+    stats.errors = errors
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    pending: Dict[str, float] = {}
+    print(f'Vigilando {args.facturas_dir} ({watcher.name}); Ctrl+C para terminar')
+    next_report = time.monotonic() + args.stats_interval
+    retry_at = 0.0
+    retry_delay = 0.0
+    error: Optional[BaseException] = None
+    try:
+        while not stop.is_set():
+            for path in watcher.poll(0.2):
+                pending.setdefault(path, time.monotonic())
+            now = time.monotonic()
+            # pending conserva el orden de llegada: el primero es el que más lleva esperando
+            if pending and now >= retry_at and (len(pending) >= args.batch_size or now - next(iter(pending.values())) >= args.batch_delay):
+                if ingest_batch(list(pending), writer, stats, args.verbose):
+                    pending.clear()
+                    retry_delay = 0.0
+                else:
+                    retry_delay = min(max(retry_delay * 2, 1.0), MAX_RETRY_DELAY)
+                    retry_at = now + retry_delay
+                    print(f'{len(pending)} archivos pendientes; se reintenta en {retry_delay:.0f} s')
+            if now >= next_report:
+                stats.report(len(pending))
+                next_report = now + args.stats_interval
+        if pending and ingest_batch(list(pending), writer, stats, args.verbose):
+            pending.clear()
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        watcher.close()
+        try:
+            writer.close()
+        except sqlite3.Error as e:
+            stats.errors += 1
+            print('Error al cerrar la base de datos:', e)
+            # Con un error anterior se propaga ese, que es el que explica la parada
+            if error is None:
+                raise
+        finally:
+            # Lo que quede pendiente no está en el manifiesto: se procesa en la carga inicial del siguiente arranque
+            stats.report(len(pending))
+
+
+# Punto de entrada: parsea argumentos y monta el pipeline descubrir -> leer -> parsear ->
+# normalizar -> escribir, con el escritor elegido por flags (dry-run, script SQL o SQLite).
 def main() -> None:
     p = argparse.ArgumentParser(description='Parsear facturas y crear una base de datos SQLite')
     # Argumentos: archivo sqlite, directorio facturas, dry-run, sql-file, verbose
@@ -195,223 +1136,93 @@ def main() -> None:
     p.add_argument('--dry-run', action='store_true', help='Solo parsear y mostrar, sin insertar')
     p.add_argument('--sql-file', default=None, help='Escribir un script SQL con CREATE TABLE e INSERT (ej. InsertUnderlineTicket.sql)')
     p.add_argument('--verbose', action='store_true', help='Mostrar detalles')
+    p.add_argument('--workers', type=int, default=1, help='Procesos que parsean en paralelo (0 = uno por núcleo)')
+    p.add_argument('--chunksize', type=int, default=64, help='Archivos por envío a cada proceso')
+    p.add_argument('--unordered', action='store_true', help='Recoger los resultados según terminan, sin mantener el orden de archivo')
+    p.add_argument('--queue-size', type=int, default=1000, help='Facturas como máximo en la cola hacia el escritor')
+    p.add_argument('--batch-size', type=int, default=5000, help='Facturas por transacción al escribir en SQLite')
+    p.add_argument('--incremental', action='store_true', help='Procesar solo archivos nuevos o modificados y actualizar por número de ticket')
+    p.add_argument('--watch', action='store_true', help='Después de la carga, seguir vigilando el directorio e ingerir los tickets según llegan (implica --incremental)')
+    p.add_argument('--batch-delay', type=float, default=1.0, help='Con --watch, segundos como máximo que espera un ticket para escribirse')
+    p.add_argument('--polling', action='store_true', help='Con --watch, vigilar por sondeo aunque haya inotify (cada sondeo recorre la carpeta entera)')
+    p.add_argument('--poll-interval', type=float, default=1.0, help='Con --watch por sondeo, segundos entre recorridos del directorio')
+    p.add_argument('--settle', type=float, default=1.0, help='Con --watch por sondeo, segundos sin cambios para dar un archivo por terminado')
+    p.add_argument('--stats-interval', type=float, default=60.0, help='Con --watch, segundos entre informes de lag y ritmo')
+    p.add_argument('--stats-file', default=None, help='Con --watch, archivo JSON donde dejar los contadores en cada informe')
     args = p.parse_args()
+    if args.watch:
+        if args.dry_run or args.sql_file:
+            p.error('--watch escribe en la base de datos SQLite (no se puede usar con --dry-run ni --sql-file)')
+        args.incremental = True
+    if args.incremental and args.sql_file and not args.dry_run:
+        p.error('--incremental necesita la base de datos SQLite (no se puede usar con --sql-file)')
+    if not args.incremental and not args.dry_run and not args.sql_file and has_unique_tickets(args.db_file):
+        p.error(f'{args.db_file} ya se carga con --incremental (un registro por ticket); volver a usar --incremental')
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
 
-    # Buscar archivos que coincidan con el patrón factura_*.txt
-    pattern = os.path.join(args.facturas_dir, 'factura_*.txt')
-    files = sorted(glob.glob(pattern))
-    if not files:
+    if not os.path.isdir(args.facturas_dir):
         print('No se encontraron facturas en', args.facturas_dir)
         return
 
-    # Parsear cada archivo y acumular facturas
-    invoices = []
-    for f in files:
-        with open(f, 'r', encoding='utf-8') as fh:
-            txt = fh.read()
-        inv = parse_invoice(txt)
-        inv['source_file'] = os.path.basename(f)
-        invoices.append(inv)
-        if args.verbose:
-            print('Parseado:', f, '->', len(inv.get('items', [])), 'items')
-
-    # Si solo queremos ver un resumen, mostrar y salir
+    # El vigilante se crea antes de la carga inicial para no perder los tickets que lleguen durante
+    # ella; si alguno se procesa dos veces, el manifiesto lo descarta
+    watcher = open_watcher(args.facturas_dir, args.poll_interval, args.settle, args.polling) if args.watch else None
+
+    # El escritor decide qué hace falta: solo SQLite guarda el texto original
     if args.dry_run:
-        print('\nResumen (dry-run):')
-        for inv in invoices:
-            print(f"{inv.get('source_file')}: ticket={inv.get('ticket')} fecha={inv.get('fecha')} total={inv.get('total')} items={len(inv.get('items'))}")
-        return
+        writer = DryRunWriter()
+    elif args.sql_file:
+        writer = SqlScriptWriter(args.sql_file)
+    else:
+        writer = SQLiteWriter(args.db_file, args.verbose, args.batch_size, upsert=args.incremental)
+    keep_raw_text = isinstance(writer, SQLiteWriter)
 
-    # Si se pide generar un script SQL (normalizado para MySQL), construir y escribirlo
-    if args.sql_file:
-        def sql_escape(val: Any) -> str:
-            if val is None:
-                return 'NULL'
-            if isinstance(val, (int, float)):
-                return str(val)
-            s = str(val)
-            s = s.replace("'", "''")
-            return f"'{s}'"
-
-        def fmt_num(n: Any) -> str:
-            try:
-                return f"{float(n):.2f}"
-            except Exception:
-                return '0.00'
+    # En modo incremental solo se leen los archivos que no están en el manifiesto o cuyo tamaño o
+    # mtime han cambiado; si el contenido resulta ser el mismo, solo se actualiza el manifiesto
+    manifest = load_manifest(args.db_file) if args.incremental else {}
+    skipped = {'files': 0}
+    # Con --watch, un archivo que no se puede parsear se cuenta y se salta (como en la vigilancia)
+    # en vez de impedir el arranque; se vuelve a intentar cuando cambie
+    failed = {'files': 0}
 
-        sql_path = args.sql_file
-        # Abrir en modo append para insertar el script dentro del archivo destino
-        # Si el archivo no existe, se creará. Añadimos un encabezado con timestamp
-        with open(sql_path, 'a', encoding='utf-8') as out:
-            out.write('-- ------------------------------------------------------------\n')
-            out.write('-- SQL generado por build_insert_from_tickets.py (append)\n')
-            out.write('-- Generado: ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '\n')
-            try:
-                sources = ','.join([inv.get('source_file', '') for inv in invoices])
-            except Exception:
-                sources = ''
-            out.write('-- Facturas: ' + sources + '\n')
-            out.write('-- ------------------------------------------------------------\n')
-            out.write('\n')
-            out.write('SET NAMES utf8mb4;\n')
-            out.write('SET FOREIGN_KEY_CHECKS = 0;\n')
-            out.write('\n-- Drop & recreate database `tienda` as requested\n')
-            out.write('DROP DATABASE IF EXISTS `tienda`;\n')
-            out.write('CREATE DATABASE `tienda` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;\n')
-            out.write('USE `tienda`;\n\n')
-            out.write('DROP TABLE IF EXISTS `items`;\n')
-            out.write('DROP TABLE IF EXISTS `invoices`;\n\n')
-            # Create normalized tables requested by the user
-            out.write('CREATE TABLE `sucursal` (\n')
-            out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
-            out.write('  `nombre` VARCHAR(255),\n')
-            out.write('  `direccion` TEXT,\n')
-            out.write('  `cif` VARCHAR(64)\n')
-            out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
-
-            out.write('CREATE TABLE `empleado` (\n')
-            out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
-            out.write('  `codigo` VARCHAR(64),\n')
-            out.write('  `nombre` VARCHAR(255)\n')
-            out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
-
-            out.write('CREATE TABLE `producto` (\n')
-            out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
-            out.write('  `descripcion` TEXT\n')
-            out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
-
-            out.write('CREATE TABLE `ticket` (\n')
-            out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
-            out.write('  `sucursal_id` INT,\n')
-            out.write('  `empleado_id` INT,\n')
-            out.write('  `fecha` VARCHAR(32),\n')
-            out.write('  `hora` VARCHAR(16),\n')
-            out.write('  `numero` VARCHAR(128),\n')
-            out.write('  `subtotal` DECIMAL(12,2),\n')
-            out.write('  `iva` DECIMAL(12,2),\n')
-            out.write('  `total` DECIMAL(12,2),\n')
-            out.write('  `forma_pago` VARCHAR(64),\n')
-            out.write('  `autorizacion` VARCHAR(64),\n')
-            out.write('  FOREIGN KEY (`sucursal_id`) REFERENCES `sucursal`(`id`),\n')
-            out.write('  FOREIGN KEY (`empleado_id`) REFERENCES `empleado`(`id`)\n')
-            out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
-
-            out.write('CREATE TABLE `ticket_linea` (\n')
-            out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
-            out.write('  `ticket_id` INT,\n')
-            out.write('  `producto_id` INT,\n')
-            out.write('  `cantidad` DECIMAL(12,3),\n')
-            out.write('  `precio_unitario` DECIMAL(12,4),\n')
-            out.write('  `importe` DECIMAL(12,2),\n')
-            out.write('  FOREIGN KEY (`ticket_id`) REFERENCES `ticket`(`id`),\n')
-            out.write('  FOREIGN KEY (`producto_id`) REFERENCES `producto`(`id`)\n')
-            out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
-
-            out.write('CREATE TABLE `pago` (\n')
-            out.write('  `id` INT AUTO_INCREMENT PRIMARY KEY,\n')
-            out.write('  `ticket_id` INT,\n')
-            out.write('  `metodo` VARCHAR(64),\n')
-            out.write('  `autorizacion` VARCHAR(64),\n')
-            out.write('  `importe` DECIMAL(12,2),\n')
-            out.write('  FOREIGN KEY (`ticket_id`) REFERENCES `ticket`(`id`)\n')
-            out.write(') ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;\n\n')
-
-            # Build lookup tables and insert data
-            sucursal_map = {}
-            empleado_map = {}
-            producto_map = {}
-            next_sucursal_id = 1
-            next_empleado_id = 1
-            next_producto_id = 1
-            next_ticket_id = 1
-
-            for inv in invoices:
-                # Sucursal: key by (nombre,direccion,cif)
-                s_key = (inv.get('tienda') or '', inv.get('direccion') or '', inv.get('cif') or '')
-                if s_key not in sucursal_map:
-                    sid = next_sucursal_id
-                    next_sucursal_id += 1
-                    sucursal_map[s_key] = sid
-                    out.write('INSERT INTO `sucursal` (`id`,`nombre`,`direccion`,`cif`) VALUES (' + ','.join([str(sid), sql_escape(s_key[0]), sql_escape(s_key[1]), sql_escape(s_key[2])]) + ');\n')
-
-                # Empleado: try split code - name if possible
-                cajero = inv.get('cajero') or ''
-                emp_code = ''
-                emp_name = cajero
-                if '-' in cajero:
-                    parts = [p.strip() for p in cajero.split('-', 1)]
-                    if len(parts) == 2:
-                        emp_code, emp_name = parts[0], parts[1]
-                e_key = (emp_code, emp_name)
-                if e_key not in empleado_map:
-                    eid = next_empleado_id
-                    next_empleado_id += 1
-                    empleado_map[e_key] = eid
-                    out.write('INSERT INTO `empleado` (`id`,`codigo`,`nombre`) VALUES (' + ','.join([str(eid), sql_escape(emp_code), sql_escape(emp_name)]) + ');\n')
-
-                # Ticket
-                tid = next_ticket_id
-                next_ticket_id += 1
-                sid = sucursal_map[s_key]
-                eid = empleado_map[e_key]
-                ticket_vals = [
-                    str(tid),
-                    str(sid),
-                    str(eid),
-                    sql_escape(inv.get('fecha')),
-                    sql_escape(inv.get('hora')),
-                    sql_escape(inv.get('ticket')),
-                    fmt_num(inv.get('subtotal')),
-                    fmt_num(inv.get('iva')),
-                    fmt_num(inv.get('total')),
-                    sql_escape(inv.get('forma_pago')),
-                    sql_escape(inv.get('autorizacion')),
-                ]
-                out.write('INSERT INTO `ticket` (`id`,`sucursal_id`,`empleado_id`,`fecha`,`hora`,`numero`,`subtotal`,`iva`,`total`,`forma_pago`,`autorizacion`) VALUES (' + ','.join(ticket_vals) + ');\n')
-
-                # Lineas e insertar productos si no existen
-                for it in inv.get('items', []):
-                    desc = (it.get('descripcion') or '').strip()
-                    if desc not in producto_map:
-                        pid = next_producto_id
-                        next_producto_id += 1
-                        producto_map[desc] = pid
-                        out.write('INSERT INTO `producto` (`id`,`descripcion`) VALUES (' + str(pid) + ',' + sql_escape(desc) + ');\n')
-                    else:
-                        pid = producto_map[desc]
-
-                    cantidad = float(it.get('cantidad') or 0)
-                    importe = float(it.get('importe') or 0)
-                    precio_unit = importe / cantidad if cantidad and cantidad != 0 else importe
-                    linea_vals = [
-                        str(tid),
-                        str(pid),
-                        fmt_num(cantidad),
-                        f"{precio_unit:.4f}",
-                        fmt_num(importe),
-                    ]
-                    out.write('INSERT INTO `ticket_linea` (`ticket_id`,`producto_id`,`cantidad`,`precio_unitario`,`importe`) VALUES (' + ','.join(linea_vals) + ');\n')
-
-                # Pago
-                out.write('INSERT INTO `pago` (`ticket_id`,`metodo`,`autorizacion`,`importe`) VALUES (' + ','.join([str(tid), sql_escape(inv.get('forma_pago')), sql_escape(inv.get('autorizacion')), fmt_num(inv.get('total'))]) + ');\n')
-                out.write('\n')
-
-            out.write('SET FOREIGN_KEY_CHECKS = 1;\n')
-
-        print('Script SQL escrito en', sql_path)
-        return
+    def stages() -> Iterator[Dict[str, Any]]:
+        paths = discover_files(args.facturas_dir)
+        if args.incremental:
+            paths = filter_changed(paths, manifest, skipped)
+        for inv in iter_parsed(paths, workers, args.chunksize, ordered=not args.unordered,
+                               keep_raw_text=keep_raw_text, fingerprint=args.incremental,
+                               skip_errors=args.watch):
+            if inv.get('missing'):
+                continue
+            if 'error' in inv:
+                failed['files'] += 1
+                print('Error al procesar', inv['source_file'], '-', inv['error'])
+                continue
+            if args.verbose:
+                print('Parseado:', inv['source_file'], '->', len(inv.get('items', [])), 'items')
+            known = manifest.get(inv['source_file'])
+            if known is not None and known[2] == inv['sha256']:
+                inv['unchanged'] = True
+            yield normalize_invoice(inv)
 
-    # Conectar a SQLite, asegurar esquema e insertar facturas parseadas
-    conn = sqlite3.connect(args.db_file)
-    ensure_schema(conn)
-    for inv in invoices:
-        iid = insert_invoice(conn, inv)
-        if args.verbose:
-            print('Insertado invoice id=', iid, 'from', inv.get('source_file'))
+    # Se mira la primera factura antes de arrancar el escritor para no crear un script o una
+    # base de datos vacíos si el directorio no tiene facturas
+    invoices = stages()
+    first = next(invoices, None)
+    if first is not None:
+        run_pipeline(itertools.chain([first], invoices), writer, args.queue_size)
+        if args.incremental:
+            print('Archivos sin cambios (no leídos):', skipped['files'])
+    elif skipped['files']:
+        print('Sin cambios:', skipped['files'], 'archivos ya procesados')
+    elif not failed['files']:
+        print('No se encontraron facturas en', args.facturas_dir)
+    if failed['files']:
+        print('Archivos con errores (saltados):', failed['files'])
 
-    print('Insertadas', len(invoices), 'facturas en', args.db_file)
+    if watcher is not None:
+        watch(watcher, args, failed['files'])
 
 
 if __name__ == '__main__':
     main()
-
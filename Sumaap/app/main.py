@@ -1,15 +1,20 @@
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from comun.metrics import MetricsMiddleware, registro, instrumentar_plantillas
 
 app = FastAPI(title="SumaAP")
 
 # Servir archivos estáticos
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Motor de plantillas
+# Motor de plantillas (el renderizado se mide como fase "render")
 templates = Jinja2Templates(directory="app/templates")
+instrumentar_plantillas(templates)
+
+# Latencia por ruta y por fase, expuesta en GET /metrics
+app.add_middleware(MetricsMiddleware)
 
 # --- GET: muestra el formulario ---
 @app.get("/", response_class=HTMLResponse)
@@ -26,4 +31,9 @@ def post_calcular(
 ):
     suma = numero1 + numero2
     contexto = {"request": request, "numero1": numero1, "numero2": numero2, "suma": suma}
-    return templates.TemplateResponse("pages/resultados.html", contexto)
\ No newline at end of file
+    return templates.TemplateResponse("pages/resultados.html", contexto)
+
+# --- GET: métricas en formato Prometheus ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(registro.exportar(), media_type="text/plain; version=0.0.4")
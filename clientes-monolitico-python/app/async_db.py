@@ -0,0 +1,27 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Tantos hilos como conexiones tiene el pool: ningún hilo se queda esperando una conexión
+# y el exceso de peticiones espera en el event loop sin bloquearlo.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+    thread_name_prefix="db"
+)
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Ejecuta una función bloqueante de `database.py` en el executor de base de datos
+    sin bloquear el event loop. Propaga el contexto (contextvars) de la petición.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor, functools.partial(ctx.run, func, *args, **kwargs)
+    )
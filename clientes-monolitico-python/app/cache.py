@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+# Centinela para distinguir "no está en caché" de un valor cacheado None
+MISSING = object()
+
+
+class CacheBackend(ABC):
+    """
+    Interfaz mínima de caché clave/valor con TTL. Permite sustituir la caché en memoria
+    por otra compartida entre procesos (por ejemplo un servicio tipo Redis) sin tocar
+    `database.py`.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """Devuelve el valor o `MISSING` si no existe o ha caducado."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Incrementa un contador (nunca caduca ni se expulsa) y devuelve el nuevo valor."""
+
+    @abstractmethod
+    def counter(self, key: str) -> int:
+        """Valor actual de un contador (0 si no existe)."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class MemoryCache(CacheBackend):
+    """Caché LRU en memoria con caducidad por entrada y contadores de aciertos/fallos/expulsiones."""
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        # Los contadores (versiones) van aparte para que la LRU no los expulse
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return MISSING
+            value, expira = item
+            if expira and expira < time.monotonic():
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expira = time.monotonic() + ttl if ttl > 0 else 0.0
+        with self._lock:
+            self._data[key] = (value, expira)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / total if total else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+
+class NullCache(CacheBackend):
+    """Caché desactivada (CACHE_BACKEND=none): todas las lecturas van a la base de datos."""
+
+    def __init__(self):
+        self._misses = 0
+        self._counters: Dict[str, int] = {}
+
+    def get(self, key: str) -> Any:
+        self._misses += 1
+        return MISSING
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "none", "misses": self._misses}
+
+
+_BACKENDS: Dict[str, Callable[[], CacheBackend]] = {
+    "memory": lambda: MemoryCache(
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "10000")),
+        default_ttl=float(os.getenv("CACHE_TTL", "60")),
+    ),
+    "none": NullCache,
+}
+
+_cache: CacheBackend | None = None
+
+
+def get_cache() -> CacheBackend:
+    """Devuelve la caché configurada con CACHE_BACKEND (memory | none)."""
+    global _cache
+    if _cache is None:
+        _cache = _BACKENDS[os.getenv("CACHE_BACKEND", "memory")]()
+    return _cache
+
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    """Sustituye la caché (p. ej. por un backend compartido entre procesos)."""
+    global _cache
+    _cache = backend
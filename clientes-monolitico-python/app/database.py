@@ -1,47 +1,175 @@
 from dotenv import load_dotenv, find_dotenv
 import os
-import mysql.connector
-from typing import List, Dict, Any, cast
-from mysql.connector.cursor import MySQLCursorDict  # opción C si la prefieres
+import threading
+import time
+from typing import List, Dict, Any, Callable, Iterator, Tuple
+
+from app.search import indice_clientes
+from app.cache import get_cache, MISSING
+from app.storage import COLUMNAS_ORDEN, EmailDuplicado, get_storage
 
 # Carga .env desde la raíz
 load_dotenv(find_dotenv())
 
-def get_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),        # <— corregidos nombres
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD", ""),
-        database=os.getenv("DB_NAME", "clientes_db"),
-        port=int(os.getenv("DB_PORT", "3306")),
-        charset="utf8mb4"
-    )
+# El acceso a los datos lo hace el backend elegido con DB_BACKEND (app/storage.py);
+# aquí se añaden la caché, el índice de búsqueda y la versión de la tabla, comunes a todos.
+
+# --- Caché de lecturas ---
+# Las fichas se cachean por id y se invalidan una a una; los listados llevan en la clave
+# la versión de la tabla que guarda el backend, que cada escritura incrementa (las claves
+# viejas caducan solas). Al ser la misma en todos los workers, un listado cacheado en un
+# proceso deja de usarse en cuanto otro escribe.
+_CLAVE_VERSION = "clientes:version"
+
+
+def _clave_listado(*partes: Any) -> str:
+    version, _ = get_storage().version()
+    return f"clientes:v{version}:" + ":".join(repr(p) for p in partes)
+
+
+def _read_through(clave: str, cargar: Callable[[], Any]) -> Any:
+    """Devuelve el valor cacheado o lo carga del backend y lo guarda."""
+    if not get_storage().usa_cache:
+        return cargar()
+    cache = get_cache()
+    valor = cache.get(clave)
+    if valor is not MISSING:
+        return valor
+    version = cache.counter(_CLAVE_VERSION)
+    valor = cargar()
+    # Si hubo una escritura mientras consultábamos, el valor puede estar ya obsoleto
+    if cache.counter(_CLAVE_VERSION) == version:
+        cache.set(clave, valor)
+        # Las escrituras suben la versión antes de borrar: si subió entre la comprobación y el set,
+        # su borrado puede haber llegado antes que nuestro set, así que lo deshacemos aquí
+        if cache.counter(_CLAVE_VERSION) != version:
+            cache.delete(clave)
+    return valor
+
+
+def _invalidar_cliente(cliente_id: int) -> None:
+    """
+    Invalida todos los listados (nueva versión de la tabla) y la ficha del cliente. La versión sube
+    antes del borrado: una lectura que cargó la ficha antigua y aún no la ha guardado ya no la guarda
+    (ver `_read_through`), en vez de volver a dejarla cacheada hasta que caduque.
+    """
+    _nueva_version()
+    get_cache().delete(f"cliente:{cliente_id}")
+
+
+def _nueva_version() -> None:
+    """
+    Incrementa la versión de la tabla clientes (se llama tras cada escritura confirmada): la del
+    backend, común a todos los workers, y el contador local con el que `_read_through` detecta
+    escrituras del propio proceso durante una lectura.
+    """
+    get_storage().tocar_version()
+    get_cache().incr(_CLAVE_VERSION)
+
+
+def version_clientes() -> Tuple[str, float]:
+    """
+    Versión de la tabla para la validación HTTP (ETag / Last-Modified):
+    (etiqueta que cambia con cada alta, edición o baja, instante de la última escritura).
+    Sale del backend, así que todos los workers dan la misma. El instante entra en la etiqueta
+    para no repetirla si el contador vuelve a empezar (base de datos recreada, backend en memoria).
+    """
+    version, modificado = get_storage().version()
+    return f"{version:x}-{int(modificado * 1000):x}", modificado
+
 
 def fetch_all_clientes() -> List[Dict[str, Any]]:
     """
-    Ejecuta SELECT * FROM clientes y devuelve una lista de dicts.
+    Ejecuta SELECT * FROM clientes y devuelve una lista de dicts (cacheada).
+    """
+    return _read_through(_clave_listado("todos"), lambda: get_storage().fetch_all())
+
+
+def iter_clientes(batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre toda la tabla en lotes de `batch_size` filas (en MySQL con un cursor sin buffer),
+    sin cargar el resultado completo en memoria.
+    """
+    return get_storage().iter_all(batch_size)
+
+
+def fetch_clientes_by_ids(ids: List[int]) -> List[Dict[str, Any]]:
     """
-    conn = None
+    Obtiene varios clientes por su ID en una sola consulta (WHERE id IN (...)).
+    Respeta el orden de `ids` y omite los que ya no existen.
+    """
+    if not ids:
+        return []
+    return get_storage().fetch_by_ids(ids)
+
+
+def search_clientes(consulta: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Busca clientes por nombre, apellido, email o teléfono (prefijo, sin tildes y
+    tolerante a erratas) usando el índice en memoria; lo construye en el primer uso.
+    """
+    indice_clientes.asegurar_construido(iter_clientes)
+    return fetch_clientes_by_ids(indice_clientes.buscar(consulta, limit))
+
+
+def warm_up_search_index() -> None:
+    """Construye el índice de búsqueda por adelantado (se llama en segundo plano al arrancar)."""
     try:
-        conn = get_connection()
-        # Opción C (anotación explícita del cursor):
-        cur: MySQLCursorDict
-        cur = conn.cursor(dictionary=True)  # type: ignore[assignment]
-        try:
-            cur.execute(
-                "SELECT id, nombre, apellido, email, telefono, direccion FROM clientes;"
-            )
-            # Opción A: cast para contentar al type checker
-            rows = cast(List[Dict[str, Any]], cur.fetchall())
-            return rows
-
-            # Opción B alternativa (sin cast):
-            # return [dict(row) for row in cur.fetchall()]
-        finally:
-            cur.close()
-    finally:
-        if conn:
-            conn.close()
+        indice_clientes.asegurar_construido(iter_clientes)
+    except Exception:
+        # Sin base de datos disponible: se reintentará en la primera búsqueda
+        pass
+
+
+def fetch_clientes_page(
+    limit: int,
+    orden: str = "id",
+    descendente: bool = False,
+    cursor: Tuple[Any, int] | None = None,
+    hacia_atras: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Paginación keyset: devuelve hasta `limit` clientes ordenados por (orden, id)
+    situados después del `cursor` (valor de la columna, id) o, con `hacia_atras=True`,
+    los inmediatamente anteriores. Las filas se devuelven siempre en el orden de presentación.
+    El resultado se cachea por versión de la tabla.
+    """
+    if orden not in COLUMNAS_ORDEN:
+        raise ValueError(f"Columna de orden no permitida: {orden}")
+
+    return _read_through(
+        _clave_listado("pagina", limit, orden, descendente, cursor, hacia_atras),
+        lambda: get_storage().fetch_page(limit, orden, descendente, cursor, hacia_atras)
+    )
+
+
+# Caché del COUNT(*): se ajusta en cada alta/baja y se recalcula cada CLIENTES_COUNT_TTL segundos
+_COUNT_TTL = float(os.getenv("CLIENTES_COUNT_TTL", "60"))
+_count_cache: Dict[str, float] = {}
+_count_lock = threading.Lock()
+
+
+def count_clientes() -> int:
+    """
+    Devuelve el total de clientes sin hacer un COUNT(*) en cada página:
+    el valor se cachea y se mantiene al día con las altas y bajas de este proceso.
+    """
+    with _count_lock:
+        if _count_cache and time.monotonic() - _count_cache["at"] < _COUNT_TTL:
+            return int(_count_cache["total"])
+
+    total = get_storage().count()
+
+    with _count_lock:
+        _count_cache["total"] = total
+        _count_cache["at"] = time.monotonic()
+    return total
+
+
+def _ajustar_count(delta: int) -> None:
+    with _count_lock:
+        if _count_cache:
+            _count_cache["total"] += delta
 
 
 def insert_cliente(
@@ -55,25 +183,38 @@ def insert_cliente(
     Inserta un nuevo cliente en la base de datos.
     Retorna el ID del cliente insertado.
     """
-    conn = None
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                """
-                INSERT INTO clientes (nombre, apellido, email, telefono, direccion)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (nombre, apellido, email, telefono, direccion)
-            )
-            conn.commit()
-            return cur.lastrowid or 0
-        finally:
-            cur.close()
-    finally:
-        if conn:
-            conn.close()
+    cliente = {
+        "nombre": nombre, "apellido": apellido, "email": email,
+        "telefono": telefono, "direccion": direccion
+    }
+    nuevo_id = get_storage().insert(cliente)
+    _ajustar_count(1)
+    _invalidar_cliente(nuevo_id)
+    indice_clientes.upsert({"id": nuevo_id, **cliente})
+    return nuevo_id
+
+
+def insert_clientes_batch(
+    clientes: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Inserta un lote de clientes (ya validados) en una sola transacción (en MySQL con un
+    `INSERT` multi-fila). Los emails que ya existen o se repiten en el lote no se insertan.
+    Retorna (filas insertadas con su id, emails en conflicto).
+    """
+    if not clientes:
+        return [], []
+
+    insertados, conflictos = get_storage().insert_batch(clientes)
+
+    if insertados:
+        _ajustar_count(len(insertados))
+        _nueva_version()
+        cache = get_cache()
+        for fila in insertados:
+            cache.delete(f"cliente:{fila['id']}")
+            indice_clientes.upsert(fila)
+    return insertados, conflictos
 
 
 def delete_cliente(cliente_id: int) -> bool:
@@ -81,46 +222,20 @@ def delete_cliente(cliente_id: int) -> bool:
     Elimina un cliente de la base de datos por su ID.
     Retorna True si se eliminó correctamente, False si no se encontró.
     """
-    conn = None
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                "DELETE FROM clientes WHERE id = %s",
-                (cliente_id,)
-            )
-            conn.commit()
-            return cur.rowcount > 0
-        finally:
-            cur.close()
-    finally:
-        if conn:
-            conn.close()
+    eliminado = get_storage().delete(cliente_id)
+    if eliminado:
+        _ajustar_count(-1)
+        _invalidar_cliente(cliente_id)
+        indice_clientes.remove(cliente_id)
+    return eliminado
 
 
 def fetch_cliente_by_id(cliente_id: int) -> Dict[str, Any] | None:
     """
-    Obtiene un cliente por su ID.
+    Obtiene un cliente por su ID (cacheado).
     Retorna un dict con los datos del cliente o None si no existe.
     """
-    conn = None
-    try:
-        conn = get_connection()
-        cur: MySQLCursorDict
-        cur = conn.cursor(dictionary=True)  # type: ignore[assignment]
-        try:
-            cur.execute(
-                "SELECT id, nombre, apellido, email, telefono, direccion FROM clientes WHERE id = %s",
-                (cliente_id,)
-            )
-            result = cur.fetchone()
-            return dict(result) if result else None
-        finally:
-            cur.close()
-    finally:
-        if conn:
-            conn.close()
+    return _read_through(f"cliente:{cliente_id}", lambda: get_storage().fetch_by_id(cliente_id))
 
 
 def update_cliente(
@@ -135,23 +250,49 @@ def update_cliente(
     Actualiza los datos de un cliente existente.
     Retorna True si se actualizó correctamente, False si no se encontró.
     """
-    conn = None
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                """
-                UPDATE clientes 
-                SET nombre = %s, apellido = %s, email = %s, telefono = %s, direccion = %s
-                WHERE id = %s
-                """,
-                (nombre, apellido, email, telefono, direccion, cliente_id)
-            )
-            conn.commit()
-            return cur.rowcount > 0
-        finally:
-            cur.close()
-    finally:
-        if conn:
-            conn.close()
+    cliente = {
+        "nombre": nombre, "apellido": apellido, "email": email,
+        "telefono": telefono, "direccion": direccion
+    }
+    actualizado = get_storage().update(cliente_id, cliente)
+    if actualizado:
+        _invalidar_cliente(cliente_id)
+        indice_clientes.upsert({"id": cliente_id, **cliente})
+    return actualizado
+
+
+def delete_clientes_batch(ids: List[int]) -> List[int]:
+    """
+    Elimina varios clientes con un solo DELETE ... WHERE id IN (...) en una transacción.
+    Retorna los ids que existían y se eliminaron.
+    """
+    eliminados = get_storage().delete_batch(ids)
+
+    if eliminados:
+        _ajustar_count(-len(eliminados))
+        _nueva_version()
+        cache = get_cache()
+        for cliente_id in eliminados:
+            cache.delete(f"cliente:{cliente_id}")
+            indice_clientes.remove(cliente_id)
+    return eliminados
+
+
+def update_clientes_batch(
+    clientes: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Actualiza varios clientes (dicts con `id` y los campos del cliente) con un único UPDATE
+    multi-fila en una transacción. Si un id se repite, gana su última aparición.
+    Si algún email choca con el de otro cliente no se aplica ningún cambio (`EmailDuplicado`).
+    Retorna (clientes actualizados, ids no encontrados).
+    """
+    actualizados, no_encontrados = get_storage().update_batch(clientes)
+
+    if actualizados:
+        _nueva_version()
+        cache = get_cache()
+        for cliente in actualizados:
+            cache.delete(f"cliente:{cliente['id']}")
+            indice_clientes.upsert(cliente)
+    return actualizados, no_encontrados
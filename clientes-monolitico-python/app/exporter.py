@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator
+
+from app.importer import COLUMNAS
+
+FORMATOS = ("csv", "ndjson")
+TIPOS_MIME = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+# Filas por trozo de respuesta: cada trozo supone un salto al threadpool, así que no
+# conviene enviar fila a fila
+FILAS_POR_TROZO = 1000
+
+
+def exportar_csv(filas: Iterable[Dict[str, Any]], filas_por_trozo: int = FILAS_POR_TROZO) -> Iterator[bytes]:
+    """
+    Convierte las filas en CSV (con cabecera, mismas columnas que acepta la importación)
+    y lo entrega en trozos de `filas_por_trozo` filas.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel reconozca UTF-8 (la importación lo acepta)
+    buffer.write("\ufeff")
+    escritor.writerow(("id",) + COLUMNAS)
+    pendientes = 0
+    for fila in filas:
+        escritor.writerow([fila["id"]] + [fila.get(c) for c in COLUMNAS])
+        pendientes += 1
+        if pendientes >= filas_por_trozo:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+def exportar_ndjson(filas: Iterable[Dict[str, Any]], filas_por_trozo: int = FILAS_POR_TROZO) -> Iterator[bytes]:
+    """Convierte las filas en JSON Lines (un objeto por línea) entregado en trozos."""
+    trozo = []
+    for fila in filas:
+        trozo.append(json.dumps(
+            {"id": fila["id"], **{c: fila.get(c) for c in COLUMNAS}},
+            ensure_ascii=False
+        ))
+        if len(trozo) >= filas_por_trozo:
+            yield ("\n".join(trozo) + "\n").encode("utf-8")
+            trozo = []
+    if trozo:
+        yield ("\n".join(trozo) + "\n").encode("utf-8")
+
+
+def exportar_clientes(filas: Iterable[Dict[str, Any]], formato: str) -> Iterator[bytes]:
+    """Devuelve el generador de trozos de la exportación en el formato pedido."""
+    if formato == "csv":
+        return exportar_csv(filas)
+    if formato == "ndjson":
+        return exportar_ndjson(filas)
+    raise ValueError(f"Formato no soportado: {formato}")
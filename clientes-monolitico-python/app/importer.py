@@ -0,0 +1,158 @@
+import codecs
+import csv
+import json
+import os
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Set, Tuple
+
+from app.database import insert_clientes_batch
+from app.models import ClienteCreate
+from app.validation import validate_rows
+
+FORMATOS = ("csv", "jsonl")
+COLUMNAS = ("nombre", "apellido", "email", "telefono", "direccion")
+TAMANO_LOTE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Solo se detallan los primeros errores; el resto se cuenta en `con_errores`
+MAX_ERRORES_DETALLE = 1000
+
+# (número de línea, datos de la fila o None, mensaje de error o None)
+Fila = Tuple[int, Dict[str, Any] | None, str | None]
+
+
+class FormatoNoSoportado(ValueError):
+    """El fichero no es CSV ni JSON Lines."""
+
+
+def detectar_formato(nombre_fichero: str | None, content_type: str | None = None) -> str:
+    """Deduce el formato por la extensión del fichero o, si no la tiene, por su content-type."""
+    nombre = (nombre_fichero or "").lower()
+    tipo = (content_type or "").lower()
+    if nombre.endswith(".csv") or "csv" in tipo:
+        return "csv"
+    if nombre.endswith((".jsonl", ".ndjson")) or "ndjson" in tipo or "jsonl" in tipo:
+        return "jsonl"
+    raise FormatoNoSoportado("Formato no soportado: use un fichero .csv o .jsonl")
+
+
+def leer_csv(fichero: BinaryIO) -> Iterator[Fila]:
+    """
+    Lee el CSV línea a línea (UTF-8, con o sin BOM). La cabecera debe nombrar las columnas;
+    las que no son de `COLUMNAS` se ignoran.
+    """
+    lector = csv.DictReader(codecs.iterdecode(fichero, "utf-8-sig"))
+    if lector.fieldnames:
+        lector.fieldnames = [c.strip().lower() for c in lector.fieldnames]
+    for fila in lector:
+        yield lector.line_num, {k: v for k, v in fila.items() if k in COLUMNAS}, None
+
+
+def leer_jsonl(fichero: BinaryIO) -> Iterator[Fila]:
+    """Lee un objeto JSON por línea; las líneas en blanco se saltan."""
+    for linea, contenido in enumerate(fichero, start=1):
+        if not contenido.strip():
+            continue
+        try:
+            datos = json.loads(contenido)
+        except ValueError as e:
+            yield linea, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(datos, dict):
+            yield linea, None, "Cada línea debe ser un objeto JSON"
+            continue
+        yield linea, {k: v for k, v in datos.items() if k in COLUMNAS}, None
+
+
+def importar_clientes(
+    fichero: BinaryIO,
+    formato: str,
+    tamano_lote: int = TAMANO_LOTE
+) -> Dict[str, Any]:
+    """
+    Importa clientes desde un fichero CSV o JSON Lines sin cargarlo entero en memoria.
+
+    Las filas se validan por lotes de `tamano_lote` con las reglas de `ClienteCreate` y las
+    válidas se insertan con un `executemany` y un commit por lote. Los errores de validación, los emails repetidos
+    dentro del fichero y los que ya existen en la base de datos se devuelven por línea.
+    """
+    if formato not in FORMATOS:
+        raise FormatoNoSoportado(f"Formato no soportado: {formato}")
+
+    inicio = time.perf_counter()
+    resultado: Dict[str, Any] = {
+        "procesadas": 0, "insertadas": 0, "con_errores": 0, "lotes": 0,
+        "abortado": False, "errores": []
+    }
+    # Filas leídas pendientes de validar e insertar: (línea, datos)
+    lote: List[Tuple[int, Dict[str, Any]]] = []
+    # Emails ya vistos en el fichero (en minúsculas, como compara la collation de MySQL)
+    vistos: Set[str] = set()
+    filas = leer_csv(fichero) if formato == "csv" else leer_jsonl(fichero)
+    linea = 0
+
+    try:
+        for linea, datos, error in filas:
+            resultado["procesadas"] += 1
+            if datos is None:
+                _registrar_error(resultado, linea, None, [error or "Fila inválida"])
+                continue
+
+            lote.append((linea, datos))
+            if len(lote) >= tamano_lote:
+                _procesar_lote(resultado, lote, vistos)
+                lote = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # El fichero no se puede seguir leyendo: guardamos lo leído hasta aquí
+        resultado["abortado"] = True
+        _registrar_error(resultado, linea + 1, None, [f"Fichero ilegible: {e}"])
+
+    if lote:
+        _procesar_lote(resultado, lote, vistos)
+
+    resultado["errores"].sort(key=lambda e: e["linea"])
+    duracion = time.perf_counter() - inicio
+    resultado["duracion_s"] = round(duracion, 3)
+    resultado["filas_por_segundo"] = round(resultado["procesadas"] / duracion, 1) if duracion > 0 else 0.0
+    return resultado
+
+
+def _procesar_lote(
+    resultado: Dict[str, Any],
+    lote: List[Tuple[int, Dict[str, Any]]],
+    vistos: Set[str]
+) -> None:
+    """Valida el lote de una vez, descarta los emails repetidos e inserta el resto."""
+    validas, erroneas = validate_rows((datos for _, datos in lote), ClienteCreate)
+    for posicion, errores in erroneas:
+        linea, datos = lote[posicion]
+        _registrar_error(resultado, linea, datos.get("email"), errores)
+
+    a_insertar: List[Tuple[int, Dict[str, Any]]] = []
+    for posicion, cliente in validas:
+        linea = lote[posicion][0]
+        clave = cliente["email"].lower()
+        if clave in vistos:
+            _registrar_error(resultado, linea, cliente["email"], ["Email: repetido en el fichero"])
+            continue
+        vistos.add(clave)
+        a_insertar.append((linea, cliente))
+
+    if not a_insertar:
+        return
+    insertados, conflictos = insert_clientes_batch([cliente for _, cliente in a_insertar])
+    resultado["insertadas"] += len(insertados)
+    resultado["lotes"] += 1
+    if conflictos:
+        en_conflicto = {email.lower() for email in conflictos}
+        for linea, cliente in a_insertar:
+            if cliente["email"].lower() in en_conflicto:
+                _registrar_error(resultado, linea, cliente["email"], ["Email: ya existe un cliente con ese email"])
+
+
+def _registrar_error(resultado: Dict[str, Any], linea: int, email: Any, errores: List[str]) -> None:
+    resultado["con_errores"] += 1
+    if len(resultado["errores"]) < MAX_ERRORES_DETALLE:
+        resultado["errores"].append({
+            "linea": linea,
+            "email": email if isinstance(email, str) else None,
+            "errores": errores
+        })
@@ -1,115 +1,95 @@
-from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Response, Form, HTTPException, Query, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel, EmailStr, field_validator, ValidationError
-from typing import Optional, List
-import re
+from pydantic import ValidationError
+from typing import Optional, List, Dict, Tuple
+from email.utils import formatdate, parsedate_to_datetime
+import itertools
+import threading
 
-# Importamos las funciones que consultan/insertan/eliminan en MySQL
+from comun.metrics import MetricsMiddleware, registro, span, instrumentar_plantillas
+
+# Importamos las funciones que consultan/insertan/eliminan en la base de datos
 from app.database import (
-    fetch_all_clientes, 
     insert_cliente, 
     delete_cliente,
     fetch_cliente_by_id,
-    update_cliente
+    update_cliente,
+    search_clientes,
+    iter_clientes,
+    insert_clientes_batch,
+    update_clientes_batch,
+    delete_clientes_batch,
+    EmailDuplicado,
+    version_clientes,
+    warm_up_search_index
+)
+from app.storage import get_storage
+from app.models import (
+    ClienteDB,
+    ClienteCreate,
+    ClienteUpdate,
+    PaginaClientes,
+    ResultadoImportacion,
+    LoteIds,
+    LoteCrear,
+    LoteActualizar,
+    ResultadoLoteCrear,
+    ResultadoLoteActualizar,
+    ResultadoLoteEliminar
+)
+from app.validation import formatear_errores
+from app.importer import importar_clientes, detectar_formato, FormatoNoSoportado
+from app.exporter import exportar_clientes, TIPOS_MIME
+from app.pool import PoolTimeoutError
+from app.async_db import run_db
+from app.cache import get_cache, MISSING
+from app.pagination import (
+    paginar_clientes,
+    CursorInvalido,
+    LIMITE_POR_DEFECTO,
+    LIMITE_MAXIMO
 )
 
 
-# Modelo base con validaciones comunes
-class ClienteBase(BaseModel):
-    nombre: str
-    apellido: str
-    email: EmailStr
-    telefono: Optional[str] = None
-    direccion: Optional[str] = None
-    
-    @field_validator('nombre', 'apellido')
-    @classmethod
-    def validar_nombre_apellido(cls, v: str) -> str:
-        """Valida que nombre y apellido tengan formato correcto."""
-        if not v or not v.strip():
-            raise ValueError('El campo no puede estar vacío')
-        
-        v = v.strip()
-        
-        if len(v) < 2:
-            raise ValueError('Debe tener al menos 2 caracteres')
-        
-        if len(v) > 50:
-            raise ValueError('No puede exceder 50 caracteres')
-        
-        # Solo letras, espacios, tildes y caracteres especiales del español
-        if not re.match(r'^[a-zA-ZáéíóúÁÉÍÓÚñÑüÜ\s]+$', v):
-            raise ValueError('Solo se permiten letras y espacios')
-        
-        return v.title()  # Capitaliza cada palabra
-    
-    @field_validator('telefono')
-    @classmethod
-    def validar_telefono(cls, v: Optional[str]) -> Optional[str]:
-        """Valida el formato del teléfono."""
-        if v is None or v.strip() == '':
-            return None
-        
-        v = v.strip()
-        
-        # Elimina espacios, guiones y paréntesis para validar
-        telefono_limpio = re.sub(r'[\s\-\(\)]', '', v)
-        
-        # Debe contener solo dígitos y opcionalmente + al inicio
-        if not re.match(r'^\+?\d{7,15}$', telefono_limpio):
-            raise ValueError('Formato de teléfono inválido. Debe contener entre 7 y 15 dígitos')
-        
-        return v
-    
-    @field_validator('direccion')
-    @classmethod
-    def validar_direccion(cls, v: Optional[str]) -> Optional[str]:
-        """Valida la dirección."""
-        if v is None or v.strip() == '':
-            return None
-        
-        v = v.strip()
-        
-        if len(v) > 200:
-            raise ValueError('La dirección no puede exceder 200 caracteres')
-        
-        return v
-
-
-# Modelo para lectura de BD (sin validaciones estrictas, acepta datos históricos)
-class ClienteDB(BaseModel):
-    id: int
-    nombre: str
-    apellido: str
-    email: str
-    telefono: Optional[str] = None
-    direccion: Optional[str] = None
-
+app = FastAPI(title="SumaAPI")
 
-# Modelo para crear cliente (sin ID)
-class ClienteCreate(ClienteBase):
-    pass
+# Servir archivos estáticos
+app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+# Motor de plantillas (el renderizado se mide como fase "render")
+templates = Jinja2Templates(directory="app/templates")
+instrumentar_plantillas(templates)
 
-# Modelo para actualizar cliente (sin ID)
-class ClienteUpdate(ClienteBase):
-    pass
+# Latencia por ruta y por fase, expuesta en GET /metrics
+app.add_middleware(MetricsMiddleware)
+registro.registrar_gauges(
+    "clientes_db_pool", "Estado del backend de datos (pool de conexiones en MySQL)", lambda: get_storage().metrics()
+)
+registro.registrar_gauges("clientes_cache", "Estado de la caché de lecturas", lambda: get_cache().stats())
 
 
-# Modelo completo de Cliente (con ID y validaciones)
-class Cliente(ClienteBase):
-    id: int
+# Construimos el índice de búsqueda en segundo plano para no penalizar la primera búsqueda
+@app.on_event("startup")
+def iniciar_indice_busqueda():
+    threading.Thread(target=warm_up_search_index, daemon=True).start()
 
 
-app = FastAPI(title="SumaAPI")
+# Si el pool de conexiones está agotado respondemos 503 en lugar de un 500 genérico
+@app.exception_handler(PoolTimeoutError)
+def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        content={"detail": "Servicio saturado, inténtelo de nuevo"},
+        status_code=503,
+        headers={"Retry-After": "1"}
+    )
 
-# Servir archivos estáticos
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Motor de plantillas
-templates = Jinja2Templates(directory="app/templates")
+# Email UNIQUE: conflicto con otro cliente (los formularios HTML lo muestran en la propia página)
+@app.exception_handler(EmailDuplicado)
+def email_duplicado_handler(request: Request, exc: EmailDuplicado):
+    return JSONResponse(content={"detail": str(exc)}, status_code=409)
 
 
 def map_rows_to_clientes(rows: List[dict]) -> List[ClienteDB]:
@@ -117,36 +97,242 @@ def map_rows_to_clientes(rows: List[dict]) -> List[ClienteDB]:
     Convierte las filas del SELECT * FROM clientes (dict) 
     en objetos ClienteDB (sin validaciones estrictas para datos existentes).
     """
-    return [
-        ClienteDB(
-            id=row["id"],
-            nombre=row["nombre"],
-            apellido=row["apellido"],
-            email=row["email"],
-            telefono=row.get("telefono"),
-            direccion=row.get("direccion"),
-        )
-        for row in rows
-    ]
+    with span("mapping"):
+        return [
+            ClienteDB(
+                id=row["id"],
+                nombre=row["nombre"],
+                apellido=row["apellido"],
+                email=row["email"],
+                telefono=row.get("telefono"),
+                direccion=row.get("direccion"),
+            )
+            for row in rows
+        ]
+
+
+async def validacion_http(request: Request) -> Tuple[Dict[str, str], bool]:
+    """
+    Cabeceras de validación del listado (ETag y Last-Modified a partir de la versión de la
+    tabla) y si la copia que ya tiene el cliente sigue vigente (responder 304).
+    """
+    etiqueta, ultima_modificacion = await run_db(version_clientes)
+    cabeceras = {
+        "ETag": f'"{etiqueta}"',
+        "Last-Modified": formatdate(ultima_modificacion, usegmt=True),
+        # El navegador guarda la respuesta pero revalida siempre: la revalidación cuesta un 304
+        "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Si llega If-None-Match se ignora If-Modified-Since (RFC 9110)
+        etiquetas = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+        return cabeceras, "*" in etiquetas or cabeceras["ETag"] in etiquetas
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            desde = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return cabeceras, False
+        return cabeceras, int(ultima_modificacion) <= desde
+
+    return cabeceras, False
+
+
+async def obtener_pagina(limite: int, orden: str, sentido: str, despues: Optional[str], antes: Optional[str]) -> dict:
+    """
+    Obtiene una página del listado traduciendo los errores de parámetros a HTTP 400.
+    """
+    try:
+        pagina = await run_db(paginar_clientes, limite, orden, sentido, despues, antes)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pagina["items"] = map_rows_to_clientes(pagina.pop("rows"))
+    return pagina
 
 
 # --- GET principal ---
 @app.get("/", response_class=HTMLResponse)
-def get_index(request: Request):
-    # 1️⃣ Obtenemos los datos desde MySQL
-    rows = fetch_all_clientes()
+async def get_index(
+    request: Request,
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    orden: str = Query("id", pattern="^(id|nombre|apellido|email)$"),
+    sentido: str = Query("asc", pattern="^(asc|desc)$"),
+    despues: Optional[str] = None,
+    antes: Optional[str] = None,
+    q: Optional[str] = None
+):
+    # 0️⃣ Si nada ha cambiado desde la última visita basta con un 304; si otro cliente ya
+    # pidió esta misma página en esta versión, reutilizamos el HTML renderizado
+    cabeceras, no_modificado = await validacion_http(request)
+    if no_modificado:
+        return Response(status_code=304, headers=cabeceras)
 
-    # 2️⃣ Convertimos cada fila a Cliente (valida estructura)
-    clientes = map_rows_to_clientes(rows)
+    cache = get_cache()
+    clave_html = f"html:index:{cabeceras['ETag']}:{request.url.query}"
+    html = cache.get(clave_html)
+    if html is not MISSING:
+        return HTMLResponse(content=html, headers=cabeceras)
 
-    # 3️⃣ Enviamos a la plantilla
-    return templates.TemplateResponse(
+    if q and q.strip():
+        # 1️⃣ Con búsqueda: resultados del índice, sin cursores
+        clientes = map_rows_to_clientes(await run_db(search_clientes, q, limite))
+        pagina = {
+            "items": clientes, "total": len(clientes), "limite": limite,
+            "orden": orden, "sentido": sentido, "siguiente": None, "anterior": None
+        }
+    else:
+        # 1️⃣ Obtenemos de la base de datos solo la página pedida (keyset) y convertimos a ClienteDB
+        pagina = await obtener_pagina(limite, orden, sentido, despues, antes)
+
+    # 2️⃣ Enviamos a la plantilla
+    respuesta = templates.TemplateResponse(
         "pages/index.html",
         {
             "request": request,
-            "clientes": clientes
-        }
+            "clientes": pagina["items"],
+            "pagina": pagina,
+            "q": q or ""
+        },
+        headers=cabeceras
     )
+    cache.set(clave_html, respuesta.body)
+    return respuesta
+
+
+# --- GET listado paginado en JSON ---
+@app.get("/api/v1/clientes", response_model=PaginaClientes)
+async def get_clientes_json(
+    request: Request,
+    response: Response,
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    orden: str = Query("id", pattern="^(id|nombre|apellido|email)$"),
+    sentido: str = Query("asc", pattern="^(asc|desc)$"),
+    despues: Optional[str] = None,
+    antes: Optional[str] = None
+):
+    """
+    Listado paginado con cursores keyset: usar `siguiente`/`anterior` como `despues`/`antes`.
+    Admite peticiones condicionales (If-None-Match / If-Modified-Since).
+    """
+    cabeceras, no_modificado = await validacion_http(request)
+    if no_modificado:
+        return Response(status_code=304, headers=cabeceras)
+    response.headers.update(cabeceras)
+    return await obtener_pagina(limite, orden, sentido, despues, antes)
+
+
+# --- GET búsqueda de clientes en JSON ---
+@app.get("/api/v1/clientes/buscar", response_model=List[ClienteDB])
+async def get_buscar_clientes(
+    q: str = Query(..., min_length=1, max_length=100),
+    limite: int = Query(20, ge=1, le=LIMITE_MAXIMO)
+):
+    """
+    Busca por nombre, apellido, email o teléfono (prefijo, sin tildes, tolera erratas).
+    """
+    return map_rows_to_clientes(await run_db(search_clientes, q, limite))
+
+
+# --- POST importación masiva de clientes ---
+@app.post("/api/v1/clientes/importar", response_model=ResultadoImportacion)
+async def post_importar_clientes(
+    fichero: UploadFile = File(...),
+    formato: Optional[str] = Query(None, pattern="^(csv|jsonl)$")
+):
+    """
+    Importa clientes desde un CSV (con cabecera) o JSON Lines, en lotes transaccionales.
+    Devuelve los errores por línea y el rendimiento de la carga.
+    """
+    try:
+        formato = formato or detectar_formato(fichero.filename, fichero.content_type)
+    except FormatoNoSoportado as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await run_db(importar_clientes, fichero.file, formato)
+
+
+# --- GET exportación completa de clientes ---
+@app.get("/api/v1/clientes/exportar")
+async def get_exportar_clientes(formato: str = Query("csv", pattern="^(csv|ndjson)$")):
+    """
+    Exporta toda la tabla en CSV o NDJSON en streaming, leyendo por lotes (en MySQL con un
+    cursor sin buffer): la memoria usada no depende del número de clientes.
+    """
+    trozos = exportar_clientes(iter_clientes(), formato)
+    # Leemos el primer trozo antes de responder: si el pool está agotado o la base de datos falla
+    # aún podemos devolver un error HTTP en lugar de cortar la descarga a medias
+    primero = await run_db(next, trozos, b"")
+    return StreamingResponse(
+        itertools.chain([primero], trozos),
+        media_type=TIPOS_MIME[formato],
+        headers={"Content-Disposition": f'attachment; filename="clientes.{formato}"'}
+    )
+
+
+# --- API JSON: operaciones por lotes ---
+@app.post("/api/v1/clientes/lote", response_model=ResultadoLoteCrear, status_code=201)
+async def post_clientes_lote(lote: LoteCrear):
+    """
+    Crea varios clientes en una transacción con un INSERT multi-fila.
+    Los emails ya registrados no se insertan y se devuelven en `conflictos`.
+    """
+    creados, conflictos = await run_db(insert_clientes_batch, [c.model_dump() for c in lote.clientes])
+    return {"creados": map_rows_to_clientes(creados), "conflictos": conflictos}
+
+
+@app.put("/api/v1/clientes/lote", response_model=ResultadoLoteActualizar)
+async def put_clientes_lote(lote: LoteActualizar):
+    """
+    Actualiza varios clientes con un único UPDATE en una transacción (todo o nada si hay emails repetidos).
+    """
+    actualizados, no_encontrados = await run_db(update_clientes_batch, [c.model_dump() for c in lote.clientes])
+    return {"actualizados": map_rows_to_clientes(actualizados), "no_encontrados": no_encontrados}
+
+
+@app.post("/api/v1/clientes/lote/eliminar", response_model=ResultadoLoteEliminar)
+async def post_eliminar_clientes_lote(lote: LoteIds):
+    """
+    Elimina varios clientes con un único DELETE ... WHERE id IN (...).
+    """
+    eliminados = await run_db(delete_clientes_batch, lote.ids)
+    borrados = set(eliminados)
+    return {
+        "eliminados": eliminados,
+        "no_encontrados": [i for i in dict.fromkeys(lote.ids) if i not in borrados]
+    }
+
+
+# --- API JSON: cliente individual ---
+@app.get("/api/v1/clientes/{cliente_id}", response_model=ClienteDB)
+async def get_cliente_json(cliente_id: int):
+    cliente = await run_db(fetch_cliente_by_id, cliente_id)
+    if not cliente:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return ClienteDB(**cliente)
+
+
+@app.post("/api/v1/clientes", response_model=ClienteDB, status_code=201)
+async def post_cliente_json(cliente: ClienteCreate):
+    nuevo_id = await run_db(insert_cliente, **cliente.model_dump())
+    return ClienteDB(id=nuevo_id, **cliente.model_dump())
+
+
+@app.put("/api/v1/clientes/{cliente_id}", response_model=ClienteDB)
+async def put_cliente_json(cliente_id: int, cliente: ClienteUpdate):
+    actualizado = await run_db(update_cliente, cliente_id, **cliente.model_dump())
+    if not actualizado:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return ClienteDB(id=cliente_id, **cliente.model_dump())
+
+
+@app.delete("/api/v1/clientes/{cliente_id}", status_code=204)
+async def delete_cliente_json(cliente_id: int):
+    if not await run_db(delete_cliente, cliente_id):
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
 
 # --- GET formulario nuevo cliente ---
@@ -163,7 +349,7 @@ def get_nuevo_cliente(request: Request):
 
 # --- POST guardar nuevo cliente ---
 @app.post("/clientes/nuevo")
-def post_nuevo_cliente(
+async def post_nuevo_cliente(
     request: Request,
     nombre: str = Form(...),
     apellido: str = Form(...),
@@ -182,7 +368,8 @@ def post_nuevo_cliente(
         )
         
         # Insertamos el cliente en la base de datos
-        insert_cliente(
+        await run_db(
+            insert_cliente,
             cliente_data.nombre,
             cliente_data.apellido,
             cliente_data.email,
@@ -195,36 +382,35 @@ def post_nuevo_cliente(
         
     except ValidationError as e:
         # Extraemos los errores de validación
-        errores = []
-        for error in e.errors():
-            campo = str(error['loc'][0]) if error['loc'] else 'campo'
-            mensaje = error['msg']
-            errores.append(f"{campo.capitalize()}: {mensaje}")
-        
-        # Mostramos el formulario con los errores
-        return templates.TemplateResponse(
-            "pages/nuevo_cliente.html",
-            {
-                "request": request,
-                "mensaje": None,
-                "errores": errores,
-                "nombre": nombre,
-                "apellido": apellido,
-                "email": email,
-                "telefono": telefono,
-                "direccion": direccion
-            },
-            status_code=422
-        )
+        errores, estado = formatear_errores(e), 422
+    except EmailDuplicado as e:
+        # El email ya es de otro cliente: mismo formulario con el aviso, no el JSON de la API
+        errores, estado = [f"Email: {e}"], 409
+
+    # Mostramos el formulario con los errores
+    return templates.TemplateResponse(
+        "pages/nuevo_cliente.html",
+        {
+            "request": request,
+            "mensaje": None,
+            "errores": errores,
+            "nombre": nombre,
+            "apellido": apellido,
+            "email": email,
+            "telefono": telefono,
+            "direccion": direccion
+        },
+        status_code=estado
+    )
 
 
 # --- DELETE eliminar cliente ---
 @app.delete("/clientes/{cliente_id}")
-def delete_cliente_endpoint(cliente_id: int):
+async def delete_cliente_endpoint(cliente_id: int):
     """
     Endpoint para eliminar un cliente por su ID.
     """
-    eliminado = delete_cliente(cliente_id)
+    eliminado = await run_db(delete_cliente, cliente_id)
     
     if not eliminado:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
@@ -237,12 +423,12 @@ def delete_cliente_endpoint(cliente_id: int):
 
 # --- GET formulario editar cliente ---
 @app.get("/clientes/editar/{cliente_id}", response_class=HTMLResponse)
-def get_editar_cliente(request: Request, cliente_id: int):
+async def get_editar_cliente(request: Request, cliente_id: int):
     """
     Endpoint para mostrar el formulario de edición con datos precargados.
     """
     # Obtenemos los datos del cliente
-    cliente_data = fetch_cliente_by_id(cliente_id)
+    cliente_data = await run_db(fetch_cliente_by_id, cliente_id)
     
     if not cliente_data:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
@@ -261,7 +447,7 @@ def get_editar_cliente(request: Request, cliente_id: int):
 
 # --- POST actualizar cliente ---
 @app.post("/clientes/editar/{cliente_id}")
-def post_editar_cliente(
+async def post_editar_cliente(
     request: Request,
     cliente_id: int,
     nombre: str = Form(...),
@@ -284,7 +470,8 @@ def post_editar_cliente(
         )
         
         # Actualizamos el cliente en la base de datos
-        actualizado = update_cliente(
+        actualizado = await run_db(
+            update_cliente,
             cliente_id,
             cliente_data.nombre,
             cliente_data.apellido,
@@ -301,29 +488,56 @@ def post_editar_cliente(
         
     except ValidationError as e:
         # Extraemos los errores de validación
-        errores = []
-        for error in e.errors():
-            campo = str(error['loc'][0]) if error['loc'] else 'campo'
-            mensaje = error['msg']
-            errores.append(f"{campo.capitalize()}: {mensaje}")
-        
-        # Creamos un objeto cliente temporal para mostrar en el formulario
-        cliente_temp = ClienteDB(
-            id=cliente_id,
-            nombre=nombre,
-            apellido=apellido,
-            email=email,
-            telefono=telefono,
-            direccion=direccion
-        )
-        
-        # Mostramos el formulario con los errores
-        return templates.TemplateResponse(
-            "pages/editar_cliente.html",
-            {
-                "request": request,
-                "cliente": cliente_temp,
-                "errores": errores
-            },
-            status_code=422
-        )
+        errores, estado = formatear_errores(e), 422
+    except EmailDuplicado as e:
+        # El email ya es de otro cliente: mismo formulario con el aviso, no el JSON de la API
+        errores, estado = [f"Email: {e}"], 409
+
+    # Creamos un objeto cliente temporal para mostrar en el formulario
+    cliente_temp = ClienteDB(
+        id=cliente_id,
+        nombre=nombre,
+        apellido=apellido,
+        email=email,
+        telefono=telefono,
+        direccion=direccion
+    )
+
+    # Mostramos el formulario con los errores
+    return templates.TemplateResponse(
+        "pages/editar_cliente.html",
+        {
+            "request": request,
+            "cliente": cliente_temp,
+            "errores": errores
+        },
+        status_code=estado
+    )
+
+
+# --- GET métricas en formato Prometheus ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Histogramas de latencia por ruta y por fase, más el estado del pool y de la caché.
+    """
+    return PlainTextResponse(registro.exportar(), media_type="text/plain; version=0.0.4")
+
+
+# --- GET métricas del pool de conexiones ---
+@app.get("/metrics/pool")
+def get_pool_metrics():
+    """
+    Devuelve las métricas del backend de datos: en MySQL las del pool (conexiones en uso,
+    esperas, latencia de checkout); en SQLite conexiones y operaciones; en memoria el tamaño.
+    """
+    return get_storage().metrics()
+
+
+# --- GET métricas de la caché ---
+@app.get("/metrics/cache")
+def get_cache_metrics():
+    """
+    Devuelve aciertos, fallos, expulsiones e invalidaciones de la caché de lecturas.
+    """
+    return get_cache().stats()
@@ -0,0 +1,124 @@
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Optional, List
+
+from app import validation
+
+
+# Modelo base con validaciones comunes
+class ClienteBase(BaseModel):
+    nombre: str
+    apellido: str
+    email: EmailStr
+    telefono: Optional[str] = None
+    direccion: Optional[str] = None
+    
+    # Las reglas viven en app/validation.py (patrones precompilados), compartidas
+    # con la validación por lotes de la importación masiva
+    @field_validator('nombre', 'apellido')
+    @classmethod
+    def validar_nombre_apellido(cls, v: str) -> str:
+        """Valida que nombre y apellido tengan formato correcto."""
+        return validation.validar_nombre_apellido(v)
+    
+    @field_validator('telefono')
+    @classmethod
+    def validar_telefono(cls, v: Optional[str]) -> Optional[str]:
+        """Valida el formato del teléfono."""
+        return validation.validar_telefono(v)
+    
+    @field_validator('direccion')
+    @classmethod
+    def validar_direccion(cls, v: Optional[str]) -> Optional[str]:
+        """Valida la dirección."""
+        return validation.validar_direccion(v)
+
+
+# Modelo para lectura de BD (sin validaciones estrictas, acepta datos históricos)
+class ClienteDB(BaseModel):
+    id: int
+    nombre: str
+    apellido: str
+    email: str
+    telefono: Optional[str] = None
+    direccion: Optional[str] = None
+
+
+# Respuesta paginada del listado de clientes
+class PaginaClientes(BaseModel):
+    items: List[ClienteDB]
+    total: int
+    limite: int
+    orden: str
+    sentido: str
+    siguiente: Optional[str] = None
+    anterior: Optional[str] = None
+
+
+# Modelo para crear cliente (sin ID)
+class ClienteCreate(ClienteBase):
+    pass
+
+
+# Modelo para actualizar cliente (sin ID)
+class ClienteUpdate(ClienteBase):
+    pass
+
+
+# Modelo completo de Cliente (con ID y validaciones)
+class Cliente(ClienteBase):
+    id: int
+
+
+# --- Operaciones por lotes de la API JSON ---
+LOTE_MAXIMO = 1000
+
+
+# Cliente con su ID dentro de una actualización por lotes
+class ClienteLoteUpdate(ClienteUpdate):
+    id: int
+
+
+class LoteIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=LOTE_MAXIMO)
+
+
+class LoteCrear(BaseModel):
+    clientes: List[ClienteCreate] = Field(..., min_length=1, max_length=LOTE_MAXIMO)
+
+
+class LoteActualizar(BaseModel):
+    clientes: List[ClienteLoteUpdate] = Field(..., min_length=1, max_length=LOTE_MAXIMO)
+
+
+class ResultadoLoteCrear(BaseModel):
+    creados: List[ClienteDB]
+    conflictos: List[str]
+
+
+class ResultadoLoteActualizar(BaseModel):
+    actualizados: List[ClienteDB]
+    no_encontrados: List[int]
+
+
+class ResultadoLoteEliminar(BaseModel):
+    eliminados: List[int]
+    no_encontrados: List[int]
+
+
+# Error de una fila en la importación masiva
+class ErrorImportacion(BaseModel):
+    linea: int
+    email: Optional[str] = None
+    errores: List[str]
+
+
+# Resultado de la importación masiva de clientes
+class ResultadoImportacion(BaseModel):
+    procesadas: int
+    insertadas: int
+    con_errores: int
+    lotes: int
+    duracion_s: float
+    filas_por_segundo: float
+    abortado: bool = False
+    errores: List[ErrorImportacion]
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Tuple
+
+from app.database import COLUMNAS_ORDEN, count_clientes, fetch_clientes_page
+
+LIMITE_POR_DEFECTO = 25
+LIMITE_MAXIMO = 100
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se puede decodificar o no corresponde al orden pedido."""
+
+
+def encode_cursor(orden: str, sentido: str, row: Dict[str, Any]) -> str:
+    """
+    Codifica la posición de una fila como cursor opaco (base64url de JSON).
+    Incluye el orden para poder rechazar cursores mezclados entre ordenaciones.
+    """
+    payload = [orden, sentido, row[orden], row["id"]]
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, orden: str, sentido: str) -> Tuple[Any, int]:
+    """Decodifica un cursor y devuelve la tupla (valor, id) para `fetch_clientes_page`."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        c_orden, c_sentido, valor, ultimo_id = payload
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise CursorInvalido("Cursor inválido") from e
+
+    if c_orden != orden or c_sentido != sentido or not _es_entero(ultimo_id):
+        raise CursorInvalido("El cursor no corresponde a la ordenación solicitada")
+    # El valor acaba como parámetro de la consulta: una lista u objeto JSON no es una posición válida
+    if (valor is not None and not isinstance(valor, (str, int, float))) or isinstance(valor, bool):
+        raise CursorInvalido("Cursor inválido")
+    return valor, ultimo_id
+
+
+def _es_entero(valor: Any) -> bool:
+    # bool es subclase de int, pero true/false no son ids
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def paginar_clientes(
+    limite: int = LIMITE_POR_DEFECTO,
+    orden: str = "id",
+    sentido: str = "asc",
+    despues: str | None = None,
+    antes: str | None = None
+) -> Dict[str, Any]:
+    """
+    Obtiene una página del listado con cursores keyset.
+    Devuelve un dict con `rows`, `total`, `siguiente` y `anterior` (cursores o None).
+    """
+    if orden not in COLUMNAS_ORDEN:
+        raise ValueError(f"Orden no permitido: {orden}")
+    if sentido not in ("asc", "desc"):
+        raise ValueError(f"Sentido no permitido: {sentido}")
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    descendente = sentido == "desc"
+
+    rows: List[Dict[str, Any]]
+    siguiente: str | None = None
+    anterior: str | None = None
+
+    if antes:
+        # Pedimos una fila de más para saber si existe otra página anterior
+        rows = fetch_clientes_page(
+            limite + 1, orden, descendente, decode_cursor(antes, orden, sentido), hacia_atras=True
+        )
+        hay_anterior = len(rows) > limite
+        rows = rows[-limite:]
+        if rows:
+            siguiente = encode_cursor(orden, sentido, rows[-1])
+            if hay_anterior:
+                anterior = encode_cursor(orden, sentido, rows[0])
+    else:
+        cursor = decode_cursor(despues, orden, sentido) if despues else None
+        rows = fetch_clientes_page(limite + 1, orden, descendente, cursor)
+        hay_siguiente = len(rows) > limite
+        rows = rows[:limite]
+        if rows:
+            if hay_siguiente:
+                siguiente = encode_cursor(orden, sentido, rows[-1])
+            if despues:
+                anterior = encode_cursor(orden, sentido, rows[0])
+
+    return {
+        "rows": rows,
+        "total": count_clientes(),
+        "limite": limite,
+        "orden": orden,
+        "sentido": sentido,
+        "siguiente": siguiente,
+        "anterior": anterior,
+    }
@@ -0,0 +1,261 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Tuple
+
+
+class PoolTimeoutError(Exception):
+    """Se lanza cuando no hay conexiones libres tras esperar `checkout_timeout`."""
+
+
+class _Turno:
+    """Hilo en espera: `release` le entrega una conexión o le cede el hueco para crear una."""
+
+    __slots__ = ("evento", "conexion")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.conexion: Tuple[Any, float] | None = None
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQL compartido por todas las operaciones del backend MySQL (`storage_mysql.py`).
+
+    - Mantiene entre `min_size` y `max_size` conexiones abiertas.
+    - Cierra las conexiones ociosas más de `idle_timeout` segundos (respetando `min_size`).
+    - Comprueba con `ping()` las conexiones que llevan más de `health_check_after`
+      segundos sin usarse antes de entregarlas.
+    - Si el pool está agotado, espera como máximo `checkout_timeout` segundos.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        idle_timeout: float = 300.0,
+        checkout_timeout: float = 5.0,
+        health_check_after: float = 5.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+
+        # (conexión, instante en que se devolvió al pool)
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiters: Deque[_Turno] = deque()
+        self._lock = threading.Lock()
+
+        # Métricas acumuladas
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._created = 0
+        self._closed = 0
+        self._health_check_failures = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    # --- API pública ---
+
+    def acquire(self) -> Any:
+        """Obtiene una conexión del pool (o crea una nueva si hay hueco)."""
+        inicio = time.perf_counter()
+        limite = time.monotonic() + self.checkout_timeout
+        ha_esperado = False
+
+        while True:
+            conn, devuelta_en, crear = None, None, False
+            with self._lock:
+                caducadas = self._pop_expired_locked()
+                # Si ya hay hilos esperando, nos ponemos a la cola (FIFO) para no colarnos
+                if self._idle and not self._waiters:
+                    # LIFO: reutilizamos la conexión más reciente (la más "caliente")
+                    conn, devuelta_en = self._idle.pop()
+                    self._in_use += 1
+                elif self._size < self.max_size and not self._waiters:
+                    crear = True
+                    self._size += 1
+                    self._in_use += 1
+                else:
+                    if not ha_esperado:
+                        ha_esperado = True
+                        self._waits += 1
+                    turno = _Turno()
+                    self._waiters.append(turno)
+
+            # Cerrar puede bloquear en la red: fuera del lock, como en `_discard`
+            for caducada in caducadas:
+                self._close_quietly(caducada)
+
+            if conn is None and not crear:
+                # Esperamos fuera del lock a que `release`/`_discard` nos pase el turno
+                turno.evento.wait(max(0.0, limite - time.monotonic()))
+                with self._lock:
+                    if not turno.evento.is_set():
+                        self._waiters.remove(turno)
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Pool agotado: {self.max_size} conexiones en uso "
+                            f"durante más de {self.checkout_timeout}s"
+                        )
+                if turno.conexion is None:
+                    crear = True
+                else:
+                    conn, devuelta_en = turno.conexion
+
+            # La red (conectar / ping) se hace fuera del lock
+            try:
+                if crear:
+                    conn = self._factory()
+                    with self._lock:
+                        self._created += 1
+                elif not self._is_healthy(conn, devuelta_en):
+                    with self._lock:
+                        self._health_check_failures += 1
+                    self._discard(conn)
+                    continue
+            except Exception:
+                self._free_slot()
+                raise
+
+            transcurrido = time.perf_counter() - inicio
+            with self._lock:
+                self._checkouts += 1
+                self._checkout_time_total += transcurrido
+                if transcurrido > self._checkout_time_max:
+                    self._checkout_time_max = transcurrido
+            return conn
+
+    def release(self, conn: Any) -> None:
+        """Devuelve una conexión al pool, deshaciendo transacciones abiertas."""
+        try:
+            if getattr(conn, "in_transaction", False):
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            if self._waiters:
+                # Entrega directa al primer hilo en espera (sigue contando como "en uso")
+                turno = self._waiters.popleft()
+                turno.conexion = (conn, time.monotonic())
+                turno.evento.set()
+            else:
+                self._in_use -= 1
+                self._idle.append((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Context manager: `with pool.connection() as conn: ...`"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            # Una conexión que falló a mitad de consulta puede quedar inservible
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+            else:
+                self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self) -> None:
+        """Cierra todas las conexiones ociosas (las que están en uso se cierran al devolverse)."""
+        with self._lock:
+            ociosas = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(ociosas)
+            self._closed += len(ociosas)
+        for conn in ociosas:
+            self._close_quietly(conn)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Instantánea de las métricas del pool."""
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "closed": self._closed,
+                "health_check_failures": self._health_check_failures,
+                "checkout_seconds_total": self._checkout_time_total,
+                "checkout_seconds_max": self._checkout_time_max,
+                "checkout_seconds_avg": (
+                    self._checkout_time_total / self._checkouts if self._checkouts else 0.0
+                ),
+            }
+
+    # --- Internos ---
+
+    def _is_healthy(self, conn: Any, devuelta_en: float | None) -> bool:
+        if devuelta_en is not None and time.monotonic() - devuelta_en < self.health_check_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn: Any) -> None:
+        """Saca una conexión en uso del pool y la cierra."""
+        with self._lock:
+            self._closed += 1
+        self._free_slot()
+        self._close_quietly(conn)
+
+    def _free_slot(self) -> None:
+        """Libera el hueco de una conexión en uso; si alguien espera, le cede el hueco para crear otra."""
+        with self._lock:
+            if self._waiters:
+                turno = self._waiters.popleft()
+                turno.conexion = None
+                turno.evento.set()
+            else:
+                self._in_use -= 1
+                self._size -= 1
+
+    def _pop_expired_locked(self) -> List[Any]:
+        """
+        Saca del pool las conexiones ociosas caducadas (las más antiguas están al principio)
+        y las devuelve para que quien llama las cierre después de soltar el lock.
+        """
+        ahora = time.monotonic()
+        caducadas = []
+        while (
+            self._idle
+            and self._size > self.min_size
+            and ahora - self._idle[0][1] > self.idle_timeout
+        ):
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._closed += 1
+            caducadas.append(conn)
+        return caducadas
+
+    @staticmethod
+    def _close_quietly(conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
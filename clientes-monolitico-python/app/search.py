@@ -0,0 +1,326 @@
+import bisect
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+# Separadores de palabras tras normalizar (todo lo que no sea letra o dígito)
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+_NO_DIGITO = re.compile(r"\D+")
+
+# Puntuación por término según el tipo de coincidencia
+_EXACTA, _PREFIJO, _APROXIMADA = 3, 2, 1
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes ni diéresis: 'Núñez' -> 'nunez' (la ñ pasa a n)."""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> List[str]:
+    return [t for t in _NO_ALFANUMERICO.split(normalizar(texto)) if t]
+
+
+def _trigramas(token: str) -> Set[str]:
+    # El relleno '$$' da más peso al principio de la palabra (búsqueda por prefijo)
+    relleno = "$$" + token
+    return {relleno[i:i + 3] for i in range(max(1, len(relleno) - 2))}
+
+
+def _distancia_acotada(a: str, b: str, maximo: int) -> int:
+    """
+    Distancia de edición con transposiciones ('mraia' -> 'maria' cuesta 1) y corte:
+    devuelve `maximo + 1` en cuanto se supera `maximo`.
+    """
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    antepenultima: List[int] = []
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        minimo_fila = i
+        for j, cb in enumerate(b, 1):
+            valor = min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + (ca != cb),
+            )
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                valor = min(valor, antepenultima[j - 2] + 1)
+            actual.append(valor)
+            if valor < minimo_fila:
+                minimo_fila = valor
+        if minimo_fila > maximo:
+            return maximo + 1
+        antepenultima, anterior = anterior, actual
+    return anterior[-1]
+
+
+def _max_ediciones(termino: str) -> int:
+    return 1 if len(termino) <= 5 else 2
+
+
+def _nivel_coincidencia(termino: str, token: str) -> int:
+    """Exacta, prefijo, aproximada (erratas en el prefijo) o 0."""
+    if token == termino:
+        return _EXACTA
+    if token.startswith(termino):
+        return _PREFIJO
+    # Sin erratas en números ni entre número y palabra (teléfonos, números del email)
+    if len(termino) < 3 or termino.isdigit() or token.isdigit():
+        return 0
+    maximo = _max_ediciones(termino)
+    # Comparamos contra prefijos del token de longitud parecida a la del término
+    for n in range(max(1, len(termino) - maximo), min(len(token), len(termino) + maximo) + 1):
+        if _distancia_acotada(termino, token[:n], maximo) <= maximo:
+            return _APROXIMADA
+    return 0
+
+
+def _tokens_documento(row: Dict[str, Any]) -> Tuple[str, ...]:
+    tokens = tokenizar(row.get("nombre") or "")
+    tokens += tokenizar(row.get("apellido") or "")
+    email = row.get("email") or ""
+    tokens += tokenizar(email)
+    telefono = _NO_DIGITO.sub("", row.get("telefono") or "")
+    if telefono:
+        tokens.append(telefono)
+    return tuple(dict.fromkeys(tokens))
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido en memoria sobre nombre, apellido, email y teléfono.
+
+    - Coincidencia por prefijo con búsqueda binaria sobre el vocabulario ordenado.
+    - Tolerancia a erratas: los candidatos se obtienen por trigramas del vocabulario
+      (no de las filas) y se confirman con una distancia de edición acotada sobre el prefijo.
+    - Todas las operaciones son idempotentes, así que reaplicar un alta o baja es seguro.
+    """
+
+    # Filas revisadas como máximo por consulta (acota la latencia de términos muy comunes)
+    MAX_CANDIDATOS = 20000
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._lock_construccion = threading.Lock()
+        self._construido = False
+        # Altas/bajas que llegan mientras se construye (se reaplican al terminar)
+        self._pendientes: List[Tuple[str, Any]] | None = None
+        self._tokens_por_id: Dict[int, Tuple[str, ...]] = {}
+        self._ids_por_token: Dict[str, Set[int]] = {}
+        self._vocabulario: List[str] = []
+        self._tokens_por_trigrama: Dict[str, Set[str]] = {}
+
+    @property
+    def construido(self) -> bool:
+        return self._construido
+
+    def __len__(self) -> int:
+        return len(self._tokens_por_id)
+
+    def construir(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        Carga el índice desde cero sin bloquear a los escritores: se construye aparte
+        y al final se sustituye, reaplicando las altas/bajas ocurridas entretanto.
+        """
+        with self._lock:
+            self._pendientes = []
+        try:
+            nuevo = IndiceBusqueda()
+            for row in rows:
+                nuevo._indexar(row, ordenar=False)
+            nuevo._vocabulario.sort()
+        except BaseException:
+            with self._lock:
+                self._pendientes = None
+            raise
+
+        with self._lock:
+            self._tokens_por_id = nuevo._tokens_por_id
+            self._ids_por_token = nuevo._ids_por_token
+            self._vocabulario = nuevo._vocabulario
+            self._tokens_por_trigrama = nuevo._tokens_por_trigrama
+            for operacion, valor in self._pendientes or []:
+                self._quitar(valor if operacion == "remove" else int(valor["id"]))
+                if operacion == "upsert":
+                    self._indexar(valor, ordenar=True)
+            self._pendientes = None
+            self._construido = True
+
+    def asegurar_construido(self, cargar: Callable[[], Iterable[Dict[str, Any]]]) -> None:
+        if not self._construido:
+            with self._lock_construccion:
+                if not self._construido:
+                    self.construir(cargar())
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._pendientes is not None:
+                self._pendientes.append(("upsert", row))
+            if self._construido:
+                self._quitar(int(row["id"]))
+                self._indexar(row, ordenar=True)
+            # Si aún no se ha construido, se reflejará al leer la base de datos
+
+    def remove(self, cliente_id: int) -> None:
+        with self._lock:
+            if self._pendientes is not None:
+                self._pendientes.append(("remove", cliente_id))
+            if self._construido:
+                self._quitar(cliente_id)
+
+    def buscar(self, consulta: str, limite: int = 20) -> List[int]:
+        """
+        Devuelve los ids que casan con todos los términos, de mejor a peor coincidencia.
+
+        El término más largo (el más selectivo) "conduce" la búsqueda: se recorren sus
+        tokens de mejor a peor (exacto, prefijo, errata) y cada candidato se puntúa contra
+        el resto de términos; se para en cuanto ningún candidato restante puede mejorar
+        los `limite` mejores o tras `MAX_CANDIDATOS` filas.
+        """
+        terminos = list(dict.fromkeys(tokenizar(consulta)))
+        if not terminos:
+            return []
+        conductor = max(terminos, key=len)
+        otros = [t for t in terminos if t != conductor]
+
+        with self._lock:
+            memos: Dict[str, Dict[str, int]] = {t: {} for t in terminos}
+            techo_otros = sum(self._mejor_posible(t) for t in otros)
+
+            resultados: List[Tuple[int, int]] = []
+            vistos: Set[int] = set()
+            nivel_actual = _EXACTA
+            en_techo = 0  # resultados que ya alcanzan la máxima puntuación posible restante
+            for token, nivel in self._tokens_candidatos(conductor):
+                techo = nivel + techo_otros
+                if nivel != nivel_actual:
+                    # Bajamos de nivel: el techo baja y puede que ya tengamos suficientes
+                    nivel_actual = nivel
+                    en_techo = sum(1 for puntos, _ in resultados if puntos >= techo)
+                    if en_techo >= limite:
+                        break
+                for cliente_id in self._ids_por_token[token]:
+                    if cliente_id in vistos:
+                        continue
+                    vistos.add(cliente_id)
+                    puntos = self._puntuar(self._tokens_por_id[cliente_id], terminos, memos)
+                    if puntos:
+                        resultados.append((puntos, cliente_id))
+                        if puntos >= techo:
+                            en_techo += 1
+                    if en_techo >= limite or len(vistos) >= self.MAX_CANDIDATOS:
+                        break
+                # Comprobamos antes de pedir el siguiente token: generar erratas no es gratis
+                if en_techo >= limite or len(vistos) >= self.MAX_CANDIDATOS:
+                    break
+
+        resultados.sort(key=lambda r: (-r[0], r[1]))
+        return [cliente_id for _, cliente_id in resultados[:limite]]
+
+    # --- Internos ---
+
+    def _indexar(self, row: Dict[str, Any], ordenar: bool) -> None:
+        cliente_id = int(row["id"])
+        tokens = _tokens_documento(row)
+        self._tokens_por_id[cliente_id] = tokens
+        for token in tokens:
+            ids = self._ids_por_token.get(token)
+            if ids is None:
+                self._ids_por_token[token] = {cliente_id}
+                if not token.isdigit():
+                    for tri in _trigramas(token):
+                        self._tokens_por_trigrama.setdefault(tri, set()).add(token)
+                if ordenar:
+                    bisect.insort(self._vocabulario, token)
+            else:
+                ids.add(cliente_id)
+
+    def _quitar(self, cliente_id: int) -> None:
+        tokens = self._tokens_por_id.pop(cliente_id, ())
+        for token in tokens:
+            ids = self._ids_por_token.get(token)
+            if ids is None:
+                continue
+            ids.discard(cliente_id)
+            if not ids:
+                # Token sin documentos: lo retiramos del vocabulario y de los trigramas
+                del self._ids_por_token[token]
+                pos = bisect.bisect_left(self._vocabulario, token)
+                if pos < len(self._vocabulario) and self._vocabulario[pos] == token:
+                    del self._vocabulario[pos]
+                for tri in _trigramas(token):
+                    tokens_tri = self._tokens_por_trigrama.get(tri)
+                    if tokens_tri is not None:
+                        tokens_tri.discard(token)
+                        if not tokens_tri:
+                            del self._tokens_por_trigrama[tri]
+
+    def _mejor_posible(self, termino: str) -> int:
+        """Máxima puntuación que puede aportar `termino` con el vocabulario actual."""
+        if termino in self._ids_por_token:
+            return _EXACTA
+        pos = bisect.bisect_right(self._vocabulario, termino)
+        if pos < len(self._vocabulario) and self._vocabulario[pos].startswith(termino):
+            return _PREFIJO
+        return _APROXIMADA
+
+    def _puntuar(
+        self, tokens: Tuple[str, ...], terminos: List[str], memos: Dict[str, Dict[str, int]]
+    ) -> int:
+        """Suma, para cada término, la mejor coincidencia entre los tokens del documento (0 si falta alguno)."""
+        total = 0
+        for termino in terminos:
+            memo = memos[termino]
+            mejor = 0
+            for token in tokens:
+                nivel = memo.get(token)
+                if nivel is None:
+                    nivel = memo[token] = _nivel_coincidencia(termino, token)
+                if nivel > mejor:
+                    mejor = nivel
+                    if mejor == _EXACTA:
+                        break
+            if not mejor:
+                return 0
+            total += mejor
+        return total
+
+    def _tokens_candidatos(self, termino: str) -> Iterator[Tuple[str, int]]:
+        """Tokens del vocabulario que casan con `termino`, de mejor a peor (perezoso)."""
+        if termino in self._ids_por_token:
+            yield termino, _EXACTA
+
+        # Con una sola letra no expandimos (casaría con medio vocabulario)
+        if len(termino) == 1:
+            return
+
+        # Prefijo: rango contiguo en el vocabulario ordenado
+        pos = bisect.bisect_right(self._vocabulario, termino)
+        while pos < len(self._vocabulario) and self._vocabulario[pos].startswith(termino):
+            yield self._vocabulario[pos], _PREFIJO
+            pos += 1
+
+        # Erratas: candidatos por trigramas compartidos, confirmados por distancia
+        if len(termino) >= 3 and not termino.isdigit():
+            maximo = _max_ediciones(termino)
+            trigramas = _trigramas(termino)
+            candidatos: Dict[str, int] = {}
+            for tri in trigramas:
+                for token in self._tokens_por_trigrama.get(tri, ()):
+                    candidatos[token] = candidatos.get(token, 0) + 1
+            # Cada edición (o transposición) puede romper como mucho 4 trigramas
+            minimo_comun = max(1, len(trigramas) - 4 * maximo)
+            for token, comunes in candidatos.items():
+                if (
+                    comunes >= minimo_comun
+                    and not token.startswith(termino)
+                    and _nivel_coincidencia(termino, token) == _APROXIMADA
+                ):
+                    yield token, _APROXIMADA
+
+
+# Índice compartido por el proceso (database.py lo mantiene al día)
+indice_clientes = IndiceBusqueda()
@@ -0,0 +1,524 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Columnas editables de un cliente (además del id)
+COLUMNAS = ("nombre", "apellido", "email", "telefono", "direccion")
+# Columnas por las que se puede ordenar el listado (todas NOT NULL e indexadas)
+COLUMNAS_ORDEN = ("id", "nombre", "apellido", "email")
+
+
+class EmailDuplicado(Exception):
+    """Se lanza al insertar o actualizar un cliente con un email que ya usa otro cliente."""
+
+
+class StorageBackend(ABC):
+    """
+    Almacenamiento de la tabla clientes. Solo guarda y lee: la caché y el índice de búsqueda los
+    añade `database.py` por encima, igual para todos los backends. El backend sí guarda la versión
+    de la tabla (`version` / `tocar_version`), para que todos los procesos vean la misma.
+    Las filas se devuelven como dicts con `id` y `COLUMNAS`.
+    """
+
+    nombre = ""
+    # Si las lecturas pasan por la caché de app/cache.py (no aporta nada al backend en memoria)
+    usa_cache = True
+
+    @abstractmethod
+    def fetch_all(self) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def iter_all(self, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Recorre todos los clientes por id sin cargarlos todos en memoria."""
+
+    @abstractmethod
+    def fetch_by_ids(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Clientes con esos ids, en el orden de `ids` (omite los que no existen)."""
+
+    @abstractmethod
+    def fetch_by_id(self, cliente_id: int) -> Dict[str, Any] | None:
+        ...
+
+    @abstractmethod
+    def fetch_page(
+        self,
+        limit: int,
+        orden: str,
+        descendente: bool,
+        cursor: Tuple[Any, int] | None,
+        hacia_atras: bool
+    ) -> List[Dict[str, Any]]:
+        """Página keyset por (orden, id); ver `database.fetch_clientes_page`."""
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def insert(self, cliente: Dict[str, Any]) -> int:
+        """Inserta un cliente y devuelve su id; `EmailDuplicado` si el email ya existe."""
+
+    @abstractmethod
+    def insert_batch(self, clientes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Inserta un lote en una transacción; devuelve (filas insertadas con id, emails en conflicto)."""
+
+    @abstractmethod
+    def update(self, cliente_id: int, cliente: Dict[str, Any]) -> bool:
+        """Actualiza un cliente; False si no existe, `EmailDuplicado` si el email es de otro."""
+
+    @abstractmethod
+    def update_batch(self, clientes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Actualiza un lote (todo o nada); devuelve (clientes actualizados, ids no encontrados).
+        `EmailDuplicado` si un email se repite en el lote o ya era de otro cliente antes del lote,
+        aunque ese cliente también cambie de email en él (no se pueden intercambiar emails).
+        """
+
+    @abstractmethod
+    def delete(self, cliente_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def delete_batch(self, ids: List[int]) -> List[int]:
+        """Elimina un lote en una transacción; devuelve los ids eliminados."""
+
+    @abstractmethod
+    def version(self) -> Tuple[int, float]:
+        """(contador de escrituras de la tabla, instante de la última escritura en segundos)."""
+
+    @abstractmethod
+    def tocar_version(self) -> None:
+        """Incrementa la versión; `database.py` la llama tras cada escritura confirmada."""
+
+    def metrics(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+def valores_cliente(cliente: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(cliente.get(columna) for columna in COLUMNAS)
+
+
+def separar_duplicados(
+    clientes: List[Dict[str, Any]],
+    existentes: set
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Separa un lote en (nuevos, emails en conflicto): en conflicto los emails que ya existen
+    y las repeticiones dentro del propio lote (gana la primera). Compara sin mayúsculas.
+    """
+    vistos = set(existentes)
+    nuevos: List[Dict[str, Any]] = []
+    conflictos: List[str] = []
+    for cliente in clientes:
+        clave = cliente["email"].lower()
+        if clave in vistos:
+            conflictos.append(cliente["email"])
+        else:
+            vistos.add(clave)
+            nuevos.append(cliente)
+    return nuevos, conflictos
+
+
+class SQLStorage(StorageBackend):
+    """
+    Implementación común a los backends SQL (MySQL y SQLite): las consultas son las mismas
+    y las subclases solo aportan la conexión y los detalles del dialecto.
+    """
+
+    # Marcador de parámetros del driver
+    marcador = "%s"
+    # Sufijo para bloquear las filas leídas dentro de una transacción de escritura
+    bloqueo_filas = ""
+    # Excepción del driver para violaciones de restricciones
+    error_integridad: type = Exception
+    # Si este proceso ya ha comprobado que existe la fila de clientes_version
+    _version_lista = False
+
+    @abstractmethod
+    def conexion(self) -> Any:
+        """Context manager que presta una conexión (y la devuelve al salir)."""
+
+    @abstractmethod
+    def cursor(self, conn: Any, buffered: bool = True) -> Any:
+        """Cursor cuyas filas son dicts."""
+
+    @abstractmethod
+    def es_duplicado(self, error: Exception) -> bool:
+        """Si el error de integridad es una clave duplicada (email UNIQUE)."""
+
+    def empezar(self, cur: Any) -> None:
+        """Abre una transacción de escritura (MySQL la abre implícitamente)."""
+
+    @contextmanager
+    def _cursor(self, buffered: bool = True) -> Iterator[Tuple[Any, Any]]:
+        with self.conexion() as conn:
+            cur = self.cursor(conn, buffered)
+            try:
+                yield conn, cur
+            finally:
+                cur.close()
+
+    @contextmanager
+    def _email_unico(self, email: str) -> Iterator[None]:
+        """Traduce el error de clave duplicada del driver a `EmailDuplicado`."""
+        try:
+            yield
+        except self.error_integridad as e:
+            if not self.es_duplicado(e):
+                raise
+            raise EmailDuplicado(f"Ya existe un cliente con el email {email}") from e
+
+    def _placeholders(self, n: int) -> str:
+        return ", ".join([self.marcador] * n)
+
+    # --- Lecturas ---
+
+    def fetch_all(self) -> List[Dict[str, Any]]:
+        with self._cursor() as (_, cur):
+            cur.execute("SELECT id, nombre, apellido, email, telefono, direccion FROM clientes")
+            return list(cur.fetchall())
+
+    def iter_all(self, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        with self._cursor(buffered=False) as (_, cur):
+            cur.execute("SELECT id, nombre, apellido, email, telefono, direccion FROM clientes ORDER BY id")
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def fetch_by_ids(self, ids: List[int]) -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        with self._cursor() as (_, cur):
+            cur.execute(
+                f"SELECT id, nombre, apellido, email, telefono, direccion FROM clientes "
+                f"WHERE id IN ({self._placeholders(len(ids))})",
+                tuple(ids)
+            )
+            por_id = {row["id"]: row for row in cur.fetchall()}
+        return [por_id[i] for i in ids if i in por_id]
+
+    def fetch_by_id(self, cliente_id: int) -> Dict[str, Any] | None:
+        with self._cursor() as (_, cur):
+            cur.execute(
+                f"SELECT id, nombre, apellido, email, telefono, direccion FROM clientes WHERE id = {self.marcador}",
+                (cliente_id,)
+            )
+            row = cur.fetchone()
+            return dict(row) if row else None
+
+    def fetch_page(
+        self,
+        limit: int,
+        orden: str,
+        descendente: bool,
+        cursor: Tuple[Any, int] | None,
+        hacia_atras: bool
+    ) -> List[Dict[str, Any]]:
+        # Retroceder equivale a recorrer el índice en sentido contrario
+        ascendente = descendente == hacia_atras
+        op = ">" if ascendente else "<"
+        sentido = "ASC" if ascendente else "DESC"
+        m = self.marcador
+
+        where = ""
+        params: List[Any] = []
+        if cursor is not None:
+            valor, ultimo_id = cursor
+            if orden == "id":
+                where = f"WHERE id {op} {m}"
+                params = [ultimo_id]
+            else:
+                where = f"WHERE ({orden} {op} {m} OR ({orden} = {m} AND id {op} {m}))"
+                params = [valor, valor, ultimo_id]
+
+        order_by = f"ORDER BY id {sentido}" if orden == "id" else f"ORDER BY {orden} {sentido}, id {sentido}"
+
+        with self._cursor() as (_, cur):
+            cur.execute(
+                f"SELECT id, nombre, apellido, email, telefono, direccion FROM clientes "
+                f"{where} {order_by} LIMIT {m}",
+                (*params, limit)
+            )
+            rows = list(cur.fetchall())
+
+        if hacia_atras:
+            rows.reverse()
+        return rows
+
+    def count(self) -> int:
+        with self._cursor() as (_, cur):
+            cur.execute("SELECT COUNT(*) AS total FROM clientes")
+            row = cur.fetchone()
+            return int(row["total"]) if row else 0
+
+    # --- Escrituras ---
+
+    def _sql_insert(self) -> str:
+        return (
+            "INSERT INTO clientes (nombre, apellido, email, telefono, direccion) "
+            f"VALUES ({self._placeholders(len(COLUMNAS))})"
+        )
+
+    def insert(self, cliente: Dict[str, Any]) -> int:
+        with self._cursor() as (conn, cur):
+            with self._email_unico(cliente["email"]):
+                cur.execute(self._sql_insert(), valores_cliente(cliente))
+            conn.commit()
+            return cur.lastrowid or 0
+
+    def insert_batch(self, clientes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        if not clientes:
+            return [], []
+
+        with self._cursor() as (conn, cur):
+            self.empezar(cur)
+            # Descartamos de antemano los emails ya registrados (columna UNIQUE)
+            cur.execute(
+                f"SELECT email FROM clientes WHERE email IN ({self._placeholders(len(clientes))})",
+                tuple(c["email"] for c in clientes)
+            )
+            existentes = {str(fila["email"]).lower() for fila in cur.fetchall()}
+            nuevos, conflictos = separar_duplicados(clientes, existentes)
+
+            if nuevos:
+                try:
+                    # mysql-connector agrupa el executemany en un único INSERT multi-fila
+                    cur.executemany(self._sql_insert(), [valores_cliente(c) for c in nuevos])
+                except self.error_integridad as e:
+                    # Otro proceso insertó alguno de los emails entre la comprobación y el INSERT
+                    conn.rollback()
+                    if not self.es_duplicado(e):
+                        raise
+                    self.empezar(cur)
+                    nuevos, duplicados = self._insertar_uno_a_uno(cur, nuevos)
+                    conflictos.extend(duplicados)
+
+            insertados: List[Dict[str, Any]] = []
+            if nuevos:
+                # Recuperamos los ids asignados dentro de la misma transacción
+                cur.execute(
+                    f"SELECT id, nombre, apellido, email, telefono, direccion FROM clientes "
+                    f"WHERE email IN ({self._placeholders(len(nuevos))})",
+                    tuple(c["email"] for c in nuevos)
+                )
+                insertados = list(cur.fetchall())
+            conn.commit()
+        return insertados, conflictos
+
+    def _insertar_uno_a_uno(
+        self,
+        cur: Any,
+        clientes: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Reintenta un lote fila a fila dentro de la transacción en curso; un error
+        de clave duplicada solo deshace la sentencia que falla.
+        """
+        insertados: List[Dict[str, Any]] = []
+        duplicados: List[str] = []
+        for cliente in clientes:
+            try:
+                cur.execute(self._sql_insert(), valores_cliente(cliente))
+                insertados.append(cliente)
+            except self.error_integridad as e:
+                if not self.es_duplicado(e):
+                    raise
+                duplicados.append(cliente["email"])
+        return insertados, duplicados
+
+    def update(self, cliente_id: int, cliente: Dict[str, Any]) -> bool:
+        m = self.marcador
+        with self._cursor() as (conn, cur):
+            with self._email_unico(cliente["email"]):
+                cur.execute(
+                    f"""
+                    UPDATE clientes
+                    SET nombre = {m}, apellido = {m}, email = {m}, telefono = {m}, direccion = {m}
+                    WHERE id = {m}
+                    """,
+                    valores_cliente(cliente) + (cliente_id,)
+                )
+            conn.commit()
+            return cur.rowcount > 0
+
+    def update_batch(self, clientes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        # Si un id se repite, gana su última aparición
+        por_id = {c["id"]: c for c in clientes}
+        if not por_id:
+            return [], []
+        ids = list(por_id)
+        with self._cursor() as (conn, cur):
+            self.empezar(cur)
+            cur.execute(
+                f"SELECT id FROM clientes WHERE id IN ({self._placeholders(len(ids))}){self.bloqueo_filas}",
+                tuple(ids)
+            )
+            existentes = {fila["id"] for fila in cur.fetchall()}
+            actualizados = [por_id[i] for i in ids if i in existentes]
+            if actualizados:
+                # La base de datos comprueba el UNIQUE fila a fila, así que el resultado dependería del
+                # orden en que recorre el lote: rechazamos de antemano cualquier email que ya sea de otro
+                cur.execute(
+                    f"SELECT id, email FROM clientes WHERE email IN ({self._placeholders(len(actualizados))})",
+                    tuple(c["email"] for c in actualizados)
+                )
+                duenios = {str(fila["email"]).lower(): fila["id"] for fila in cur.fetchall()}
+                if any(duenios.get(c["email"].lower(), c["id"]) != c["id"] for c in actualizados):
+                    conn.rollback()
+                    raise EmailDuplicado("Alguno de los emails ya pertenece a otro cliente")
+                sql, params = self._sql_update_multifila(actualizados)
+                try:
+                    cur.execute(sql, params)
+                except self.error_integridad as e:
+                    conn.rollback()
+                    if not self.es_duplicado(e):
+                        raise
+                    raise EmailDuplicado("Alguno de los emails ya pertenece a otro cliente") from e
+            conn.commit()
+        return actualizados, [i for i in ids if i not in existentes]
+
+    def _sql_update_multifila(self, clientes: List[Dict[str, Any]]) -> Tuple[str, Tuple[Any, ...]]:
+        """
+        Construye `UPDATE clientes SET col = CASE id WHEN ... END, ... WHERE id IN (...)`:
+        una sola sentencia (y un viaje a la base de datos) para todo el lote.
+        """
+        asignaciones = []
+        params: List[Any] = []
+        casos = " ".join([f"WHEN {self.marcador} THEN {self.marcador}"] * len(clientes))
+        for columna in COLUMNAS:
+            asignaciones.append(f"{columna} = CASE id {casos} END")
+            for cliente in clientes:
+                params.extend((cliente["id"], cliente.get(columna)))
+        params.extend(cliente["id"] for cliente in clientes)
+        sql = (
+            f"UPDATE clientes SET {', '.join(asignaciones)} "
+            f"WHERE id IN ({self._placeholders(len(clientes))})"
+        )
+        return sql, tuple(params)
+
+    def delete(self, cliente_id: int) -> bool:
+        with self._cursor() as (conn, cur):
+            cur.execute(f"DELETE FROM clientes WHERE id = {self.marcador}", (cliente_id,))
+            conn.commit()
+            return cur.rowcount > 0
+
+    def delete_batch(self, ids: List[int]) -> List[int]:
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        with self._cursor() as (conn, cur):
+            self.empezar(cur)
+            # Bloqueamos las filas para que la lista de eliminados sea exacta
+            cur.execute(
+                f"SELECT id FROM clientes WHERE id IN ({self._placeholders(len(ids))}){self.bloqueo_filas}",
+                tuple(ids)
+            )
+            existentes = {fila["id"] for fila in cur.fetchall()}
+            eliminados = [i for i in ids if i in existentes]
+            if eliminados:
+                cur.execute(
+                    f"DELETE FROM clientes WHERE id IN ({self._placeholders(len(eliminados))})",
+                    tuple(eliminados)
+                )
+            conn.commit()
+        return eliminados
+
+    # --- Versión de la tabla ---
+    # Una fila en clientes_version, compartida por todos los workers (la caché es de cada proceso)
+
+    def _preparar_version(self, conn: Any, cur: Any) -> None:
+        """Crea la tabla y su fila si faltan (bases creadas antes de que existiera)."""
+        if self._version_lista:
+            return
+        cur.execute(SQL_TABLA_VERSION)
+        cur.execute("SELECT version FROM clientes_version WHERE id = 1")
+        if cur.fetchone() is None:
+            try:
+                cur.execute(
+                    f"INSERT INTO clientes_version (id, version, modificado) VALUES (1, 0, {self.marcador})",
+                    (time.time(),)
+                )
+                conn.commit()
+            except self.error_integridad:
+                # Otro proceso la ha creado a la vez
+                conn.rollback()
+        self._version_lista = True
+
+    def version(self) -> Tuple[int, float]:
+        with self._cursor() as (conn, cur):
+            self._preparar_version(conn, cur)
+            cur.execute("SELECT version, modificado FROM clientes_version WHERE id = 1")
+            fila = cur.fetchone()
+        return int(fila["version"]), float(fila["modificado"])
+
+    def tocar_version(self) -> None:
+        with self._cursor() as (conn, cur):
+            self._preparar_version(conn, cur)
+            cur.execute(
+                f"UPDATE clientes_version SET version = version + 1, modificado = {self.marcador} WHERE id = 1",
+                (time.time(),)
+            )
+            conn.commit()
+
+
+# Misma definición en docs/init_db.sql y en el esquema de SQLite
+SQL_TABLA_VERSION = (
+    "CREATE TABLE IF NOT EXISTS clientes_version ("
+    "id INT PRIMARY KEY, version BIGINT NOT NULL, modificado DOUBLE NOT NULL)"
+)
+
+
+def _crear_mysql() -> StorageBackend:
+    from app.storage_mysql import MySQLStorage
+    return MySQLStorage()
+
+
+def _crear_sqlite() -> StorageBackend:
+    from app.storage_sqlite import SQLiteStorage
+    return SQLiteStorage(os.getenv("SQLITE_PATH", "clientes.db"))
+
+
+def _crear_memoria() -> StorageBackend:
+    from app.storage_memory import MemoryStorage
+    return MemoryStorage()
+
+
+_BACKENDS: Dict[str, Callable[[], StorageBackend]] = {
+    "mysql": _crear_mysql,
+    "sqlite": _crear_sqlite,
+    "memory": _crear_memoria,
+}
+
+_storage: StorageBackend | None = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Backend de almacenamiento del proceso, elegido con DB_BACKEND (mysql, sqlite o memory)."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                nombre = os.getenv("DB_BACKEND", "mysql").lower()
+                if nombre not in _BACKENDS:
+                    raise ValueError(f"DB_BACKEND desconocido: {nombre} (use {', '.join(_BACKENDS)})")
+                _storage = _BACKENDS[nombre]()
+    return _storage
+
+
+def set_storage_backend(backend: StorageBackend) -> None:
+    """Sustituye el backend (pruebas y benchmarks)."""
+    global _storage
+    with _storage_lock:
+        if _storage is not None:
+            _storage.close()
+        _storage = backend
@@ -0,0 +1,209 @@
+import bisect
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.storage import COLUMNAS, StorageBackend, EmailDuplicado, separar_duplicados
+
+# Columnas de texto con índice ordenado (el id ya está ordenado en `_ids`)
+_COLUMNAS_INDICE = ("nombre", "apellido", "email")
+
+
+def _clave(valor: Any) -> str:
+    # Sin distinguir mayúsculas, como la colación _ci de MySQL
+    return str(valor).lower()
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Backend en memoria: dict por id, índice único por email y listas ordenadas
+    (clave, id) por nombre, apellido y email para la paginación keyset con `bisect`.
+    Los datos se pierden al reiniciar; sirve para pruebas, demos y comparar backends.
+    """
+
+    nombre = "memory"
+    # Leer de aquí ya es tan rápido como leer de la caché
+    usa_cache = False
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._filas: Dict[int, Dict[str, Any]] = {}
+        self._por_email: Dict[str, int] = {}
+        self._ids: List[int] = []
+        self._indices: Dict[str, List[Tuple[str, int]]] = {columna: [] for columna in _COLUMNAS_INDICE}
+        self._siguiente_id = 1
+        # Los datos son del proceso, así que la versión también
+        self._version = 0
+        self._modificado = time.time()
+
+    # --- Índices ---
+
+    def _indexar(self, fila: Dict[str, Any]) -> None:
+        for columna, indice in self._indices.items():
+            bisect.insort(indice, (_clave(fila[columna]), fila["id"]))
+        self._por_email[_clave(fila["email"])] = fila["id"]
+
+    def _desindexar(self, fila: Dict[str, Any]) -> None:
+        for columna, indice in self._indices.items():
+            entrada = (_clave(fila[columna]), fila["id"])
+            pos = bisect.bisect_left(indice, entrada)
+            if pos < len(indice) and indice[pos] == entrada:
+                del indice[pos]
+        self._por_email.pop(_clave(fila["email"]), None)
+
+    def _alta(self, cliente: Dict[str, Any]) -> Dict[str, Any]:
+        fila = {"id": self._siguiente_id, **{columna: cliente.get(columna) for columna in COLUMNAS}}
+        self._siguiente_id += 1
+        self._filas[fila["id"]] = fila
+        # Los ids crecen siempre: basta con añadir al final
+        self._ids.append(fila["id"])
+        self._indexar(fila)
+        return dict(fila)
+
+    def _modificar(self, cliente_id: int, cliente: Dict[str, Any]) -> None:
+        fila = self._filas[cliente_id]
+        self._desindexar(fila)
+        fila.update({columna: cliente.get(columna) for columna in COLUMNAS})
+        self._indexar(fila)
+
+    def _baja(self, cliente_id: int) -> None:
+        fila = self._filas.pop(cliente_id)
+        self._desindexar(fila)
+        pos = bisect.bisect_left(self._ids, cliente_id)
+        del self._ids[pos]
+
+    # --- Lecturas ---
+
+    def fetch_all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(self._filas[i]) for i in self._ids]
+
+    def iter_all(self, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        # Copiamos por tramos de ids para no retener el bloqueo mientras se consume
+        ultimo = 0
+        while True:
+            with self._lock:
+                pos = bisect.bisect_right(self._ids, ultimo)
+                tramo = [dict(self._filas[i]) for i in self._ids[pos:pos + batch_size]]
+            if not tramo:
+                break
+            yield from tramo
+            ultimo = tramo[-1]["id"]
+
+    def fetch_by_ids(self, ids: List[int]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(self._filas[i]) for i in ids if i in self._filas]
+
+    def fetch_by_id(self, cliente_id: int) -> Dict[str, Any] | None:
+        with self._lock:
+            fila = self._filas.get(cliente_id)
+            return dict(fila) if fila else None
+
+    def fetch_page(
+        self,
+        limit: int,
+        orden: str,
+        descendente: bool,
+        cursor: Tuple[Any, int] | None,
+        hacia_atras: bool
+    ) -> List[Dict[str, Any]]:
+        # Retroceder equivale a recorrer el índice en sentido contrario
+        ascendente = descendente == hacia_atras
+        with self._lock:
+            if orden == "id":
+                indice: List[Any] = self._ids
+                clave: Any = cursor[1] if cursor is not None else None
+            else:
+                indice = self._indices[orden]
+                clave = (_clave(cursor[0]), cursor[1]) if cursor is not None else None
+
+            if ascendente:
+                inicio = 0 if clave is None else bisect.bisect_right(indice, clave)
+                tramo = indice[inicio:inicio + limit]
+            else:
+                fin = len(indice) if clave is None else bisect.bisect_left(indice, clave)
+                tramo = indice[max(0, fin - limit):fin][::-1]
+
+            ids = tramo if orden == "id" else [i for _, i in tramo]
+            rows = [dict(self._filas[i]) for i in ids]
+
+        if hacia_atras:
+            rows.reverse()
+        return rows
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._filas)
+
+    # --- Escrituras ---
+
+    def insert(self, cliente: Dict[str, Any]) -> int:
+        with self._lock:
+            if _clave(cliente["email"]) in self._por_email:
+                raise EmailDuplicado(f"Ya existe un cliente con el email {cliente['email']}")
+            return self._alta(cliente)["id"]
+
+    def insert_batch(self, clientes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        with self._lock:
+            existentes = {_clave(c["email"]) for c in clientes if _clave(c["email"]) in self._por_email}
+            nuevos, conflictos = separar_duplicados(clientes, existentes)
+            return [self._alta(c) for c in nuevos], conflictos
+
+    def update(self, cliente_id: int, cliente: Dict[str, Any]) -> bool:
+        with self._lock:
+            if cliente_id not in self._filas:
+                return False
+            duenio = self._por_email.get(_clave(cliente["email"]))
+            if duenio is not None and duenio != cliente_id:
+                raise EmailDuplicado(f"Ya existe un cliente con el email {cliente['email']}")
+            self._modificar(cliente_id, cliente)
+            return True
+
+    def update_batch(self, clientes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        # Si un id se repite, gana su última aparición
+        por_id = {c["id"]: c for c in clientes}
+        with self._lock:
+            actualizados = [c for i, c in por_id.items() if i in self._filas]
+            # Todo o nada: comprobamos los emails antes de tocar nada
+            nuevos_emails: Dict[str, int] = {}
+            for cliente in actualizados:
+                clave = _clave(cliente["email"])
+                duenio = self._por_email.get(clave)
+                otro = nuevos_emails.setdefault(clave, cliente["id"])
+                # Como en SQL, no vale un email de otro cliente aunque este lo cambie en el mismo lote
+                if otro != cliente["id"] or (duenio is not None and duenio != cliente["id"]):
+                    raise EmailDuplicado("Alguno de los emails ya pertenece a otro cliente")
+            for cliente in actualizados:
+                self._desindexar(self._filas[cliente["id"]])
+            for cliente in actualizados:
+                fila = self._filas[cliente["id"]]
+                fila.update({columna: cliente.get(columna) for columna in COLUMNAS})
+                self._indexar(fila)
+            return actualizados, [i for i in por_id if i not in self._filas]
+
+    def delete(self, cliente_id: int) -> bool:
+        with self._lock:
+            if cliente_id not in self._filas:
+                return False
+            self._baja(cliente_id)
+            return True
+
+    def delete_batch(self, ids: List[int]) -> List[int]:
+        with self._lock:
+            eliminados = [i for i in dict.fromkeys(ids) if i in self._filas]
+            for cliente_id in eliminados:
+                self._baja(cliente_id)
+            return eliminados
+
+    def version(self) -> Tuple[int, float]:
+        with self._lock:
+            return self._version, self._modificado
+
+    def tocar_version(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._modificado = time.time()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.nombre, "clientes": len(self._filas), "next_id": self._siguiente_id}
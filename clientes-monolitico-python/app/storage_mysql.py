@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+import mysql.connector
+from comun.metrics import registrar_fase, span
+from dotenv import load_dotenv, find_dotenv
+from mysql.connector import errorcode
+from mysql.connector.constants import ClientFlag
+
+from app.pool import ConnectionPool
+from app.storage import SQLStorage
+
+# Carga .env desde la raíz
+load_dotenv(find_dotenv())
+
+
+def get_connection():
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", "clientes_db"),
+        port=int(os.getenv("DB_PORT", "3306")),
+        charset="utf8mb4",
+        # rowcount de UPDATE = filas encontradas (no solo las modificadas): guardar un cliente
+        # sin cambios no debe responder "no encontrado"
+        client_flags=[ClientFlag.FOUND_ROWS]
+    )
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Devuelve el pool de conexiones compartido (se crea en el primer uso).
+    Se configura con DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_IDLE_TIMEOUT,
+    DB_POOL_TIMEOUT y DB_POOL_HEALTH_CHECK_AFTER.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_connection,
+                    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                    idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+                    checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+                    health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "5")),
+                )
+    return _pool
+
+
+@contextmanager
+def pooled_connection() -> Iterator[Any]:
+    """
+    Presta una conexión del pool y la devuelve al salir del bloque.
+    Mide la espera del pool como fase `db_connect` y el uso de la conexión como `query`.
+    """
+    inicio = time.perf_counter()
+    with get_pool().connection() as conn:
+        registrar_fase("db_connect", time.perf_counter() - inicio)
+        with span("query"):
+            yield conn
+
+
+class MySQLStorage(SQLStorage):
+    """Backend MySQL con el pool de `app/pool.py`."""
+
+    nombre = "mysql"
+    marcador = "%s"
+    bloqueo_filas = " FOR UPDATE"
+    error_integridad = mysql.connector.IntegrityError
+
+    def conexion(self) -> Any:
+        return pooled_connection()
+
+    def cursor(self, conn: Any, buffered: bool = True) -> Any:
+        return conn.cursor(dictionary=True, buffered=buffered)
+
+    def es_duplicado(self, error: Exception) -> bool:
+        return getattr(error, "errno", None) == errorcode.ER_DUP_ENTRY
+
+    def metrics(self) -> Dict[str, Any]:
+        return get_pool().metrics()
+
+    def close(self) -> None:
+        global _pool
+        with _pool_lock:
+            if _pool is not None:
+                _pool.close_all()
+                _pool = None
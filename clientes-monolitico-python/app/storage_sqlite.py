@@ -0,0 +1,139 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from comun.metrics import registrar_fase, span
+
+from app.storage import SQL_TABLA_VERSION, SQLStorage
+
+# Mismo esquema que docs/init_db.sql; NOCASE reproduce la colación de MySQL en email y en el orden
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL COLLATE NOCASE,
+    apellido TEXT NOT NULL COLLATE NOCASE,
+    email TEXT NOT NULL COLLATE NOCASE UNIQUE,
+    telefono TEXT,
+    direccion TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_clientes_nombre_id ON clientes (nombre, id);
+CREATE INDEX IF NOT EXISTS idx_clientes_apellido_id ON clientes (apellido, id);
+""" + SQL_TABLA_VERSION + ";"
+
+# WAL: los lectores no bloquean al escritor ni al revés; NORMAL solo sincroniza en los checkpoints
+_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = {busy_timeout_ms}",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+def _fila_dict(cur: sqlite3.Cursor, fila: tuple) -> Dict[str, Any]:
+    return {col[0]: valor for col, valor in zip(cur.description, fila)}
+
+
+class SQLiteStorage(SQLStorage):
+    """
+    Backend SQLite en modo WAL, para nodos sin servidor MySQL y pruebas.
+    Cada hilo usa su propia conexión (las del executor de `run_db` se reutilizan);
+    las escrituras por lotes abren la transacción con BEGIN IMMEDIATE.
+    """
+
+    nombre = "sqlite"
+    marcador = "?"
+    error_integridad = sqlite3.IntegrityError
+
+    def __init__(self, ruta: str, busy_timeout: float = 5.0):
+        self.ruta = ruta
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexiones: List[sqlite3.Connection] = []
+        self._consultas = 0
+        self._tiempo_total = 0.0
+        with self._lock:
+            conn = self._conectar()
+            conn.executescript(_ESQUEMA)
+
+    def _conectar(self) -> sqlite3.Connection:
+        # Autocommit: las transacciones se abren explícitamente con `empezar`
+        conn = sqlite3.connect(self.ruta, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.row_factory = _fila_dict
+        for pragma in _PRAGMAS:
+            conn.execute(pragma.format(busy_timeout_ms=int(self.busy_timeout * 1000)))
+        self._conexiones.append(conn)
+        self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def conexion(self) -> Iterator[sqlite3.Connection]:
+        inicio = time.perf_counter()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._conectar()
+        registrar_fase("db_connect", time.perf_counter() - inicio)
+        inicio = time.perf_counter()
+        try:
+            with span("query"):
+                yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            with self._lock:
+                self._consultas += 1
+                self._tiempo_total += time.perf_counter() - inicio
+
+    def iter_all(self, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        # El recorrido se reanuda desde hilos distintos (exportación en streaming):
+        # usa una conexión propia en lugar de la del hilo
+        conn = sqlite3.connect(self.ruta, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.row_factory = _fila_dict
+        try:
+            cur = conn.execute("SELECT id, nombre, apellido, email, telefono, direccion FROM clientes ORDER BY id")
+            while True:
+                with span("query"):
+                    rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def cursor(self, conn: Any, buffered: bool = True) -> Any:
+        return conn.cursor()
+
+    def es_duplicado(self, error: Exception) -> bool:
+        return "UNIQUE" in str(error)
+
+    def empezar(self, cur: Any) -> None:
+        # Toma el bloqueo de escritura al empezar: equivale al SELECT ... FOR UPDATE de MySQL
+        cur.execute("BEGIN IMMEDIATE")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.nombre,
+                "path": self.ruta,
+                "connections": len(self._conexiones),
+                "operations": self._consultas,
+                "operation_seconds_total": self._tiempo_total,
+                "operation_seconds_avg": self._tiempo_total / self._consultas if self._consultas else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            conexiones, self._conexiones = self._conexiones, []
+        for conn in conexiones:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
@@ -0,0 +1,161 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+
+from email_validator import SPECIAL_USE_DOMAIN_NAMES
+from pydantic import BaseModel, ValidationError
+
+# Patrones compilados una sola vez al importar el módulo
+_RE_NOMBRE = re.compile(r'^[a-zA-ZáéíóúÁÉÍÓÚñÑüÜ\s]+$')
+_RE_SEPARADORES_TELEFONO = re.compile(r'[\s\-\(\)]')
+_RE_TELEFONO = re.compile(r'^\+?\d{7,15}$')
+# Subconjunto ASCII de direcciones que email-validator acepta sin más cambio que pasar el
+# dominio a minúsculas (parte local dot-atom). El resto pasa por la validación completa.
+_RE_EMAIL_NORMALIZADO = re.compile(
+    r'[A-Za-z0-9_%+\-]+(?:\.[A-Za-z0-9_%+\-]+)*'
+    r'@(?:[a-z0-9](?:[a-z0-9\-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}'
+)
+_DOMINIOS_ESPECIALES = tuple(SPECIAL_USE_DOMAIN_NAMES)
+
+_PREFIJO_VALUE_ERROR = "Value error, "
+
+
+@lru_cache(maxsize=8192)
+def validar_nombre_apellido(v: str) -> str:
+    """
+    Valida nombre/apellido y lo capitaliza. Cacheado: en las cargas masivas los
+    nombres y apellidos se repiten mucho.
+    """
+    if not v or not v.strip():
+        raise ValueError('El campo no puede estar vacío')
+
+    v = v.strip()
+
+    if len(v) < 2:
+        raise ValueError('Debe tener al menos 2 caracteres')
+
+    if len(v) > 50:
+        raise ValueError('No puede exceder 50 caracteres')
+
+    # Solo letras, espacios, tildes y caracteres especiales del español
+    if not _RE_NOMBRE.match(v):
+        raise ValueError('Solo se permiten letras y espacios')
+
+    return v.title()  # Capitaliza cada palabra
+
+
+def validar_telefono(v: str | None) -> str | None:
+    """Valida el formato del teléfono (7 a 15 dígitos, `+` opcional)."""
+    if v is None or v.strip() == '':
+        return None
+
+    v = v.strip()
+
+    # Elimina espacios, guiones y paréntesis para validar
+    telefono_limpio = _RE_SEPARADORES_TELEFONO.sub('', v)
+
+    # Debe contener solo dígitos y opcionalmente + al inicio
+    if not _RE_TELEFONO.match(telefono_limpio):
+        raise ValueError('Formato de teléfono inválido. Debe contener entre 7 y 15 dígitos')
+
+    return v
+
+
+def validar_direccion(v: str | None) -> str | None:
+    """Valida la dirección."""
+    if v is None or v.strip() == '':
+        return None
+
+    v = v.strip()
+
+    if len(v) > 200:
+        raise ValueError('La dirección no puede exceder 200 caracteres')
+
+    return v
+
+
+def normalizar_email(v: str) -> str | None:
+    """
+    Normaliza el email como `EmailStr` (sin espacios alrededor y dominio en minúsculas) si
+    está en el subconjunto que se puede resolver sin email-validator; si no, devuelve None.
+    """
+    v = v.strip()
+    local, arroba, dominio = v.rpartition("@")
+    if not arroba or len(local) > 64:
+        return None
+    v = f"{local}@{dominio.lower()}"
+    if len(v) > 254 or not _RE_EMAIL_NORMALIZADO.fullmatch(v) or "--" in dominio:
+        return None
+    dominio = dominio.lower()
+    if any(dominio == d or dominio.endswith("." + d) for d in _DOMINIOS_ESPECIALES):
+        return None
+    return v
+
+
+def formatear_errores(e: ValidationError) -> List[str]:
+    """Convierte los errores de pydantic en mensajes `Campo: mensaje` para mostrar al usuario."""
+    errores = []
+    for error in e.errors():
+        campo = str(error['loc'][0]) if error['loc'] else 'campo'
+        mensaje = error['msg']
+        if mensaje.startswith(_PREFIJO_VALUE_ERROR):
+            mensaje = mensaje[len(_PREFIJO_VALUE_ERROR):]
+        errores.append(f"{campo.capitalize()}: {mensaje}")
+    return errores
+
+
+def _validar_rapido(datos: Dict[str, Any]) -> Dict[str, Any] | None:
+    """
+    Valida una fila sin construir el modelo pydantic. Devuelve None si la fila no es
+    válida o no se puede decidir por esta vía (tipos inesperados, emails poco habituales).
+    """
+    nombre = datos.get("nombre")
+    apellido = datos.get("apellido")
+    email = datos.get("email")
+    telefono = datos.get("telefono")
+    direccion = datos.get("direccion")
+    if not (
+        isinstance(nombre, str) and isinstance(apellido, str) and isinstance(email, str)
+        and (telefono is None or isinstance(telefono, str))
+        and (direccion is None or isinstance(direccion, str))
+    ):
+        return None
+    email = normalizar_email(email)
+    if email is None:
+        return None
+    try:
+        return {
+            "nombre": validar_nombre_apellido(nombre),
+            "apellido": validar_nombre_apellido(apellido),
+            "email": email,
+            "telefono": validar_telefono(telefono),
+            "direccion": validar_direccion(direccion),
+        }
+    except ValueError:
+        return None
+
+
+def validate_rows(
+    filas: Iterable[Dict[str, Any]],
+    modelo: type[BaseModel]
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, List[str]]]]:
+    """
+    Valida un lote de filas con las mismas reglas que `modelo` (un `ClienteBase`).
+
+    Las filas con datos ya normalizados se resuelven por la vía rápida, sin construir el
+    modelo; el resto (incluidas todas las inválidas) se valida con pydantic, así que los
+    datos y los mensajes de error son idénticos a los del formulario.
+    Retorna (válidas, erróneas) como listas de (posición en el lote, datos | errores).
+    """
+    validas: List[Tuple[int, Dict[str, Any]]] = []
+    erroneas: List[Tuple[int, List[str]]] = []
+    for posicion, datos in enumerate(filas):
+        limpio = _validar_rapido(datos)
+        if limpio is not None:
+            validas.append((posicion, limpio))
+            continue
+        try:
+            validas.append((posicion, modelo(**datos).model_dump()))
+        except ValidationError as e:
+            erroneas.append((posicion, formatear_errores(e)))
+    return validas, erroneas
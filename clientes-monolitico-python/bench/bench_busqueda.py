@@ -0,0 +1,73 @@
+"""
+Micro-benchmark del índice de búsqueda en memoria (app/search.py).
+
+Genera N clientes sintéticos con nombres españoles, construye el índice y mide la
+latencia de consultas de prefijo, con tildes y con erratas.
+
+Uso (desde clientes-monolitico-python/):
+    python -m bench.bench_busqueda --filas 1000000 --consultas 2000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.search import IndiceBusqueda
+
+NOMBRES = [
+    "José", "María", "Íñigo", "Ángela", "Begoña", "Nuria", "Óscar", "Raúl", "Inés", "Sofía",
+    "Joaquín", "Lucía", "Tomás", "Martín", "Jesús", "Ramón", "Ana", "Juan", "Carlos", "Elena",
+]
+APELLIDOS = [
+    "Pérez", "García", "Núñez", "Muñoz", "Rodríguez", "López", "Martínez", "Sánchez", "Gómez",
+    "Fernández", "Díaz", "Álvarez", "Jiménez", "Hernández", "Ibáñez", "Peña", "Castaño", "Ortiz",
+]
+CONSULTAS = [
+    "jose", "nunez", "Muñ", "ibañez", "rodrigez", "fernandes", "marti", "angela alv",
+    "inigo", "peña jes", "gomes", "555", "lucia sanc", "hernan", "castano",
+]
+
+
+def generar(filas: int):
+    rnd = random.Random(42)
+    for i in range(1, filas + 1):
+        nombre = rnd.choice(NOMBRES)
+        apellido = f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}"
+        yield {
+            "id": i,
+            "nombre": nombre,
+            "apellido": apellido,
+            "email": f"{nombre.lower()}.{i}@example.com",
+            "telefono": f"555-{rnd.randint(0, 9999999):07d}",
+        }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark del índice de búsqueda de clientes")
+    p.add_argument("--filas", type=int, default=200_000)
+    p.add_argument("--consultas", type=int, default=1000)
+    p.add_argument("--limite", type=int, default=20)
+    args = p.parse_args()
+
+    indice = IndiceBusqueda()
+    inicio = time.perf_counter()
+    indice.construir(generar(args.filas))
+    print(f"Índice construido: {len(indice)} filas en {time.perf_counter() - inicio:.2f}s")
+
+    rnd = random.Random(7)
+    tiempos = []
+    for _ in range(args.consultas):
+        consulta = rnd.choice(CONSULTAS)
+        t0 = time.perf_counter()
+        indice.buscar(consulta, args.limite)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+
+    tiempos.sort()
+    p = lambda q: tiempos[min(len(tiempos) - 1, int(q * len(tiempos)))]  # noqa: E731
+    print(f"Consultas: {len(tiempos)}  media={statistics.mean(tiempos):.2f}ms  "
+          f"p50={p(0.50):.2f}ms  p95={p(0.95):.2f}ms  p99={p(0.99):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
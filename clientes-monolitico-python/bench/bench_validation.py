@@ -0,0 +1,101 @@
+"""
+Micro-benchmark de la validación de clientes (app/validation.py).
+
+Compara filas validadas por segundo con:
+  - `ClienteCreate(**fila)` fila a fila (lo que hace el formulario),
+  - `validate_rows` con datos ya normalizados (vía rápida),
+  - `validate_rows` con datos sin normalizar y un porcentaje de filas inválidas.
+
+Uso (desde clientes-monolitico-python/):
+    python -m bench.bench_validation --filas 100000
+"""
+
+import argparse
+import random
+import time
+import unicodedata
+
+from pydantic import ValidationError
+
+from app.models import ClienteCreate
+from app.validation import validate_rows
+
+NOMBRES = [
+    "José", "María", "Íñigo", "Ángela", "Begoña", "Nuria", "Óscar", "Raúl", "Inés", "Sofía",
+    "Joaquín", "Lucía", "Tomás", "Martín", "Jesús", "Ramón", "Ana", "Juan", "Carlos", "Elena",
+]
+APELLIDOS = [
+    "Pérez", "García", "Núñez", "Muñoz", "Rodríguez", "López", "Martínez", "Sánchez", "Gómez",
+    "Fernández", "Díaz", "Álvarez", "Jiménez", "Hernández", "Ibáñez", "Peña", "Castaño", "Ortiz",
+]
+DOMINIOS = ["example.com", "correo.es", "empresa.org"]
+
+
+def _ascii(texto: str) -> str:
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+
+
+def generar(filas: int, normalizadas: bool, invalidas: float = 0.0):
+    rnd = random.Random(42)
+    datos = []
+    for i in range(filas):
+        nombre = rnd.choice(NOMBRES)
+        apellido = f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}"
+        email = f"{_ascii(nombre).lower()}.{i}@{rnd.choice(DOMINIOS)}"
+        telefono = f"+34 6{rnd.randint(0, 99999999):08d}"
+        if not normalizadas:
+            nombre, apellido = f" {nombre.lower()} ", apellido.upper()
+            local, dominio = email.rsplit("@", 1)
+            email = f"{local}@{dominio.upper()}"
+        if rnd.random() < invalidas:
+            telefono = "12-ab"
+        datos.append({
+            "nombre": nombre, "apellido": apellido, "email": email,
+            "telefono": telefono, "direccion": f"Calle Mayor {i}",
+        })
+    return datos
+
+
+def medir(nombre: str, funcion, filas) -> None:
+    inicio = time.perf_counter()
+    validas = funcion(filas)
+    duracion = time.perf_counter() - inicio
+    print(f"{nombre:<40} {len(filas) / duracion:>12,.0f} filas/s  ({validas} válidas, {duracion:.2f}s)")
+
+
+def fila_a_fila(filas) -> int:
+    validas = 0
+    for fila in filas:
+        try:
+            ClienteCreate(**fila)
+            validas += 1
+        except ValidationError:
+            pass
+    return validas
+
+
+def por_lotes(filas, tamano_lote: int = 1000) -> int:
+    validas = 0
+    for i in range(0, len(filas), tamano_lote):
+        ok, _ = validate_rows(filas[i:i + tamano_lote], ClienteCreate)
+        validas += len(ok)
+    return validas
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark de la validación de clientes")
+    p.add_argument("--filas", type=int, default=100_000)
+    p.add_argument("--invalidas", type=float, default=0.05, help="Proporción de filas inválidas en el caso mixto")
+    args = p.parse_args()
+
+    normalizadas = generar(args.filas, normalizadas=True)
+    mixtas = generar(args.filas, normalizadas=False, invalidas=args.invalidas)
+
+    medir("ClienteCreate fila a fila (normalizadas)", fila_a_fila, normalizadas)
+    medir("validate_rows (normalizadas)", por_lotes, normalizadas)
+    medir("ClienteCreate fila a fila (mixtas)", fila_a_fila, mixtas)
+    medir("validate_rows (mixtas)", por_lotes, mixtas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Prueba de carga reproducible del CRUD de clientes.
+
+Arranca la app con uvicorn en un hilo (o usa un servidor ya levantado con --base-url),
+siembra N clientes en la base de datos configurada en .env, lanza una mezcla de peticiones
+(listado, formulario de edición, alta, actualización y baja) con la concurrencia indicada y
+guarda throughput y latencias p50/p95/p99 (total y por operación) en un JSON que se puede
+comparar entre commits.
+
+Uso (desde clientes-monolitico-python/):
+    python -m bench.load_test --filas 10000 --peticiones 5000 --concurrencia 20 --salida bench/resultado.json
+    python -m bench.load_test --mezcla index=80,editar=10,crear=5,actualizar=3,eliminar=2
+    python -m bench.load_test --base-url http://localhost:8000 --sin-siembra
+    python -m bench.load_test --backend sqlite --salida bench/sqlite.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlencode, urlsplit
+
+MEZCLA_POR_DEFECTO = "index=60,editar=15,crear=10,actualizar=10,eliminar=5"
+ORDENES = ("id", "nombre", "apellido", "email")
+NOMBRES = ["José", "María", "Íñigo", "Ángela", "Begoña", "Nuria", "Óscar", "Raúl", "Inés", "Sofía"]
+APELLIDOS = ["Pérez", "García", "Núñez", "Muñoz", "Rodríguez", "López", "Martínez", "Sánchez"]
+
+
+def parsear_mezcla(texto: str) -> Dict[str, int]:
+    mezcla = {}
+    for parte in texto.split(","):
+        operacion, _, peso = parte.partition("=")
+        if operacion.strip() not in OPERACIONES:
+            raise SystemExit(f"Operación desconocida en --mezcla: {operacion}")
+        mezcla[operacion.strip()] = int(peso)
+    return mezcla
+
+
+class Carga:
+    """Estado compartido entre los hilos: ids disponibles y contador de altas."""
+
+    def __init__(self, ids: List[int], prefijo: str):
+        self.ids = list(ids)
+        self.prefijo = prefijo
+        self.altas = 0
+        self.lock = threading.Lock()
+
+    def id_aleatorio(self, rnd: random.Random) -> int | None:
+        with self.lock:
+            return rnd.choice(self.ids) if self.ids else None
+
+    def sacar_id(self, rnd: random.Random) -> int | None:
+        """Saca un id de la lista (para borrarlo) sin que otro hilo lo vuelva a usar."""
+        with self.lock:
+            if not self.ids:
+                return None
+            posicion = rnd.randrange(len(self.ids))
+            self.ids[posicion], self.ids[-1] = self.ids[-1], self.ids[posicion]
+            return self.ids.pop()
+
+    def nuevo_email(self) -> str:
+        with self.lock:
+            self.altas += 1
+            return f"{self.prefijo}-alta{self.altas}@example.com"
+
+
+def _formulario(rnd: random.Random, email: str) -> str:
+    return urlencode({
+        "nombre": rnd.choice(NOMBRES),
+        "apellido": rnd.choice(APELLIDOS),
+        "email": email,
+        "telefono": f"6{rnd.randint(0, 99999999):08d}",
+        "direccion": f"Calle {rnd.randint(1, 500)}",
+    })
+
+
+# Cada operación devuelve (método, ruta, cuerpo, estados esperados)
+def op_index(carga: Carga, rnd: random.Random):
+    query = urlencode({"limite": 25, "orden": rnd.choice(ORDENES), "sentido": rnd.choice(("asc", "desc"))})
+    return "GET", f"/?{query}", None, (200,)
+
+
+def op_editar(carga: Carga, rnd: random.Random):
+    cliente_id = carga.id_aleatorio(rnd)
+    return "GET", f"/clientes/editar/{cliente_id}", None, (200, 404)
+
+
+def op_crear(carga: Carga, rnd: random.Random):
+    return "POST", "/clientes/nuevo", _formulario(rnd, carga.nuevo_email()), (303,)
+
+
+def op_actualizar(carga: Carga, rnd: random.Random):
+    cliente_id = carga.id_aleatorio(rnd)
+    # Email propio de cada id: las actualizaciones concurrentes no chocan entre sí
+    email = f"{carga.prefijo}-u{cliente_id}@example.com"
+    return "POST", f"/clientes/editar/{cliente_id}", _formulario(rnd, email), (303, 404)
+
+
+def op_eliminar(carga: Carga, rnd: random.Random):
+    cliente_id = carga.sacar_id(rnd)
+    return "DELETE", f"/clientes/{cliente_id}", None, (200, 404)
+
+
+OPERACIONES = {
+    "index": op_index,
+    "editar": op_editar,
+    "crear": op_crear,
+    "actualizar": op_actualizar,
+    "eliminar": op_eliminar,
+}
+
+
+def sembrar(filas: int, prefijo: str, semilla: int) -> List[int]:
+    """Inserta `filas` clientes con emails `{prefijo}-s{i}@example.com` en lotes de 1000."""
+    from app.database import insert_clientes_batch
+
+    rnd = random.Random(semilla)
+    ids: List[int] = []
+    for inicio in range(0, filas, 1000):
+        lote = [
+            {
+                "nombre": rnd.choice(NOMBRES), "apellido": rnd.choice(APELLIDOS),
+                "email": f"{prefijo}-s{i}@example.com",
+                "telefono": f"6{rnd.randint(0, 99999999):08d}", "direccion": f"Calle {i}",
+            }
+            for i in range(inicio, min(inicio + 1000, filas))
+        ]
+        insertados, _ = insert_clientes_batch(lote)
+        ids.extend(fila["id"] for fila in insertados)
+    return ids
+
+
+def limpiar(prefijo: str) -> int:
+    """Borra los clientes creados por la prueba (sembrados y dados de alta)."""
+    from app.database import delete_clientes_batch, iter_clientes
+
+    # Recorrido completo en lugar de un LIKE: funciona igual con cualquier backend
+    ids = [fila["id"] for fila in iter_clientes() if fila["email"].startswith(f"{prefijo}-")]
+    borrados = 0
+    for inicio in range(0, len(ids), 1000):
+        borrados += len(delete_clientes_batch(ids[inicio:inicio + 1000]))
+    return borrados
+
+
+def arrancar_servidor() -> Tuple[str, Any]:
+    """Arranca la app con uvicorn en un hilo y un puerto libre; devuelve (url, servidor)."""
+    import uvicorn
+    from app.main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=puerto, log_level="warning"))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    limite = time.monotonic() + 30
+    while not servidor.started:
+        if time.monotonic() > limite:
+            raise SystemExit("El servidor no arrancó en 30 s")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{puerto}", servidor
+
+
+def percentiles(latencias: List[float]) -> Dict[str, float]:
+    if not latencias:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "media_ms": 0.0}
+    ordenadas = sorted(latencias)
+
+    def p(q: float) -> float:
+        return round(ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000, 3)
+
+    return {
+        "p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99),
+        "media_ms": round(sum(ordenadas) / len(ordenadas) * 1000, 3),
+    }
+
+
+def resumen(resultados: List[Tuple[str, float, bool]], duracion: float) -> Dict[str, Any]:
+    latencias = [t for _, t, ok in resultados if ok]
+    return {
+        "peticiones": len(resultados),
+        "errores": sum(1 for _, _, ok in resultados if not ok),
+        "throughput_rps": round(len(latencias) / duracion, 1) if duracion else 0.0,
+        **percentiles(latencias),
+    }
+
+
+def version_codigo() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Prueba de carga del CRUD de clientes")
+    p.add_argument("--base-url", help="Servidor ya arrancado (por defecto se arranca uno en proceso)")
+    p.add_argument("--filas", type=int, default=5000, help="Clientes a sembrar antes de la prueba")
+    p.add_argument("--sin-siembra", action="store_true", help="Usar los clientes existentes (solo lecturas y altas)")
+    p.add_argument("--peticiones", type=int, default=2000)
+    p.add_argument("--calentamiento", type=int, default=100, help="Peticiones previas que no se miden")
+    p.add_argument("--concurrencia", type=int, default=20)
+    p.add_argument("--mezcla", default=MEZCLA_POR_DEFECTO, help="Pesos por operación: index,editar,crear,actualizar,eliminar")
+    p.add_argument("--semilla", type=int, default=42)
+    p.add_argument("--salida", help="Fichero JSON con los resultados")
+    p.add_argument("--conservar", action="store_true", help="No borrar los clientes creados por la prueba")
+    p.add_argument(
+        "--backend", choices=("mysql", "sqlite", "memory"),
+        help="Backend de datos (DB_BACKEND) para la siembra y el servidor en proceso"
+    )
+    args = p.parse_args()
+
+    if args.backend:
+        if args.backend == "memory" and args.base_url:
+            raise SystemExit("El backend memory solo se puede probar con el servidor en proceso")
+        # Antes de importar la app: el backend se elige en el primer acceso
+        os.environ["DB_BACKEND"] = args.backend
+    backend = os.getenv("DB_BACKEND", "mysql")
+
+    mezcla = parsear_mezcla(args.mezcla)
+    prefijo = f"bench{int(time.time())}"
+    ids: List[int] = []
+    if not args.sin_siembra:
+        inicio = time.perf_counter()
+        ids = sembrar(args.filas, prefijo, args.semilla)
+        print(f"Sembrados {len(ids)} clientes en {time.perf_counter() - inicio:.1f}s")
+    elif any(mezcla.get(op) for op in ("editar", "actualizar", "eliminar")):
+        raise SystemExit("Con --sin-siembra la mezcla solo puede incluir index y crear")
+
+    servidor = None
+    base_url = args.base_url
+    if base_url is None:
+        base_url, servidor = arrancar_servidor()
+    destino = urlsplit(base_url)
+
+    carga = Carga(ids, prefijo)
+    operaciones = [op for op in mezcla for _ in range(mezcla[op])]
+    local = threading.local()
+
+    def peticion(numero: int) -> Tuple[str, float, bool]:
+        # Cada petición tiene su propio generador: misma secuencia de operaciones en cada ejecución
+        rnd = random.Random(args.semilla * 1_000_003 + numero)
+        nombre = rnd.choice(operaciones)
+        metodo, ruta, cuerpo, esperados = OPERACIONES[nombre](carga, rnd)
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=30)
+        cabeceras = {"Content-Type": "application/x-www-form-urlencoded"} if cuerpo else {}
+        inicio = time.perf_counter()
+        try:
+            conn.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+            respuesta = conn.getresponse()
+            respuesta.read()
+            ok = respuesta.status in esperados
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            ok = False
+        return nombre, time.perf_counter() - inicio, ok
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+            list(pool.map(peticion, range(-args.calentamiento, 0)))
+            inicio = time.perf_counter()
+            resultados = list(pool.map(peticion, range(args.peticiones)))
+            duracion = time.perf_counter() - inicio
+    finally:
+        if servidor is not None:
+            servidor.should_exit = True
+        if not args.conservar:
+            print(f"Borrados {limpiar(prefijo)} clientes de la prueba")
+
+    informe = {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": version_codigo(),
+        "config": {
+            "filas": len(ids),
+            "peticiones": args.peticiones,
+            "concurrencia": args.concurrencia,
+            "mezcla": mezcla,
+            "semilla": args.semilla,
+            "backend": backend,
+            "servidor": "externo" if args.base_url else "uvicorn en proceso",
+        },
+        "duracion_s": round(duracion, 3),
+        "total": resumen(resultados, duracion),
+        "operaciones": {
+            op: resumen([r for r in resultados if r[0] == op], duracion)
+            for op in sorted({r[0] for r in resultados})
+        },
+    }
+
+    print(json.dumps(informe, indent=2, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
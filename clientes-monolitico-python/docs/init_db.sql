@@ -23,9 +23,20 @@ CREATE TABLE clientes (
     apellido VARCHAR(100) NOT NULL,
     email VARCHAR(150) NOT NULL UNIQUE,
     telefono VARCHAR(50),
-    direccion VARCHAR(255)
+    direccion VARCHAR(255),
+    -- Índices para la paginación keyset por nombre/apellido (InnoDB añade el id implícitamente)
+    INDEX idx_clientes_nombre (nombre),
+    INDEX idx_clientes_apellido (apellido)
 );
 
+-- Versión de la tabla (ETag / Last-Modified y claves de la caché), común a todos los workers
+CREATE TABLE clientes_version (
+    id INT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    modificado DOUBLE NOT NULL
+);
+INSERT INTO clientes_version (id, version, modificado) VALUES (1, 0, UNIX_TIMESTAMP(NOW(6)));
+
 -- 5️⃣ Insertar algunos registros de ejemplo
 INSERT INTO clientes (nombre, apellido, email, telefono, direccion) VALUES
 ('Juan', 'Pérez', 'juan.perez@example.com', '555-0101', 'Calle 123, Ciudad'),
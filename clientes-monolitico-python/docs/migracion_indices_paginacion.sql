@@ -0,0 +1,14 @@
+-- =========================================================
+-- MIGRACIÓN: índices para el listado paginado de clientes
+-- Descripción:
+--   Para bases de datos creadas antes de la paginación keyset.
+--   El listado ordena por (columna, id) y filtra con WHERE columna > ?;
+--   sin estos índices cada página haría un filesort de toda la tabla.
+--   `email` ya tiene índice por la restricción UNIQUE.
+-- =========================================================
+
+USE clientes_db;
+
+ALTER TABLE clientes
+    ADD INDEX idx_clientes_nombre (nombre),
+    ADD INDEX idx_clientes_apellido (apellido);
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from app.pool import ConnectionPool, PoolTimeoutError
+
+
+class ConexionFalsa:
+    """Conexión de prueba: cuenta rollbacks y cierres y puede fallar el `ping`."""
+
+    def __init__(self, numero: int):
+        self.numero = numero
+        self.in_transaction = False
+        self.sana = True
+        self.rollbacks = 0
+        self.cerrada = False
+
+    def ping(self, reconnect: bool = False) -> None:
+        if not self.sana:
+            raise ConnectionError("conexión perdida")
+
+    def rollback(self) -> None:
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self) -> None:
+        self.cerrada = True
+
+
+class Fabrica:
+    def __init__(self):
+        self.creadas = []
+
+    def __call__(self) -> ConexionFalsa:
+        conn = ConexionFalsa(len(self.creadas))
+        self.creadas.append(conn)
+        return conn
+
+
+@pytest.fixture
+def fabrica():
+    return Fabrica()
+
+
+def test_pool_agotado_lanza_timeout(fabrica):
+    pool = ConnectionPool(fabrica, min_size=0, max_size=2, checkout_timeout=0.05)
+    a = pool.acquire()
+    pool.acquire()
+
+    inicio = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert time.monotonic() - inicio >= 0.05
+
+    metricas = pool.metrics()
+    assert metricas["timeouts"] == 1
+    assert metricas["waits"] == 1
+    assert metricas["in_use"] == 2
+    assert len(fabrica.creadas) == 2
+
+    # El hilo que se rindió ya no está en la cola: la conexión devuelta queda libre
+    pool.release(a)
+    assert pool.acquire() is a
+    assert len(fabrica.creadas) == 2
+
+
+def test_release_entrega_la_conexion_al_hilo_en_espera(fabrica):
+    pool = ConnectionPool(fabrica, min_size=0, max_size=1, checkout_timeout=5.0)
+    conn = pool.acquire()
+    recibida = []
+    esperando = threading.Thread(target=lambda: recibida.append(pool.acquire()))
+    esperando.start()
+    while not pool.metrics()["waits"]:
+        time.sleep(0.001)
+
+    pool.release(conn)
+    esperando.join(timeout=5.0)
+
+    assert recibida == [conn]
+    metricas = pool.metrics()
+    assert metricas["in_use"] == 1
+    assert metricas["idle"] == 0
+
+
+def test_release_deshace_la_transaccion_abierta(fabrica):
+    pool = ConnectionPool(fabrica, min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.in_transaction = True
+
+    pool.release(conn)
+
+    assert conn.rollbacks == 1
+    assert pool.metrics()["idle"] == 1
+
+
+def test_conexion_que_no_responde_al_ping_se_sustituye(fabrica):
+    pool = ConnectionPool(fabrica, min_size=0, max_size=1, health_check_after=0.0)
+    vieja = pool.acquire()
+    pool.release(vieja)
+    vieja.sana = False
+
+    nueva = pool.acquire()
+
+    assert nueva is not vieja
+    assert vieja.cerrada
+    metricas = pool.metrics()
+    assert metricas["health_check_failures"] == 1
+    assert metricas["closed"] == 1
+    assert metricas["size"] == 1
+
+
+def test_conexiones_ociosas_caducadas_se_cierran_respetando_min_size(fabrica):
+    pool = ConnectionPool(fabrica, min_size=1, max_size=3, idle_timeout=0.0)
+    conexiones = [pool.acquire() for _ in range(3)]
+    for conn in conexiones:
+        pool.release(conn)
+    time.sleep(0.001)
+
+    # Se cierran las dos más antiguas y se reutiliza la más reciente
+    assert pool.acquire() is conexiones[2]
+    assert [c.cerrada for c in conexiones] == [True, True, False]
+    assert pool.metrics()["size"] == 1
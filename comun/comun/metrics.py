@@ -0,0 +1,200 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Métricas de rendimiento por petición en formato Prometheus, sin dependencias externas:
+# MetricsMiddleware mide cada petición y span("fase") desglosa su tiempo en fases
+# (db_connect, query, mapping, render) que se exportan en GET /metrics.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fases de la petición en curso (None fuera de una petición: los spans no miden nada)
+_fases_actuales: ContextVar[Dict[str, float] | None] = ContextVar("fases_peticion", default=None)
+
+
+class Histograma:
+    """Histograma acumulado (cuentas por bucket, suma y total)."""
+
+    __slots__ = ("cuentas", "suma", "total")
+
+    def __init__(self):
+        self.cuentas = [0] * (len(BUCKETS) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        # bisect_left: un valor igual al límite cuenta en ese bucket (le = "menor o igual")
+        self.cuentas[bisect.bisect_left(BUCKETS, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class RegistroMetricas:
+    """Almacén de las métricas del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._peticiones: Dict[Tuple[str, str, str], Histograma] = {}
+        self._fases: Dict[Tuple[str, str], Histograma] = {}
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[str, Any]]]] = []
+
+    def observar_peticion(
+        self, metodo: str, ruta: str, estado: int, duracion: float, fases: Dict[str, float]
+    ) -> None:
+        with self._lock:
+            clave = (metodo, ruta, str(estado))
+            histograma = self._peticiones.get(clave)
+            if histograma is None:
+                histograma = self._peticiones[clave] = Histograma()
+            histograma.observar(duracion)
+            for fase, segundos in fases.items():
+                histograma = self._fases.get((ruta, fase))
+                if histograma is None:
+                    histograma = self._fases[(ruta, fase)] = Histograma()
+                histograma.observar(segundos)
+
+    def registrar_gauges(self, prefijo: str, ayuda: str, funcion: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Publica como gauges `{prefijo}_{clave}` los valores numéricos del dict que devuelve
+        `funcion` (p. ej. `get_pool().metrics`); se evalúa en cada exportación.
+        """
+        self._gauges.append((prefijo, ayuda, funcion))
+
+    def exportar(self) -> str:
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+        with self._lock:
+            peticiones = [(k, _copiar(h)) for k, h in sorted(self._peticiones.items())]
+            fases = [(k, _copiar(h)) for k, h in sorted(self._fases.items())]
+
+        lineas = [
+            "# HELP http_request_duration_seconds Latencia de las peticiones HTTP",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (metodo, ruta, estado), histograma in peticiones:
+            etiquetas = f'method="{_escapar(metodo)}",route="{_escapar(ruta)}",status="{estado}"'
+            lineas.extend(_lineas_histograma("http_request_duration_seconds", etiquetas, histograma))
+
+        lineas += [
+            "# HELP http_request_phase_seconds Tiempo de cada fase (db_connect, query, mapping, render) por petición",
+            "# TYPE http_request_phase_seconds histogram",
+        ]
+        for (ruta, fase), histograma in fases:
+            etiquetas = f'route="{_escapar(ruta)}",phase="{_escapar(fase)}"'
+            lineas.extend(_lineas_histograma("http_request_phase_seconds", etiquetas, histograma))
+
+        for prefijo, ayuda, funcion in self._gauges:
+            try:
+                valores = funcion()
+            except Exception:
+                continue
+            for clave, valor in valores.items():
+                if isinstance(valor, (int, float)):
+                    nombre = f"{prefijo}_{clave}"
+                    lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge", f"{nombre} {float(valor)}"]
+        return "\n".join(lineas) + "\n"
+
+
+registro = RegistroMetricas()
+
+
+@contextmanager
+def span(fase: str) -> Iterator[None]:
+    """Mide un bloque como parte de la fase `fase` de la petición en curso."""
+    fases = _fases_actuales.get()
+    if fases is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        fases[fase] = fases.get(fase, 0.0) + time.perf_counter() - inicio
+
+
+def registrar_fase(fase: str, segundos: float) -> None:
+    """Suma `segundos` a la fase `fase` de la petición en curso (cuando no encaja un `with span`)."""
+    fases = _fases_actuales.get()
+    if fases is not None:
+        fases[fase] = fases.get(fase, 0.0) + segundos
+
+
+def instrumentar_plantillas(templates: Any) -> None:
+    """Envuelve `templates.TemplateResponse` para medir el renderizado Jinja como fase `render`."""
+    original = templates.TemplateResponse
+
+    @functools.wraps(original)
+    def template_response(*args: Any, **kwargs: Any) -> Any:
+        with span("render"):
+            return original(*args, **kwargs)
+
+    templates.TemplateResponse = template_response
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que registra la latencia y las fases de cada petición HTTP."""
+
+    def __init__(self, app: Any, registro_metricas: RegistroMetricas = registro):
+        self.app = app
+        self.registro = registro_metricas
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        raiz = scope.get("root_path", "")
+        estado = 500
+
+        async def send_con_estado(mensaje: Dict[str, Any]) -> None:
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        fases: Dict[str, float] = {}
+        token = _fases_actuales.set(fases)
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            _fases_actuales.reset(token)
+            self.registro.observar_peticion(
+                scope["method"], _etiqueta_ruta(scope, raiz), estado, time.perf_counter() - inicio, fases
+            )
+
+
+def _etiqueta_ruta(scope: Dict[str, Any], raiz: str) -> str:
+    # El router deja en el scope la ruta resuelta; usamos su plantilla para no crear
+    # una serie por cada id
+    ruta = scope.get("route")
+    if ruta is not None and hasattr(ruta, "path"):
+        return ruta.path
+    montaje = scope.get("root_path", "")
+    if montaje != raiz:
+        return montaje[len(raiz):]  # Mount, p. ej. /static
+    return "no_encontrada"
+
+
+def _copiar(histograma: Histograma) -> Histograma:
+    copia = Histograma()
+    copia.cuentas = list(histograma.cuentas)
+    copia.suma = histograma.suma
+    copia.total = histograma.total
+    return copia
+
+
+def _lineas_histograma(nombre: str, etiquetas: str, histograma: Histograma) -> Iterator[str]:
+    acumulado = 0
+    for limite, cuenta in zip(BUCKETS, histograma.cuentas):
+        acumulado += cuenta
+        yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+    yield f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {histograma.total}'
+    yield f"{nombre}_sum{{{etiquetas}}} {histograma.suma}"
+    yield f"{nombre}_count{{{etiquetas}}} {histograma.total}"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")